@@ -0,0 +1,316 @@
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import typing
+from argparse import ArgumentParser
+
+logger = logging.getLogger("benchmark")
+
+ENCODER_ENGINES = ["table", "bulk"]
+DECODER_ENGINES = ["best-first", "viterbi", "list-viterbi", "beam", "stack"]
+# characters of generated messages (not removed by encoder input filter)
+MESSAGE_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+def generate_feedback_masks(stage_count: int, mask_count: int) -> typing.List[int]:
+    """ Generates deterministic feedback masks using both the first and the last memory block. """
+    generator = random.Random(stage_count * 100 + mask_count)
+    edge_bits = (1 << (stage_count - 1)) | 1
+    return [edge_bits | generator.getrandbits(stage_count) for _ in range(mask_count)]
+
+
+def generate_message(length: int, seed: int = 0) -> str:
+    """ Generates deterministic message of given length. """
+    generator = random.Random(seed)
+    return "".join(generator.choice(MESSAGE_ALPHABET) for _ in range(length))
+
+
+def inject_errors(data_in: str, bit_error_rate: float, seed: int = 0) -> str:
+    """ Flips each bit of binary sequence with given probability. """
+    generator = random.Random(seed)
+    return "".join(
+        ("1" if bit == "0" else "0") if generator.random() < bit_error_rate else bit
+        for bit in data_in
+    )
+
+
+def peak_rss_kib() -> int:
+    """ Returns peak resident set size of current process and its finished children in KiB. """
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # macOS reports the value in bytes
+    return peak_rss // 1024 if sys.platform == "darwin" else peak_rss
+
+
+def create_encoder(stage_count: int, feedback_masks: typing.List[int]):
+    from convolutional_encoder import ConvolutionalEncoder
+    return ConvolutionalEncoder(stage_count, feedback_masks)
+
+
+def create_decoder(engine: str, stage_count: int, feedback_masks: typing.List[int]):
+    if engine == "viterbi":
+        from viterbi_decoder import ViterbiDecoder
+        return ViterbiDecoder(stage_count, feedback_masks)
+
+    if engine == "list-viterbi":
+        from list_viterbi_decoder import ListViterbiDecoder
+        return ListViterbiDecoder(stage_count, feedback_masks)
+
+    if engine == "beam":
+        from convolutional_decoder import BeamDecoder
+        return BeamDecoder(stage_count, feedback_masks)
+
+    if engine == "stack":
+        from convolutional_decoder import StackDecoder
+        return StackDecoder(stage_count, feedback_masks)
+
+    from convolutional_decoder import ConvolutionalDecoder
+    return ConvolutionalDecoder(stage_count, feedback_masks)
+
+
+def encoded_message(stage_count: int, feedback_masks: typing.List[int], message: str) -> str:
+    """ Encodes message to binary sequence using the reference encoder. """
+    encoder = create_encoder(stage_count, feedback_masks)
+    return encoder.data_out_to_str(encoder.encode(message))
+
+
+def run_trellis_case(case: dict) -> dict:
+    """ Measures construction time of trellis and string based tables of given code. """
+    from trellis import Trellis
+    from utils import emission_table, transition_table
+
+    start = time.perf_counter()
+    Trellis(case["stage_count"], case["feedback_masks"])
+    trellis_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    emission_table(case["stage_count"], case["feedback_masks"])
+    transition_table(case["stage_count"])
+    table_seconds = time.perf_counter() - start
+
+    return {"seconds": trellis_seconds + table_seconds, "table_build_seconds": trellis_seconds,
+            "string_table_build_seconds": table_seconds}
+
+
+def run_encode_case(case: dict) -> dict:
+    """ Measures encoding throughput of given engine. """
+    message = generate_message(case["message_length"])
+
+    start = time.perf_counter()
+    encoder = create_encoder(case["stage_count"], case["feedback_masks"])
+    table_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if case["engine"] == "bulk":
+        encoder.encode_bulk(message)
+    else:
+        encoder.encode(message)
+    seconds = time.perf_counter() - start
+
+    input_bits = len(message) * 8
+    return {"seconds": seconds, "table_build_seconds": table_seconds,
+            "input_bits": input_bits, "bits_per_second": input_bits / seconds if seconds else None}
+
+
+def run_decode_case(case: dict) -> dict:
+    """ Measures decoding throughput of given engine on channel with given bit error rate. """
+    message = generate_message(case["message_length"])
+    data_in = encoded_message(case["stage_count"], case["feedback_masks"], message)
+    data_in = inject_errors(data_in, case["bit_error_rate"])
+
+    start = time.perf_counter()
+    decoder = create_decoder(case["engine"], case["stage_count"], case["feedback_masks"])
+    table_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data_out = decoder.decode(data_in)
+    seconds = time.perf_counter() - start
+
+    input_bits = len(data_in)
+    return {"seconds": seconds, "table_build_seconds": table_seconds,
+            "input_bits": input_bits, "bits_per_second": input_bits / seconds if seconds else None,
+            "decoded_correctly": bool(data_out) and data_out[0][1] == message}
+
+
+def run_end_to_end_case(case: dict) -> dict:
+    """ Measures throughput of `main.py` encoding and decoding processes (including startup). """
+    message = generate_message(case["message_length"])
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    params = [str(case["stage_count"] - 1)] + list(map(str, case["feedback_masks"]))
+
+    start = time.perf_counter()
+    encoded = subprocess.run([sys.executable, main_path, "-e", "--params"] + params,
+                             input=message, stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    decoded = subprocess.run([sys.executable, main_path, "-d", "--decoder", case["engine"], "--params"] + params,
+                             input=encoded, stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    seconds = time.perf_counter() - start
+
+    input_bits = len(message) * 8
+    return {"seconds": seconds, "input_bits": input_bits,
+            "bits_per_second": input_bits / seconds if seconds else None,
+            "decoded_correctly": decoded.strip() == message}
+
+
+CASE_RUNNERS = {
+    "trellis": run_trellis_case,
+    "encode": run_encode_case,
+    "decode": run_decode_case,
+    "end-to-end": run_end_to_end_case,
+}
+
+
+def _case_process(case: dict, results: multiprocessing.Queue):
+    """ Runs single benchmark case (in separate spawned process, so peak RSS is measured per case). """
+    logging.disable(logging.CRITICAL)
+    from trellis import configure_cache
+    # tables must always be built to measure their construction
+    configure_cache(None)
+
+    try:
+        if case.get("engine") in ("bulk", "viterbi", "list-viterbi"):
+            # import of optional dependency must not be included in the measurement
+            import numpy
+
+        result = CASE_RUNNERS[case["group"]](case)
+        result["status"] = "ok"
+
+    except Exception as ex:
+        result = {"status": "error", "error": "{:s}: {:s}".format(type(ex).__name__, str(ex))}
+
+    result["peak_rss_kib"] = peak_rss_kib()
+    results.put(result)
+
+
+def run_case(case: dict, timeout: float) -> dict:
+    """ Runs single benchmark case in separate process and terminates it after timeout. """
+    # forked process would inherit peak RSS of the benchmark itself (and of all previous cases)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_case_process, args=(case, results))
+    process.start()
+
+    try:
+        result = results.get(timeout=timeout)
+
+    except Exception:
+        process.terminate()
+        result = {"status": "timeout"}
+
+    process.join()
+    return dict(case, **result)
+
+
+def case_name(case: dict) -> str:
+    """ Creates identifier of benchmark case used to compare results of different runs. """
+    return "{group}/{engine}/K={stage_count}/masks={feedback_masks}/length={message_length}/ber={bit_error_rate}" \
+        .format(**dict({"engine": "-", "message_length": "-", "bit_error_rate": "-"}, **case))
+
+
+def generate_cases(args: dict) -> typing.List[dict]:
+    """ Creates list of benchmark cases for all combinations of selected parameters. """
+    cases = []
+    for stage_count in args["stage_counts"]:
+        for mask_count in args["mask_counts"]:
+            code = {"stage_count": stage_count, "feedback_masks": generate_feedback_masks(stage_count, mask_count)}
+            cases.append(dict(code, group="trellis"))
+
+            for message_length in args["message_lengths"]:
+                for engine in args["encoders"]:
+                    cases.append(dict(code, group="encode", engine=engine, message_length=message_length))
+
+                for engine in args["decoders"]:
+                    for bit_error_rate in args["bit_error_rates"]:
+                        cases.append(dict(code, group="decode", engine=engine,
+                                          message_length=message_length, bit_error_rate=bit_error_rate))
+
+                    if args["end_to_end"]:
+                        cases.append(dict(code, group="end-to-end", engine=engine, message_length=message_length))
+
+    return cases
+
+
+def compare_results(results: typing.List[dict], baseline: typing.List[dict], threshold: float) -> typing.List[str]:
+    """ Returns descriptions of cases which got slower than in baseline run by more than given ratio. """
+    baseline_results = {case_name(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        baseline_result = baseline_results.get(case_name(result))
+        if not baseline_result or result["status"] != "ok" or baseline_result["status"] != "ok":
+            continue
+
+        if result["seconds"] > baseline_result["seconds"] * (1 + threshold):
+            regressions.append("{:s}: {:.4f}s -> {:.4f}s".format(
+                case_name(result), baseline_result["seconds"], result["seconds"]))
+
+    return regressions
+
+
+def run(args: dict) -> int:
+    cases = generate_cases(args)
+    results = []
+    for case_index, case in enumerate(cases):
+        result = run_case(case, args["timeout"])
+        results.append(result)
+
+        print("[{:3d}/{:3d}] {:s}: {:s} {:.4f}s {} b/s, peak RSS {} KiB".format(
+            case_index + 1, len(cases), case_name(case), result["status"], result.get("seconds", 0.0),
+            int(result["bits_per_second"]) if result.get("bits_per_second") else "-",
+            result.get("peak_rss_kib", "-")), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    if args["output"]:
+        with open(args["output"], "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args["compare"]:
+        with open(args["compare"]) as file:
+            regressions = compare_results(results, json.load(file)["results"], args["threshold"])
+
+        for regression in regressions:
+            print("regression: {:s}".format(regression), file=sys.stderr)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="measures throughput of encoders, decoders and table builders")
+    parser.add_argument("--stage-counts", nargs="+", type=int, default=[3, 6, 9], metavar="K",
+                        help="numbers of memory blocks (X + 1) of benchmarked codes [default: 3 6 9]")
+    parser.add_argument("--mask-counts", nargs="+", type=int, default=[2, 3], metavar="N",
+                        help="numbers of feedback masks of benchmarked codes [default: 2 3]")
+    parser.add_argument("--message-lengths", nargs="+", type=int, default=[32, 256], metavar="L",
+                        help="lengths of encoded messages in characters [default: 32 256]")
+    parser.add_argument("--bit-error-rates", nargs="+", type=float, default=[0.0, 0.02], metavar="P",
+                        help="probabilities of bit errors injected before decoding [default: 0.0 0.02]")
+    parser.add_argument("--encoders", nargs="*", choices=ENCODER_ENGINES, default=ENCODER_ENGINES,
+                        help="benchmarked encoding engines")
+    parser.add_argument("--decoders", nargs="*", choices=DECODER_ENGINES, default=DECODER_ENGINES,
+                        help="benchmarked decoding engines")
+    parser.add_argument("--end-to-end", action="store_true", help="benchmark main.py processes as well")
+    parser.add_argument("--timeout", type=float, default=60.0, metavar="S",
+                        help="maximum duration of single case in seconds [default: 60]")
+    parser.add_argument("-o", "--output", default=None, metavar="FILE", help="store results to JSON file")
+    parser.add_argument("--compare", default=None, metavar="FILE",
+                        help="compare results with previously stored JSON file (exit code 1 on regression)")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown considered as regression [default: 0.1]")
+
+    sys.exit(run(parser.parse_args().__dict__))
@@ -0,0 +1,171 @@
+import logging
+import mmap
+import typing
+from contextlib import contextmanager
+
+logger = logging.getLogger("chunked_io")
+
+# number of input bytes processed at once
+CHUNK_SIZE = 1 << 18
+# number of bytes read at once while looking for characters following the chunk
+LOOKAHEAD_READ_SIZE = 256
+
+
+@contextmanager
+def map_file(path: str) -> typing.Iterator[typing.Union[mmap.mmap, bytes]]:
+    """ Memory-maps file for reading (empty files cannot be mapped, empty bytes are provided instead). """
+    with open(path, "rb") as file:
+        if not file.seek(0, 2):
+            yield b""
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def _read_chunk(data: typing.Union[mmap.mmap, bytes], start: int, end: int) -> str:
+    """ Returns bytes of given range of mapped file as string (single character per byte). """
+    return data[start:end].decode("latin-1")
+
+
+def _lookahead(encoder, data: typing.Union[mmap.mmap, bytes], position: int, length: int) -> str:
+    """
+    Returns up to `length` characters following given position which are not removed
+    by encoder input filter.
+    """
+    lookahead = ""
+    while len(lookahead) < length and position < len(data):
+        text = _read_chunk(data, position, position + LOOKAHEAD_READ_SIZE)
+        if encoder.filter_input:
+            text = encoder.filter_data_in(text)
+
+        lookahead += text[:length - len(lookahead)]
+        position += LOOKAHEAD_READ_SIZE
+
+    return lookahead
+
+
+def encode_file(encoder, input_path: str, output: typing.BinaryIO, chunk_size: int = CHUNK_SIZE):
+    """
+    Encodes memory-mapped file in chunks of fixed size and writes the binary sequence incrementally.
+
+    Result is the same as `encode` of the whole file content converted by `data_out_to_str`.
+    Input is encoded from its last character, but the filter state before the last
+    processed character of each chunk depends only on the last `stage_count` inserted
+    bits - the first characters following the chunk. Each chunk is therefore encoded
+    together with these characters, whose outputs are then dropped, and chunks
+    can be processed (and written) from the start of the file.
+
+    :param encoder: encoder instance (without puncturing)
+    :param input_path: path of the file to be encoded
+    :param output: binary output stream
+    :param chunk_size: number of bytes processed at once
+    """
+    if encoder.puncture_pattern is not None:
+        raise RuntimeError("Chunked encoding of punctured code is not supported.")
+
+    stage_count = encoder.filter.stage_count
+    # number of bits of each filter output
+    output_length = len(encoder.filter.feedback_masks)
+    # number of characters whose bits fill whole filter memory
+    lookahead_length = -(-stage_count // 8)
+    # filter is flushed only after the first character of the file
+    is_first_chunk = True
+
+    with map_file(input_path) as data:
+        for chunk_start in range(0, len(data), chunk_size):
+            chunk_end = min(chunk_start + chunk_size, len(data))
+            data_in = _read_chunk(data, chunk_start, chunk_end)
+            if encoder.filter_input:
+                # remove undesired input content
+                data_in = encoder.filter_data_in(data_in)
+            if not data_in:
+                continue
+
+            lookahead = _lookahead(encoder, data, chunk_end, lookahead_length)
+            logger.info("encoding chunk at offset %d (%d characters, %d following)",
+                        chunk_start, len(data_in), len(lookahead))
+            # the filter is always flushed, so the next chunk starts with empty filter
+            data_out = encoder.encode_to_str(data_in + lookahead, flush_filter=True)
+            if not is_first_chunk:
+                # flushed values belong to the first chunk only
+                data_out = data_out[stage_count * output_length:]
+            if lookahead:
+                # outputs of the following characters belong to the next chunk (the first output is discarded)
+                data_out = data_out[:len(data_out) - (8 * len(lookahead) - 1) * output_length]
+
+            output.write(data_out.encode("ascii"))
+            is_first_chunk = False
+
+    output.write(b"\n")
+    output.flush()
+
+
+def decode_file(decoder, input_path: str, output_path: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Decodes memory-mapped file in chunks of fixed size and writes the decoded characters incrementally.
+
+    Observations are processed from the end of the sequence, so the chunks are read
+    from the end of the file and fed to stream decoding (see `ConvolutionalDecoder.feed`)
+    - only decisions within traceback depth are kept in memory. Characters are decoded
+    from the last one, so the output file is allocated first and filled from its end.
+
+    :param decoder: decoder instance (without puncturing)
+    :param input_path: path of the file holding binary sequence of [01] characters
+    :param output_path: path of the output file
+    :param chunk_size: number of bytes processed at once
+    """
+    observation_length = len(decoder.feedback_masks)
+
+    with map_file(input_path) as data:
+        # count received bits to calculate length of the output
+        bit_count = 0
+        for chunk_start in range(0, len(data), chunk_size):
+            chunk = data[chunk_start:chunk_start + chunk_size]
+            bit_count += chunk.count(b"0") + chunk.count(b"1")
+
+        decoded_bit_count = -(-bit_count // observation_length) - (decoder.stage_count - 1)
+        output_length = decoded_bit_count // 8 if decoded_bit_count >= 8 else 0
+
+        with open(output_path, "wb") as output:
+            output.truncate(output_length)
+            output_position = output_length
+
+            def write_decoded(data_out: str):
+                nonlocal output_position
+                if not data_out:
+                    return
+
+                # characters are decoded in reverse order
+                output_position -= len(data_out)
+                if output_position < 0:
+                    raise RuntimeError("Decoded output exceeds its expected length.")
+
+                output.seek(output_position)
+                output.write(data_out[::-1].encode("latin-1"))
+
+            # received bits which do not form whole observation yet (the start of the later chunk)
+            remaining_bits = ""
+            for chunk_end in range(len(data), 0, -chunk_size):
+                chunk_start = max(chunk_end - chunk_size, 0)
+                data_in = decoder.filter_data_in(_read_chunk(data, chunk_start, chunk_end)) + remaining_bits
+                whole_length = len(data_in) - len(data_in) % observation_length
+                remaining_bits = data_in[:len(data_in) - whole_length]
+
+                logger.info("decoding chunk at offset %d (%d observations)",
+                            chunk_start, whole_length // observation_length)
+                # observations are fed in order of processing (from the end of the sequence)
+                write_decoded(decoder.feed("".join(
+                    data_in[observation_end - observation_length:observation_end]
+                    for observation_end in range(len(data_in), len(data_in) - whole_length, -observation_length)
+                )))
+
+            # the first (incomplete) observation of the sequence is processed by `flush`
+            write_decoded(decoder.feed(remaining_bits))
+            write_decoded(decoder.flush())
+
+            if output_position:
+                raise RuntimeError("Decoded output is shorter than expected.")
+
+            output.seek(output_length)
+            output.write(b"\n")
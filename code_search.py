@@ -0,0 +1,258 @@
+import csv
+import heapq
+import itertools
+import logging
+import os
+import sys
+import typing
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from trellis import Trellis
+
+logger = logging.getLogger("code_search")
+
+CSV_COLUMNS = ["params", "stage_count", "state_count", "free_distance", "spectrum", "information_spectrum"]
+
+
+def candidate_mask_sets(stage_count: int, mask_count: int) -> typing.Iterator[typing.Tuple[int, ...]]:
+    """
+    Enumerates sets of feedback masks of codes with given number of memory blocks.
+
+    Every mask uses the most recently inserted bit (MSB of the state) and at least
+    one mask uses the oldest memory block (LSB), codes with shorter effective memory
+    or delayed outputs are therefore skipped.
+
+    :param stage_count: number of memory blocks (X + 1)
+    :param mask_count: number of feedback masks (encoder outputs per input bit)
+    :return: sorted tuples of distinct feedback masks
+    """
+    input_bit_value = 1 << (stage_count - 1)
+    masks = range(input_bit_value, 1 << stage_count)
+    for feedback_masks in itertools.combinations(masks, mask_count):
+        if any(feedback_mask & 1 for feedback_mask in feedback_masks):
+            yield feedback_masks
+
+
+def is_catastrophic(trellis: Trellis) -> bool:
+    """
+    Determines whether the code is catastrophic - whether the trellis contains cycle
+    of zero output weight other than the loop in the initial state. Finite number of
+    channel errors can then cause infinite number of decoding errors.
+    """
+    zero_states = [trellis.emissions[state] == 0 for state in range(trellis.state_count)]
+    # number of zero weight transitions leading to each state (except the loop in the initial state)
+    in_degrees = [0] * trellis.state_count
+    for state in range(trellis.state_count):
+        for next_state in trellis.transitions[state]:
+            if zero_states[next_state] and (state or next_state):
+                in_degrees[next_state] += 1
+
+    # repeatedly remove states without incoming zero weight transitions (topological ordering)
+    pending_states = [state for state in range(trellis.state_count) if not in_degrees[state]]
+    removed_count = 0
+    while pending_states:
+        state = pending_states.pop()
+        removed_count += 1
+        for next_state in trellis.transitions[state]:
+            if zero_states[next_state] and (state or next_state):
+                in_degrees[next_state] -= 1
+                if not in_degrees[next_state]:
+                    pending_states.append(next_state)
+
+    # states which could not be removed lie on (or behind) zero weight cycle
+    return removed_count < trellis.state_count
+
+
+def free_distance(trellis: Trellis) -> int:
+    """
+    Calculates free distance of the code - the lowest output weight of path diverging
+    from the initial state and merging back into it (shortest path search).
+    """
+    initial_state = 0
+    diverging_state = trellis.next_state(initial_state, 1)
+    weights = [None] * trellis.state_count
+    unprocessed_states = [(trellis.distances[trellis.emissions[diverging_state]], diverging_state)]
+    while unprocessed_states:
+        current_weight, current_state = heapq.heappop(unprocessed_states)
+        if current_state == initial_state:
+            return current_weight
+
+        if weights[current_state] is not None:
+            # the state was already reached with lower weight
+            continue
+
+        weights[current_state] = current_weight
+        for next_state in trellis.transitions[current_state]:
+            if weights[next_state] is None:
+                heapq.heappush(unprocessed_states,
+                               (current_weight + trellis.distances[trellis.emissions[next_state]], next_state))
+
+    raise RuntimeError("Path merging back into the initial state does not exist.")
+
+
+def weight_spectrum(trellis: Trellis, max_weight: int) -> typing.Tuple[typing.List[int], typing.List[int]]:
+    """
+    Counts paths diverging from the initial state and merging back into it by their output weight.
+
+    Paths are extended one trellis step at a time while their weight does not exceed
+    `max_weight`, the code must not be catastrophic (otherwise the number of paths is infinite).
+
+    :param trellis: trellis of the code
+    :param max_weight: maximum output weight of counted paths
+    :return: number of paths of each weight (A_d) and total number of their
+             input bits set to 1 (B_d), indexed by the weight
+    """
+    initial_state = 0
+    path_counts = [0] * (max_weight + 1)
+    information_weights = [0] * (max_weight + 1)
+
+    diverging_state = trellis.next_state(initial_state, 1)
+    diverging_weight = trellis.distances[trellis.emissions[diverging_state]]
+    # unmerged paths - state: (number of paths, total information weight) per output weight
+    frontier = {}
+    if diverging_weight <= max_weight:
+        frontier[diverging_state] = ([0] * (max_weight + 1), [0] * (max_weight + 1))
+        frontier[diverging_state][0][diverging_weight] = 1
+        frontier[diverging_state][1][diverging_weight] = 1
+
+    while frontier:
+        next_frontier = {}
+        for current_state, (counts, information) in frontier.items():
+            for input_bit in [0, 1]:
+                next_state = trellis.transitions[current_state][input_bit]
+                transition_weight = trellis.distances[trellis.emissions[next_state]]
+                if next_state == initial_state:
+                    # path merged back (input bit is 0 and so is its output weight)
+                    target_counts, target_information = path_counts, information_weights
+                elif next_state in next_frontier:
+                    target_counts, target_information = next_frontier[next_state]
+                else:
+                    target_counts, target_information = [0] * (max_weight + 1), [0] * (max_weight + 1)
+
+                updated = False
+                for weight in range(max_weight + 1 - transition_weight):
+                    if counts[weight]:
+                        target_counts[weight + transition_weight] += counts[weight]
+                        target_information[weight + transition_weight] += information[weight] \
+                            + input_bit * counts[weight]
+                        updated = True
+
+                if updated and next_state != initial_state:
+                    next_frontier[next_state] = target_counts, target_information
+
+        frontier = next_frontier
+
+    return path_counts, information_weights
+
+
+def evaluate_code(stage_count: int, feedback_masks: typing.Tuple[int, ...], spectrum_terms: int) \
+        -> typing.Optional[dict]:
+    """
+    Calculates distance properties of single code (in worker process).
+
+    :param stage_count: number of memory blocks (X + 1)
+    :param feedback_masks: feedback masks of the code
+    :param spectrum_terms: number of calculated weight spectrum terms (starting with free distance)
+    :return: properties of the code or `None` for catastrophic code
+    """
+    trellis = Trellis(stage_count, list(feedback_masks))
+    if is_catastrophic(trellis):
+        return None
+
+    distance = free_distance(trellis)
+    path_counts, information_weights = weight_spectrum(trellis, distance + spectrum_terms - 1)
+    return {
+        "params": " ".join(map(str, [stage_count - 1] + list(feedback_masks))),
+        "stage_count": stage_count,
+        "state_count": trellis.state_count,
+        "free_distance": distance,
+        "spectrum": path_counts[distance:],
+        "information_spectrum": information_weights[distance:],
+    }
+
+
+def _evaluate_codes(stage_count: int, mask_sets: typing.List[typing.Tuple[int, ...]], spectrum_terms: int) \
+        -> typing.List[typing.Optional[dict]]:
+    """ Evaluates batch of codes in worker process. """
+    return [evaluate_code(stage_count, feedback_masks, spectrum_terms) for feedback_masks in mask_sets]
+
+
+def ranking_key(result: dict) -> tuple:
+    """
+    Returns sorting key of evaluated code - higher free distance first, then fewer paths
+    (and fewer information bit errors) of the lowest weights, then fewer encoder states.
+    """
+    return -result["free_distance"], result["spectrum"], result["information_spectrum"], result["state_count"]
+
+
+def run(args: dict):
+    worker_count = args["workers"] or os.cpu_count() or 1
+    results = []
+    catastrophic_count = 0
+    with ProcessPoolExecutor(worker_count) as executor:
+        for stage_count in args["stage_counts"]:
+            candidates = candidate_mask_sets(stage_count, args["mask_count"])
+            batches = iter(lambda: list(itertools.islice(candidates, args["batch_size"])), [])
+            futures = [executor.submit(_evaluate_codes, stage_count, batch, args["spectrum_terms"])
+                       for batch in batches]
+            for future in futures:
+                for result in future.result():
+                    if result is None:
+                        catastrophic_count += 1
+                    else:
+                        results.append(result)
+
+            logger.info("evaluated codes with %d memory blocks", stage_count - 1)
+
+    logger.info("%d catastrophic codes rejected", catastrophic_count)
+    results.sort(key=ranking_key)
+    results = results[:args["top"]]
+
+    output = open(args["output"], "w", newline="") if args["output"] else sys.stdout
+    try:
+        writer = csv.DictWriter(output, CSV_COLUMNS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(dict(result, spectrum=" ".join(map(str, result["spectrum"])),
+                                 information_spectrum=" ".join(map(str, result["information_spectrum"]))))
+
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="searches feedback masks of convolutional codes with the best distance "
+                                        "properties")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="sets verbosity of logging (1-3)", )
+    parser.add_argument("--stage-counts", nargs="+", type=int, default=[3, 4, 5, 6], metavar="K",
+                        help="numbers of memory blocks (X + 1) of searched codes [default: 3 4 5 6]")
+    parser.add_argument("--mask-count", type=int, default=2, metavar="N",
+                        help="number of feedback masks (outputs per input bit) [default: 2]")
+    parser.add_argument("--spectrum-terms", type=int, default=5, metavar="T",
+                        help="number of calculated weight spectrum terms starting with free distance "
+                             "[default: 5]")
+    parser.add_argument("--top", type=int, default=20, metavar="N",
+                        help="number of reported codes with the best ranking [default: 20]")
+    parser.add_argument("--batch-size", type=int, default=64, metavar="N",
+                        help="number of codes evaluated by single worker task [default: 64]")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="number of worker processes [default: number of CPUs]")
+    parser.add_argument("-o", "--output", default=None, metavar="FILE", help="write CSV to file instead of STDOUT")
+
+    arguments = parser.parse_args().__dict__
+    if arguments["mask_count"] < 1 or min(arguments["stage_counts"]) < 1:
+        parser.error("number of feedback masks and memory blocks must be positive")
+
+    if arguments["spectrum_terms"] < 1 or arguments["batch_size"] < 1:
+        parser.error("number of spectrum terms and batch size must be positive")
+
+    log_level = logging.ERROR - min(arguments["verbose"], logging.ERROR // 10) * 10
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s (%(name)s): %(message)s",
+        level=log_level,
+        datefmt="%Y-%m-%dT%H:%M:%S%z",
+    )
+
+    run(arguments)
@@ -0,0 +1,897 @@
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import typing
+from argparse import ArgumentParser
+
+logger = logging.getLogger("conformance")
+
+# characters of generated messages (including characters removed by encoder input filter)
+MESSAGE_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 -_"
+# maximum number of shrinking steps (candidate cases evaluated) per mismatch
+MAX_SHRINK_STEPS = 2000
+# number of results requested from decoders returning multiple interpretations
+K_BEST_RESULT_COUNT = 3
+# number of worker processes and observations per chunk of parallel decoding (chunks are shorter than messages)
+PARALLEL_WORKER_COUNT = 2
+PARALLEL_CHUNK_LENGTH = 24
+# number of bytes processed at once by chunked file engines (files span multiple chunks)
+FILE_CHUNK_SIZE = 5
+# code parameters used by default (catastrophic code with even weight feedback masks)
+DEFAULT_CODE = {"stage_count": 6, "feedback_masks": [53, 46], "puncture_pattern": None}
+# non-catastrophic code (K=7, 171 133 octal) used with traceback depths shorter than the received sequence
+BOUNDED_TRACEBACK_CODE = {"stage_count": 7, "feedback_masks": [121, 91], "puncture_pattern": None}
+# traceback depths of stream and file decoding (None is the default depth of 5 * stage count)
+BOUNDED_TRACEBACK_DEPTHS = [None, 7, 10, 16]
+# minimal distance of errors (in bits) kept for bounded traceback engines
+BOUNDED_TRACEBACK_ERROR_SPACING = 32
+
+
+def create_encoder(case: dict):
+    from convolutional_encoder import ConvolutionalEncoder
+    return ConvolutionalEncoder(case["stage_count"], case["feedback_masks"], puncture_pattern=case["puncture_pattern"])
+
+
+def create_decoder(decoder_class: type, case: dict, *args):
+    return decoder_class(case["stage_count"], case["feedback_masks"], None, case["puncture_pattern"], *args)
+
+
+def filter_output(memory: typing.List[int], feedback_masks: typing.List[int]) -> typing.List[int]:
+    """
+    Calculates encoder outputs of filter memory bit by bit (without any precomputed tables).
+
+    :param memory: filter memory (MSB->LSB), bits of shorter (flushed) filter keep their LSB aligned values
+    :param feedback_masks: list of feedback masks of memory blocks
+    :return: output bit of each feedback mask
+    """
+    outputs = [0 for _ in feedback_masks]
+    for bit_index, bit in enumerate(reversed(memory)):
+        for output_index, feedback_mask in enumerate(feedback_masks):
+            if (feedback_mask >> bit_index) & 1:
+                outputs[output_index] ^= bit
+
+    return outputs
+
+
+def encode_bit_serial(case: dict, data_in: str) -> typing.List[typing.List[int]]:
+    """
+    Encodes characters (in order of processing) by shift register updated bit by bit.
+
+    :return: transmitted output bits of each step in order of calculation (erased outputs are removed)
+    """
+    stage_count, feedback_masks = case["stage_count"], case["feedback_masks"]
+    outputs = []
+    if data_in:
+        memory = [0 for _ in range(stage_count)]
+        # each character is inserted from its LSB, output is calculated after each inserted bit
+        for char in data_in:
+            for bit_index in range(8):
+                memory = [(ord(char) >> bit_index) & 1] + memory[:-1]
+                outputs.append(filter_output(memory, feedback_masks))
+
+        # filter is flushed by removing its LSB until it is empty
+        for memory_length in range(stage_count - 1, 0, -1):
+            outputs.append(filter_output(memory[:memory_length], feedback_masks))
+
+    if case["puncture_pattern"] is None:
+        return outputs
+
+    # puncturing period starts with the first calculated output
+    columns = list(zip(*case["puncture_pattern"]))
+    return [
+        [bit for bit, kept in zip(output, columns[step % len(columns)]) if kept]
+        for step, output in enumerate(outputs)
+    ]
+
+
+def outputs_to_str(outputs: typing.Iterable[typing.List[int]]) -> str:
+    return "".join("".join(map(str, output)) for output in outputs)
+
+
+def encode_reference(case: dict) -> str:
+    """ Encodes message of the case bit by bit (the reference of all encoders). """
+    from convolutional_encoder import ConvolutionalEncoder
+    # message is processed from its last character, outputs are written in reversed order of calculation
+    data_in = ConvolutionalEncoder.filter_data_in(case["message"])
+    return outputs_to_str(reversed(encode_bit_serial(case, data_in[::-1])))
+
+
+def encode_unpunctured_reference(case: dict) -> str:
+    """ Encodes message of the case without puncturing (chunked and packed engines do not support it). """
+    return encode_reference(dict(case, puncture_pattern=None))
+
+
+def encode_stream_reference(case: dict) -> str:
+    """ Encodes message of the case bit by bit in order of its characters (the reference of stream encoding). """
+    from convolutional_encoder import ConvolutionalEncoder
+    data_in = ConvolutionalEncoder.filter_data_in(case["message"])
+    return outputs_to_str(encode_bit_serial(case, data_in))
+
+
+def received_sequence(case: dict) -> typing.Union[str, typing.List[float]]:
+    """
+    Creates channel output of the case - reference encoding with applied errors.
+
+    Errors are (position, magnitude) pairs, positions outside of the sequence are ignored.
+    Hard decision errors flip the bit, soft decision errors move BPSK symbol towards
+    the other bit value by the magnitude. Channel output precalculated in `received`
+    key of the case is used when present.
+    """
+    if "received" in case:
+        return case["received"]
+
+    data_in = encode_reference(case)
+    if not case["soft"]:
+        bits = list(data_in)
+        for position, _ in case["errors"]:
+            if position < len(bits):
+                bits[position] = "1" if bits[position] == "0" else "0"
+
+        return "".join(bits)
+
+    symbols = [1.0 if bit == "0" else -1.0 for bit in data_in]
+    for position, magnitude in case["errors"]:
+        if position < len(symbols):
+            symbols[position] -= math.copysign(magnitude, symbols[position])
+
+    return symbols
+
+
+def derived_case(case: dict, **changes) -> dict:
+    """ Returns copy of the case with changed parameters (precalculated channel output is dropped). """
+    case = dict(case, **changes)
+    case.pop("received", None)
+    return case
+
+
+def best_result(results: typing.List[typing.Tuple[typing.Union[int, float], str]]) \
+        -> typing.Optional[typing.Tuple[typing.Union[int, float], str]]:
+    """ Returns the most probable result of decoder (`None` when nothing was decoded). """
+    return tuple(results[0]) if results else None
+
+
+def decode_with(decoder, case: dict) -> typing.Optional[tuple]:
+    """ Decodes received sequence of the case by given decoder instance. """
+    data_in = received_sequence(case)
+    if case["soft"]:
+        return best_result(decoder.decode_soft(data_in, 1))
+
+    return best_result(decoder.decode(data_in, 1))
+
+
+def decode_k_best_with(decoder, case: dict, batch: bool = False) -> typing.List[tuple]:
+    """ Decodes received sequence of the case requesting multiple results (within batch padded by shorter frame). """
+    data_in = received_sequence(case)
+    if batch:
+        frames = [data_in, data_in[:len(data_in) // 2]]
+        if case["soft"]:
+            results = decoder.decode_soft_batch(frames, K_BEST_RESULT_COUNT)[0]
+        else:
+            results = decoder.decode_batch(frames, K_BEST_RESULT_COUNT)[0]
+    elif case["soft"]:
+        results = decoder.decode_soft(data_in, K_BEST_RESULT_COUNT)
+    else:
+        results = decoder.decode(data_in, K_BEST_RESULT_COUNT)
+
+    return [tuple(result) for result in results]
+
+
+def decode_batch_with(decoder, case: dict) -> typing.Optional[tuple]:
+    """ Decodes received sequence of the case within batch padded by shorter frame. """
+    data_in = received_sequence(case)
+    frames = [data_in, data_in[:len(data_in) // 2]]
+    if case["soft"]:
+        return best_result(decoder.decode_soft_batch(frames, 1)[0])
+
+    return best_result(decoder.decode_batch(frames, 1)[0])
+
+
+def received_observations(case: dict, data_in: typing.Sequence) -> typing.List[tuple]:
+    """
+    Splits received sequence to observations in order of processing (from the end of the sequence).
+
+    :return: list of (pairs of output index and received value, number of missing transmitted outputs)
+    """
+    output_count = len(case["feedback_masks"])
+    columns = [tuple(range(output_count))]
+    if case["puncture_pattern"] is not None:
+        columns = [tuple(output_index for output_index, kept in enumerate(column) if kept)
+                   for column in zip(*case["puncture_pattern"])]
+
+    observations = []
+    observation_end = len(data_in)
+    while observation_end > 0:
+        kept_outputs = columns[len(observations) % len(columns)]
+        observation_start = max(observation_end - len(kept_outputs), 0)
+        values = data_in[observation_start:observation_end]
+        # shorter observation holds the leading transmitted outputs of its step
+        observations.append((list(zip(kept_outputs, values)), len(kept_outputs) - len(values)))
+        observation_end = observation_start
+
+    return observations
+
+
+def branch_metric(output: typing.List[int], observation: tuple, soft: bool) -> typing.Union[int, float]:
+    """
+    Calculates cost of encoder output given received observation - Hamming distance (each missing
+    bit costs 1) or absolute value of each soft value disagreeing with the output bit.
+    """
+    received, missing_count = observation
+    if not soft:
+        return sum(int(value) != output[output_index] for output_index, value in received) + missing_count
+
+    cost = 0
+    for output_index, value in received:
+        cost += max(value, 0.0) if output[output_index] else max(-value, 0.0)
+
+    return cost
+
+
+def bits_to_str(data_out: typing.List[int], overhead_length: int) -> str:
+    """ Converts decoded bits (in order of processing) to ASCII string, incomplete bytes are dropped. """
+    data_out = data_out[:max(len(data_out) - overhead_length, 0)]
+    chars = [chr(sum(bit << bit_index for bit_index, bit in enumerate(data_out[byte_start:byte_start + 8])))
+             for byte_start in range(0, len(data_out) - 7, 8)]
+    # characters were decoded from the last one
+    return "".join(reversed(chars))
+
+
+def viterbi_reference(case: dict, max_result_count: int) -> typing.List[tuple]:
+    """
+    Decodes received sequence of the case by straightforward Viterbi algorithm (the reference of all decoders).
+
+    Path starts in state 0s, of two paths merging in the same state the one from the lower predecessor
+    is kept in case of equal costs. Results are the paths into each final state ordered by cost
+    (ties resolved by lower state), only the first path of each decoded string is kept.
+
+    :return: list of (path cost, decoded ASCII string)
+    """
+    stage_count, feedback_masks = case["stage_count"], case["feedback_masks"]
+    state_count = 1 << stage_count
+    # encoder outputs after inserting bit which leads to each of the states
+    outputs = [filter_output([(state >> bit_index) & 1 for bit_index in range(stage_count - 1, -1, -1)],
+                             feedback_masks) for state in range(state_count)]
+
+    # path metrics of all states (`None` for states which were not reached yet)
+    path_metrics = [0] + [None] * (state_count - 1)
+    decisions = []
+    for observation in received_observations(case, received_sequence(case)):
+        next_path_metrics = []
+        step_decisions = []
+        for state in range(state_count):
+            lower_predecessor = (state << 1) & (state_count - 1)
+            lower_cost, upper_cost = path_metrics[lower_predecessor], path_metrics[lower_predecessor | 1]
+            upper_selected = upper_cost is not None and (lower_cost is None or upper_cost < lower_cost)
+            cost = upper_cost if upper_selected else lower_cost
+            step_decisions.append(int(upper_selected))
+            next_path_metrics.append(None if cost is None else cost + branch_metric(outputs[state], observation,
+                                                                                    case["soft"]))
+
+        path_metrics = next_path_metrics
+        decisions.append(step_decisions)
+
+    results = []
+    final_states = sorted((cost, state) for state, cost in enumerate(path_metrics) if cost is not None)
+    for cost, final_state in final_states:
+        data_out = []
+        state = final_state
+        for step_decisions in reversed(decisions):
+            data_out.append(state >> (stage_count - 1))
+            state = ((state << 1) & (state_count - 1)) | step_decisions[state]
+
+        data_out.reverse()
+        data_out = bits_to_str(data_out, stage_count - 1)
+        if data_out not in (result for _, result in results):
+            results.append((cost, data_out))
+        if len(results) == max_result_count:
+            break
+
+    return results
+
+
+def decode_reference(case: dict) -> typing.Optional[tuple]:
+    return best_result(viterbi_reference(case, 1))
+
+
+def decode_k_best_reference(case: dict) -> typing.List[tuple]:
+    return viterbi_reference(case, K_BEST_RESULT_COUNT)
+
+
+def decode_text_reference(case: dict) -> str:
+    """ Decodes hard decisions of the case without puncturing (stream and file decoding do not support it). """
+    result = decode_reference(derived_case(case, puncture_pattern=None, soft=False))
+    return result[1] if result else ""
+
+
+def decode_default_code_reference(case: dict) -> typing.Optional[tuple]:
+    """ Decodes message and errors of the case encoded by the default code. """
+    return decode_reference(derived_case(case, **DEFAULT_CODE))
+
+
+def decode_parallel_with(decoder, case: dict) -> typing.Optional[tuple]:
+    """ Decodes received sequence of the case by multiple processes (split to multiple chunks). """
+    data_in = received_sequence(case)
+    if case["soft"]:
+        return best_result(decoder.decode_soft_parallel(data_in, PARALLEL_WORKER_COUNT, PARALLEL_CHUNK_LENGTH))
+
+    return best_result(decoder.decode_parallel(data_in, PARALLEL_WORKER_COUNT, PARALLEL_CHUNK_LENGTH))
+
+
+def decode_error_free_reference(case: dict) -> typing.Optional[tuple]:
+    """ Decodes channel output of the case without errors. """
+    return decode_reference(derived_case(case, errors=[]))
+
+
+def round_trip_reference(case: dict) -> str:
+    """ Returns message of the case as it should be decoded from error-free channel. """
+    from convolutional_encoder import ConvolutionalEncoder
+    return ConvolutionalEncoder.filter_data_in(case["message"])
+
+
+def encode_bulk(case: dict) -> str:
+    encoder = create_encoder(case)
+    return encoder.bulk_to_str(encoder.encode_bulk(case["message"]))
+
+
+def encode_batch(case: dict) -> str:
+    encoder = create_encoder(case)
+    message = case["message"]
+    return encoder.bulk_to_str(encoder.encode_batch([message, message[:len(message) // 2]])[0])
+
+
+def encode_stream(case: dict) -> str:
+    encoder = create_encoder(case)
+    message = case["message"]
+    # split the message to chunks of different lengths
+    chunk_ends = list(range(0, len(message), 3)) + [len(message)]
+    return "".join(encoder.encode_iter(message[start:end] for start, end in zip(chunk_ends, chunk_ends[1:])))
+
+
+def encode_packed(case: dict) -> str:
+    """ Writes sequence encoded by the table encoder in packed format and reads it back. """
+    from packed_format import read_packed, write_packed
+    encoder = create_encoder(case)
+    stream = io.BytesIO()
+    write_packed(stream, encoder.encode_to_str(case["message"]), case["stage_count"], case["feedback_masks"])
+    stream.seek(0)
+    data_out, stage_count, feedback_masks = read_packed(stream)
+    if (stage_count, feedback_masks) != (case["stage_count"], case["feedback_masks"]):
+        raise RuntimeError("Code parameters of packed sequence differ.")
+
+    return data_out
+
+
+def encode_chunked_file(case: dict) -> str:
+    """ Encodes message of the case stored in file in chunks of a few bytes. """
+    from chunked_io import encode_file
+    case = dict(case, puncture_pattern=None)
+    output = io.BytesIO()
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "message.txt")
+        with open(input_path, "wb") as input_file:
+            input_file.write(case["message"].encode("ascii"))
+
+        encode_file(create_encoder(case), input_path, output, FILE_CHUNK_SIZE)
+
+    return output.getvalue().decode("ascii").rstrip("\n")
+
+
+def unpunctured_hard_case(case: dict) -> typing.Tuple[dict, str, int]:
+    """
+    Returns the case without puncturing and with hard decisions (stream and file decoding do not support them),
+    its received sequence and traceback depth keeping all the decisions until the end of the sequence.
+    """
+    case = derived_case(case, puncture_pattern=None, soft=False)
+    data_in = received_sequence(case)
+    return case, data_in, max(len(data_in) // len(case["feedback_masks"]) + 1, case["stage_count"])
+
+
+def decode_stream_with(case: dict, data_in: str, traceback_depth: typing.Optional[int]) -> str:
+    """ Feeds observations of the received sequence (in order of processing) to stream decoding in parts. """
+    from convolutional_decoder import ConvolutionalDecoder
+    decoder = ConvolutionalDecoder(case["stage_count"], case["feedback_masks"], traceback_depth)
+
+    observation_length = len(case["feedback_masks"])
+    # stream encoder outputs observations in order of calculation (from the end of the sequence)
+    data_in = "".join(data_in[max(observation_end - observation_length, 0):observation_end]
+                      for observation_end in range(len(data_in), 0, -observation_length))
+    # split the sequence to parts of different lengths (not aligned to observations)
+    part_ends = list(range(0, len(data_in), 7)) + [len(data_in)]
+    data_out = "".join(decoder.feed(data_in[start:end]) for start, end in zip(part_ends, part_ends[1:]))
+    # characters are decoded from the last one
+    return (data_out + decoder.flush())[::-1]
+
+
+def decode_chunked_file_with(case: dict, data_in: str, traceback_depth: typing.Optional[int]) -> str:
+    """ Decodes received sequence stored in file in chunks of a few bytes. """
+    from chunked_io import decode_file
+    from convolutional_decoder import ConvolutionalDecoder
+    decoder = ConvolutionalDecoder(case["stage_count"], case["feedback_masks"], traceback_depth)
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_path, output_path = os.path.join(directory, "input.txt"), os.path.join(directory, "output.txt")
+        with open(input_path, "w") as input_file:
+            input_file.write(data_in + "\n")
+
+        decode_file(decoder, input_path, output_path, FILE_CHUNK_SIZE)
+        with open(output_path, "rb") as output_file:
+            return output_file.read().decode("latin-1").rstrip("\n")
+
+
+def decode_stream(case: dict) -> str:
+    return decode_stream_with(*unpunctured_hard_case(case))
+
+
+def decode_chunked_file(case: dict) -> str:
+    return decode_chunked_file_with(*unpunctured_hard_case(case))
+
+
+def bounded_traceback_case(case: dict) -> dict:
+    """
+    Returns the case encoded by non-catastrophic code (without puncturing, with hard decisions)
+    and with errors far enough from each other, so decisions committed after bounded traceback
+    depth are the same as decisions of the whole sequence.
+    """
+    errors = []
+    for position, magnitude in case["errors"]:
+        if not errors or position - errors[-1][0] >= BOUNDED_TRACEBACK_ERROR_SPACING:
+            errors.append((position, magnitude))
+
+    return derived_case(case, soft=False, errors=errors, **BOUNDED_TRACEBACK_CODE)
+
+
+def decode_bounded_traceback_reference(case: dict) -> typing.List[str]:
+    return [decode_text_reference(bounded_traceback_case(case))] * len(BOUNDED_TRACEBACK_DEPTHS)
+
+
+def decode_stream_bounded_traceback(case: dict) -> typing.List[str]:
+    case = bounded_traceback_case(case)
+    data_in = received_sequence(case)
+    return [decode_stream_with(case, data_in, traceback_depth) for traceback_depth in BOUNDED_TRACEBACK_DEPTHS]
+
+
+def decode_chunked_file_bounded_traceback(case: dict) -> typing.List[str]:
+    case = bounded_traceback_case(case)
+    data_in = received_sequence(case)
+    return [decode_chunked_file_with(case, data_in, traceback_depth) for traceback_depth in BOUNDED_TRACEBACK_DEPTHS]
+
+
+def decode_best_first(case: dict) -> typing.Optional[tuple]:
+    from convolutional_decoder import ConvolutionalDecoder
+    return decode_with(create_decoder(ConvolutionalDecoder, case), case)
+
+
+def decode_best_first_k_best(case: dict) -> typing.List[tuple]:
+    from convolutional_decoder import ConvolutionalDecoder
+    return decode_k_best_with(create_decoder(ConvolutionalDecoder, case), case)
+
+
+def decode_best_first_batch(case: dict) -> typing.Optional[tuple]:
+    from convolutional_decoder import ConvolutionalDecoder
+    return decode_batch_with(create_decoder(ConvolutionalDecoder, case), case)
+
+
+def decode_best_first_parallel(case: dict) -> typing.Optional[tuple]:
+    from convolutional_decoder import ConvolutionalDecoder
+    return decode_parallel_with(create_decoder(ConvolutionalDecoder, case), case)
+
+
+def decode_parallel_default_code(case: dict) -> typing.Optional[tuple]:
+    from convolutional_decoder import ConvolutionalDecoder
+    case = derived_case(case, **DEFAULT_CODE)
+    return decode_parallel_with(create_decoder(ConvolutionalDecoder, case), case)
+
+
+def decode_viterbi(case: dict) -> typing.Optional[tuple]:
+    from viterbi_decoder import ViterbiDecoder
+    return decode_with(create_decoder(ViterbiDecoder, case), case)
+
+
+def decode_viterbi_k_best(case: dict) -> typing.List[tuple]:
+    from viterbi_decoder import ViterbiDecoder
+    return decode_k_best_with(create_decoder(ViterbiDecoder, case), case)
+
+
+def decode_viterbi_batch_k_best(case: dict) -> typing.List[tuple]:
+    from viterbi_decoder import ViterbiDecoder
+    return decode_k_best_with(create_decoder(ViterbiDecoder, case), case, True)
+
+
+def decode_viterbi_batch(case: dict) -> typing.Optional[tuple]:
+    from viterbi_decoder import ViterbiDecoder
+    return decode_batch_with(create_decoder(ViterbiDecoder, case), case)
+
+
+def decode_viterbi_parallel(case: dict) -> typing.Optional[tuple]:
+    from viterbi_decoder import ViterbiDecoder
+    return decode_parallel_with(create_decoder(ViterbiDecoder, case), case)
+
+
+def decode_list_viterbi(case: dict) -> typing.Optional[tuple]:
+    from list_viterbi_decoder import ListViterbiDecoder
+    return decode_with(create_decoder(ListViterbiDecoder, case), case)
+
+
+def decode_list_viterbi_batch(case: dict) -> typing.Optional[tuple]:
+    from list_viterbi_decoder import ListViterbiDecoder
+    return decode_batch_with(create_decoder(ListViterbiDecoder, case), case)
+
+
+def decode_full_beam(case: dict) -> typing.Optional[tuple]:
+    from convolutional_decoder import BeamDecoder
+    # beam as wide as the number of states keeps all the Viterbi survivors
+    return decode_with(create_decoder(BeamDecoder, case, 1 << case["stage_count"]), case)
+
+
+def decode_full_beam_k_best(case: dict) -> typing.List[tuple]:
+    from convolutional_decoder import BeamDecoder
+    return decode_k_best_with(create_decoder(BeamDecoder, case, 1 << case["stage_count"]), case)
+
+
+def decode_stack_error_free(case: dict) -> typing.Optional[tuple]:
+    """ Decodes error-free channel output of the case by stack decoder (its search is not exhaustive). """
+    from convolutional_decoder import StackDecoder
+    case = derived_case(case, errors=[])
+    return decode_with(create_decoder(StackDecoder, case), case)
+
+
+def round_trip_container(case: dict) -> str:
+    """ Writes message of the case to container and decodes it by two slices (channel errors are not applied). """
+    from container_format import decode_container, write_container
+    from convolutional_decoder import ConvolutionalDecoder
+    # container does not support puncturing
+    case = dict(case, puncture_pattern=None)
+    container = io.BytesIO()
+    write_container(container, create_encoder(case), case["message"], case["checkpoint_interval"])
+
+    decoder = create_decoder(ConvolutionalDecoder, case)
+    middle = len(round_trip_reference(case)) // 2
+    return decode_container(container, decoder, 0, middle) + decode_container(container, decoder, middle)
+
+
+def distinct_results_with(decoder_classes: typing.List[type], case: dict, batch: bool) -> typing.Union[str, list]:
+    """
+    Decodes received sequence of the case by each decoder requesting multiple results
+    and checks that the results decode to different strings.
+
+    :param batch: decode the sequence within batch padded by shorter frame as well
+    :return: `distinct` or the first list of results containing the same string multiple times
+    """
+    data_in = received_sequence(case)
+    frames = [data_in, data_in[:len(data_in) // 2]]
+    for decoder_class in decoder_classes:
+        decoder = create_decoder(decoder_class, case)
+        if case["soft"]:
+            result_lists = [decoder.decode_soft(data_in, K_BEST_RESULT_COUNT)]
+            if batch:
+                result_lists += decoder.decode_soft_batch(frames, K_BEST_RESULT_COUNT)
+        else:
+            result_lists = [decoder.decode(data_in, K_BEST_RESULT_COUNT)]
+            if batch:
+                result_lists += decoder.decode_batch(frames, K_BEST_RESULT_COUNT)
+
+        for results in result_lists:
+            if len({data_out for _, data_out in results}) != len(results):
+                return [decoder_class.__name__, [list(result) for result in results]]
+
+    return "distinct"
+
+
+def distinct_results_reference(case: dict) -> str:
+    """ All the decoders must return results decoded to different strings. """
+    return "distinct"
+
+
+def best_first_distinct(case: dict) -> typing.Union[str, list]:
+    from convolutional_decoder import BeamDecoder, ConvolutionalDecoder, StackDecoder
+    # batch decoding of these decoders decodes one frame at a time
+    return distinct_results_with([ConvolutionalDecoder, BeamDecoder, StackDecoder], case, False)
+
+
+def viterbi_distinct(case: dict) -> typing.Union[str, list]:
+    from list_viterbi_decoder import ListViterbiDecoder
+    from viterbi_decoder import ViterbiDecoder
+    return distinct_results_with([ViterbiDecoder, ListViterbiDecoder], case, True)
+
+
+# reference implementations - all the engines of the same kind must produce the same results
+REFERENCES = {
+    "encode": encode_reference,
+    "encode-unpunctured": encode_unpunctured_reference,
+    "encode-stream": encode_stream_reference,
+    "decode": decode_reference,
+    "decode-k-best": decode_k_best_reference,
+    "decode-text": decode_text_reference,
+    "decode-bounded-traceback": decode_bounded_traceback_reference,
+    "decode-error-free": decode_error_free_reference,
+    "decode-default-code": decode_default_code_reference,
+    "round-trip": round_trip_reference,
+    "distinct": distinct_results_reference,
+}
+# tested engines - name: (kind, implementation, requires numpy)
+ENGINES = {
+    "bulk": ("encode", encode_bulk, True),
+    "batch": ("encode", encode_batch, True),
+    "stream": ("encode-stream", encode_stream, False),
+    "packed": ("encode", encode_packed, False),
+    "chunked-file": ("encode-unpunctured", encode_chunked_file, False),
+    "best-first": ("decode", decode_best_first, False),
+    "best-first-k-best": ("decode-k-best", decode_best_first_k_best, False),
+    "best-first-batch": ("decode", decode_best_first_batch, False),
+    "best-first-parallel": ("decode", decode_best_first_parallel, False),
+    "parallel-default-code": ("decode-default-code", decode_parallel_default_code, False),
+    "viterbi": ("decode", decode_viterbi, True),
+    "viterbi-k-best": ("decode-k-best", decode_viterbi_k_best, True),
+    "viterbi-batch": ("decode", decode_viterbi_batch, True),
+    "viterbi-batch-k-best": ("decode-k-best", decode_viterbi_batch_k_best, True),
+    "viterbi-parallel": ("decode", decode_viterbi_parallel, True),
+    "list-viterbi": ("decode", decode_list_viterbi, True),
+    "list-viterbi-batch": ("decode", decode_list_viterbi_batch, True),
+    "full-beam": ("decode", decode_full_beam, False),
+    "full-beam-k-best": ("decode-k-best", decode_full_beam_k_best, False),
+    "stack-error-free": ("decode-error-free", decode_stack_error_free, False),
+    "stream-decode": ("decode-text", decode_stream, False),
+    "chunked-file-decode": ("decode-text", decode_chunked_file, False),
+    "stream-decode-bounded-traceback": ("decode-bounded-traceback", decode_stream_bounded_traceback, False),
+    "chunked-file-decode-bounded-traceback": ("decode-bounded-traceback", decode_chunked_file_bounded_traceback,
+                                              False),
+    "container": ("round-trip", round_trip_container, False),
+    "best-first-distinct": ("distinct", best_first_distinct, False),
+    "viterbi-distinct": ("distinct", viterbi_distinct, True),
+}
+
+
+def available_engines(names: typing.Iterable[str]) -> typing.List[str]:
+    """ Returns names of engines which can run in current environment (optional dependencies are installed). """
+    from utils import numpy_available
+    has_numpy = numpy_available()
+
+    engines = []
+    for name in names:
+        if ENGINES[name][2] and not has_numpy:
+            logger.warning("engine %s requires numpy, skipping", name)
+            continue
+
+        engines.append(name)
+
+    return engines
+
+
+def generate_case(generator: random.Random, max_length: int, max_error_rate: float) -> dict:
+    """ Generates random code parameters, message and error pattern. """
+    # codes with more than 8 memory blocks have states spanning multiple characters
+    stage_count = generator.randint(2, 10)
+    mask_count = generator.randint(1, 3)
+    feedback_masks = [generator.randint(1, (1 << stage_count) - 1) for _ in range(mask_count)]
+
+    puncture_pattern = None
+    if mask_count > 1 and generator.random() < 0.3:
+        period = generator.randint(1, 4)
+        columns = [[generator.randint(0, 1) for _ in range(mask_count)] for _ in range(period)]
+        # each step must transmit at least single bit
+        for column in columns:
+            column[generator.randrange(mask_count)] = 1
+        puncture_pattern = [list(row) for row in zip(*columns)]
+
+    message = "".join(generator.choice(MESSAGE_ALPHABET) for _ in range(generator.randint(0, max_length)))
+    soft = generator.random() < 0.3
+    checkpoint_interval = generator.randint(1, 5)
+    # upper bound of the number of transmitted bits
+    bit_count = (len(message) * 8 + stage_count) * mask_count
+    error_count = sum(generator.random() < max_error_rate for _ in range(bit_count))
+    errors = sorted((generator.randrange(bit_count), round(generator.uniform(0.5, 2.5), 3))
+                    for _ in range(error_count))
+
+    return {"stage_count": stage_count, "feedback_masks": feedback_masks, "puncture_pattern": puncture_pattern,
+            "message": message, "soft": soft, "errors": errors, "checkpoint_interval": checkpoint_interval}
+
+
+def run_engine(function: typing.Callable, case: dict) -> tuple:
+    """ Runs engine and returns its result or type of raised exception. """
+    try:
+        return "ok", function(case)
+
+    except Exception as ex:
+        return "error", type(ex).__name__
+
+
+def values_equal(expected, actual) -> bool:
+    """ Compares outputs of engines - (cost, string) results of decoders or lists of them. """
+    if isinstance(expected, tuple) and isinstance(actual, tuple):
+        return expected[1] == actual[1] and math.isclose(expected[0], actual[0], rel_tol=1e-9, abs_tol=1e-9)
+
+    if isinstance(expected, list) and isinstance(actual, list):
+        return len(expected) == len(actual) and all(map(values_equal, expected, actual))
+
+    return expected == actual
+
+
+def results_equal(expected: tuple, actual: tuple) -> bool:
+    """ Compares results of engines (costs of soft decisions may differ by rounding errors). """
+    if expected[0] != actual[0] or expected[0] == "error":
+        return expected == actual
+
+    return values_equal(expected[1], actual[1])
+
+
+def is_mismatch(engine: str, case: dict) -> bool:
+    """ Determines whether engine produces different result than its reference. """
+    kind, function, _ = ENGINES[engine]
+    return not results_equal(run_engine(REFERENCES[kind], case), run_engine(function, case))
+
+
+def simplified_cases(case: dict) -> typing.Iterator[dict]:
+    """ Generates simpler variants of the case (used to shrink failing case). """
+    message, errors = case["message"], case["errors"]
+    if errors:
+        yield dict(case, errors=[])
+        for half in (errors[:len(errors) // 2], errors[len(errors) // 2:]):
+            if len(half) < len(errors):
+                yield dict(case, errors=half)
+        for error_index in range(len(errors)):
+            yield dict(case, errors=errors[:error_index] + errors[error_index + 1:])
+
+    if message:
+        for half in (message[:len(message) // 2], message[len(message) // 2:]):
+            yield dict(case, message=half)
+        for char_index in range(len(message)):
+            yield dict(case, message=message[:char_index] + message[char_index + 1:])
+        for char_index, char in enumerate(message):
+            if char != "a":
+                yield dict(case, message=message[:char_index] + "a" + message[char_index + 1:])
+
+    if case["soft"]:
+        yield dict(case, soft=False)
+
+    if case["puncture_pattern"] is not None:
+        yield dict(case, puncture_pattern=None)
+
+    feedback_masks = case["feedback_masks"]
+    if case["puncture_pattern"] is None and len(feedback_masks) > 1:
+        for mask_index in range(len(feedback_masks)):
+            yield dict(case, feedback_masks=feedback_masks[:mask_index] + feedback_masks[mask_index + 1:])
+
+    if case["stage_count"] > 1:
+        state_mask = (1 << (case["stage_count"] - 1)) - 1
+        reduced_masks = [feedback_mask & state_mask for feedback_mask in feedback_masks]
+        if all(reduced_masks):
+            yield dict(case, stage_count=case["stage_count"] - 1, feedback_masks=reduced_masks)
+
+    for mask_index, feedback_mask in enumerate(feedback_masks):
+        for bit_index in range(case["stage_count"]):
+            bit_value = 1 << bit_index
+            if feedback_mask & bit_value and feedback_mask != bit_value:
+                reduced_masks = list(feedback_masks)
+                reduced_masks[mask_index] = feedback_mask & ~bit_value
+                yield dict(case, feedback_masks=reduced_masks)
+
+
+def shrink_case(engine: str, case: dict) -> dict:
+    """ Repeatedly replaces failing case by its simpler variant which still fails. """
+    step_count = 0
+    simplified = True
+    while simplified and step_count < MAX_SHRINK_STEPS:
+        simplified = False
+        for candidate in simplified_cases(case):
+            step_count += 1
+            if is_mismatch(engine, candidate):
+                case = candidate
+                simplified = True
+                break
+
+            if step_count >= MAX_SHRINK_STEPS:
+                break
+
+    logger.info("case shrunk in %d steps", step_count)
+    return case
+
+
+def mismatch_report(engine: str, case: dict) -> dict:
+    """ Creates reproducer of mismatch - the case with results of the engine and its reference. """
+    kind, function, _ = ENGINES[engine]
+    return {"engine": engine, "case": case,
+            "expected": run_engine(REFERENCES[kind], case), "actual": run_engine(function, case)}
+
+
+def run_differential(args: dict, engines: typing.List[str]) -> int:
+    """ Compares results of engines with their references on random cases. """
+    generator = random.Random(args["seed"])
+    failing_engines = set()
+    reports = []
+    for case_index in range(args["cases"]):
+        case = generate_case(generator, args["max_length"], args["max_error_rate"])
+        for engine in engines:
+            if engine in failing_engines or not is_mismatch(engine, case):
+                continue
+
+            logger.error("engine %s differs from reference in case %d, shrinking", engine, case_index)
+            # the first mismatch of each engine is reported, later ones are likely the same bug
+            failing_engines.add(engine)
+            reports.append(mismatch_report(engine, shrink_case(engine, case)))
+
+    for report in reports:
+        print(json.dumps(report))
+
+    print("{:d} cases, {:d} engines, {:d} mismatching".format(args["cases"], len(engines), len(reports)),
+          file=sys.stderr)
+    return 1 if reports else 0
+
+
+def measure(function: typing.Callable, cases: typing.List[dict], repeat_count: int) -> typing.Tuple[float, list]:
+    """ Returns the best total duration of processing all the cases and results of the last run. """
+    best_seconds = None
+    results = []
+    for _ in range(repeat_count):
+        start = time.perf_counter()
+        results = [run_engine(function, case) for case in cases]
+        seconds = time.perf_counter() - start
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+
+    return best_seconds, results
+
+
+def run_timed(args: dict, engines: typing.List[str]) -> int:
+    """ Measures durations of engines and their references on the same random cases. """
+    generator = random.Random(args["seed"])
+    cases = [generate_case(generator, args["max_length"], args["max_error_rate"]) for _ in range(args["cases"])]
+    # channel output is calculated outside of measured decoding
+    cases = [dict(case, received=received_sequence(case)) for case in cases]
+
+    reference_timings = {}
+    mismatch_count = 0
+    print("{:<22s} {:>12s} {:>12s} {:>9s}".format("engine", "reference", "engine", "speedup"))
+    for engine in engines:
+        kind, function, _ = ENGINES[engine]
+        if kind not in reference_timings:
+            reference_timings[kind] = measure(REFERENCES[kind], cases, args["repeat"])
+
+        reference_seconds, reference_results = reference_timings[kind]
+        seconds, results = measure(function, cases, args["repeat"])
+        engine_mismatch_count = sum(not results_equal(expected, actual)
+                                    for expected, actual in zip(reference_results, results))
+        mismatch_count += engine_mismatch_count
+
+        print("{:<22s} {:>11.4f}s {:>11.4f}s {:>8.2f}x{:s}".format(
+            engine, reference_seconds, seconds, reference_seconds / seconds if seconds else math.inf,
+            " ({:d} mismatching)".format(engine_mismatch_count) if engine_mismatch_count else ""))
+
+    return 1 if mismatch_count else 0
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="compares results of optimized encoding and decoding engines "
+                                        "with the reference implementations")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="sets verbosity of logging (1-3)", )
+    parser.add_argument("--engines", nargs="*", choices=ENGINES.keys(), default=list(ENGINES.keys()),
+                        help="tested engines [default: all available]")
+    parser.add_argument("--cases", type=int, default=200, metavar="N",
+                        help="number of generated random cases [default: 200]")
+    parser.add_argument("--max-length", type=int, default=12, metavar="L",
+                        help="maximum number of characters of generated messages [default: 12]")
+    parser.add_argument("--max-error-rate", type=float, default=0.05, metavar="P",
+                        help="maximum probability of error of each transmitted bit [default: 0.05]")
+    parser.add_argument("--seed", type=int, default=0, help="seed of generated cases [default: 0]")
+    parser.add_argument("--timed", action="store_true",
+                        help="measure durations of engines and report speedup against the reference")
+    parser.add_argument("--repeat", type=int, default=3, metavar="N",
+                        help="number of measured runs in timed mode (the best one is reported) [default: 3]")
+
+    arguments = parser.parse_args().__dict__
+    log_level = logging.ERROR - min(arguments["verbose"], logging.ERROR // 10) * 10
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s (%(name)s): %(message)s",
+        level=log_level,
+        datefmt="%Y-%m-%dT%H:%M:%S%z",
+    )
+
+    selected_engines = available_engines(arguments["engines"])
+    if arguments["timed"]:
+        sys.exit(run_timed(arguments, selected_engines))
+
+    sys.exit(run_differential(arguments, selected_engines))
@@ -0,0 +1,241 @@
+import logging
+import struct
+import typing
+
+from convolution_filter import ConvolutionFilter
+from packed_format import FEEDBACK_MASK, pack_bits, unpack_bits
+from utils import state_to_int
+
+logger = logging.getLogger("container")
+
+# identification of seekable container and version of its format
+MAGIC = b"CNV2"
+# magic, number of memory blocks, number of feedback masks
+HEADER = struct.Struct(">4sBB")
+# identification of sync block preceding each segment
+SYNC_MARKER = b"SYNC"
+# marker, offset of the first character of the segment within the (filtered) message, number of characters,
+# encoder state before the segment is processed, encoder state after the segment is processed,
+# does the segment contain flushed filter values?, length of the segment binary sequence in bits
+SYNC_BLOCK = struct.Struct(">4sQIQQBQ")
+# byte offset of the sync block within the container, offset of the first character, number of characters
+INDEX_ENTRY = struct.Struct(">QQI")
+# byte offset of the index, number of index entries, marker
+FOOTER = struct.Struct(">QQ4s")
+# identification of the index footer
+FOOTER_MARKER = b"CNVI"
+# number of characters of single segment
+DEFAULT_CHECKPOINT_INTERVAL = 4096
+
+
+class Segment(typing.NamedTuple):
+    # byte offset of the sync block within the container
+    position: int
+    # offset of the first character of the segment within the (filtered) message
+    offset: int
+    # number of characters of the segment
+    length: int
+
+
+def write_container(stream: typing.BinaryIO, encoder, data_in: str,
+                    checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL):
+    """
+    Encodes message and writes it to binary stream as seekable container.
+
+    Message is split to segments of `checkpoint_interval` characters. Each segment
+    is preceded by sync block holding its offset and the encoder states in which its
+    processing starts and ends, so it can be decoded independently of the other segments
+    (see `ConvolutionalDecoder.decode_segment`). Concatenated binary sequences
+    of the segments are equal to the encoded message. Index of the segments is
+    stored at the end of the container.
+
+    :param stream: binary output stream (does not need to be seekable)
+    :param encoder: encoder instance (without puncturing)
+    :param data_in: ASCII string to be encoded
+    :param checkpoint_interval: number of characters of single segment
+    """
+    if encoder.puncture_pattern is not None:
+        raise RuntimeError("Container of punctured code is not supported.")
+    if checkpoint_interval < 1:
+        raise RuntimeError("Checkpoint interval must be positive.")
+
+    if encoder.filter_input:
+        # remove undesired input content, offsets are given within the filtered message
+        data_in = encoder.filter_data_in(data_in)
+
+    stage_count = encoder.filter.stage_count
+    feedback_masks = encoder.filter.feedback_masks
+    # number of bits of each filter output
+    output_length = len(feedback_masks)
+    # number of characters whose bits fill whole filter memory
+    lookahead_length = -(-stage_count // 8)
+
+    position = 0
+
+    def write(data: bytes):
+        nonlocal position
+        stream.write(data)
+        position += len(data)
+
+    write(HEADER.pack(MAGIC, stage_count, len(feedback_masks)))
+    for feedback_mask in feedback_masks:
+        write(FEEDBACK_MASK.pack(feedback_mask))
+
+    index = []
+    for segment_offset in range(0, len(data_in), checkpoint_interval):
+        segment_end = min(segment_offset + checkpoint_interval, len(data_in))
+        segment = data_in[segment_offset:segment_end]
+        lookahead = data_in[segment_end:segment_end + lookahead_length]
+
+        # state of the encoder after processing characters following the segment
+        state_filter = ConvolutionFilter(stage_count, feedback_masks)
+        state_filter.initialize()
+        for char in reversed(lookahead):
+            state_filter.insert_byte(ord(char))
+        initial_state = state_to_int(state_filter.state)
+
+        # state of the encoder after processing the segment (and flushing the filter after the first one)
+        for char in reversed(segment):
+            state_filter.insert_byte(ord(char))
+        has_overhead = segment_offset == 0
+        if has_overhead:
+            for _ in range(stage_count - 1):
+                state_filter.insert_and_shift(0)
+        final_state = state_to_int(state_filter.state)
+
+        # each character has 8 outputs, the message is preceded by the rest of flushed filter values
+        data_out = encoder.encode_to_str(segment + lookahead, flush_filter=True)
+        data_out = data_out[0 if has_overhead else (stage_count - 1) * output_length:
+                            len(data_out) - 8 * len(lookahead) * output_length]
+
+        index.append(Segment(position, segment_offset, len(segment)))
+        write(SYNC_BLOCK.pack(SYNC_MARKER, segment_offset, len(segment), initial_state, final_state,
+                              has_overhead, len(data_out)))
+        write(pack_bits(data_out))
+
+    index_position = position
+    for entry in index:
+        write(INDEX_ENTRY.pack(*entry))
+    write(FOOTER.pack(index_position, len(index), FOOTER_MARKER))
+
+
+def _read_exactly(stream: typing.BinaryIO, length: int) -> bytes:
+    """ Reads given number of bytes from binary stream. """
+    data = stream.read(length)
+    if len(data) != length:
+        raise RuntimeError("Container is truncated.")
+
+    return data
+
+
+def read_container_header(stream: typing.BinaryIO) -> typing.Tuple[int, typing.List[int]]:
+    """
+    Reads header of the container from the start of seekable binary stream.
+
+    :param stream: seekable binary input stream
+    :return: number of memory blocks and list of feedback masks of the code
+    """
+    stream.seek(0)
+    magic, stage_count, feedback_mask_count = HEADER.unpack(_read_exactly(stream, HEADER.size))
+    if magic != MAGIC:
+        raise RuntimeError("Input is not a container.")
+
+    feedback_masks = [
+        FEEDBACK_MASK.unpack(_read_exactly(stream, FEEDBACK_MASK.size))[0]
+        for _ in range(feedback_mask_count)
+    ]
+    return stage_count, feedback_masks
+
+
+def read_container_index(stream: typing.BinaryIO) -> typing.List[Segment]:
+    """
+    Reads index of segments of the container from seekable binary stream.
+
+    When the index footer is missing (e.g. the container is truncated), the segments
+    are found by walking the sync blocks from the start of the container.
+
+    :param stream: seekable binary input stream
+    :return: segments in order of their offsets
+    """
+    stage_count, feedback_masks = read_container_header(stream)
+    first_segment_position = HEADER.size + FEEDBACK_MASK.size * len(feedback_masks)
+
+    container_size = stream.seek(0, 2)
+    if container_size >= first_segment_position + FOOTER.size:
+        stream.seek(container_size - FOOTER.size)
+        index_position, entry_count, marker = FOOTER.unpack(_read_exactly(stream, FOOTER.size))
+        if marker == FOOTER_MARKER and index_position + entry_count * INDEX_ENTRY.size + FOOTER.size == container_size:
+            stream.seek(index_position)
+            return [Segment(*INDEX_ENTRY.unpack(_read_exactly(stream, INDEX_ENTRY.size)))
+                    for _ in range(entry_count)]
+
+    # index is not available - walk the sync blocks
+    index = []
+    position = first_segment_position
+    while position + SYNC_BLOCK.size <= container_size:
+        stream.seek(position)
+        marker, offset, length, _, _, _, bit_length = SYNC_BLOCK.unpack(_read_exactly(stream, SYNC_BLOCK.size))
+        segment_size = SYNC_BLOCK.size + -(-bit_length // 8)
+        if marker != SYNC_MARKER or position + segment_size > container_size:
+            break
+
+        index.append(Segment(position, offset, length))
+        position += segment_size
+
+    return index
+
+
+def read_segment(stream: typing.BinaryIO, segment: Segment) -> typing.Tuple[str, int, bool, int]:
+    """
+    Reads binary sequence of single segment from seekable binary stream.
+
+    :param stream: seekable binary input stream
+    :param segment: segment from the index of the container
+    :return: binary sequence of [01] characters, encoder state in which its processing
+             starts, whether it contains flushed filter values and encoder state in which
+             its processing ends (arguments of `ConvolutionalDecoder.decode_segment`)
+    """
+    stream.seek(segment.position)
+    marker, _, _, initial_state, final_state, has_overhead, bit_length = SYNC_BLOCK.unpack(
+        _read_exactly(stream, SYNC_BLOCK.size))
+    if marker != SYNC_MARKER:
+        raise RuntimeError("Sync block of segment at offset {:d} is corrupted.".format(segment.offset))
+
+    data_in = unpack_bits(_read_exactly(stream, -(-bit_length // 8)), bit_length)
+    return data_in, initial_state, bool(has_overhead), final_state
+
+
+def decode_container(stream: typing.BinaryIO, decoder, start: int = 0, end: int = None, worker_count: int = 1) -> str:
+    """
+    Decodes given range of characters of the message stored in seekable container.
+
+    Only the segments overlapping the range are read and decoded, each of them
+    independently of the others (in parallel when more workers are requested)
+    using paths between its recorded initial and final encoder states.
+
+    :param stream: seekable binary input stream
+    :param decoder: decoder instance of the code used by encoder (without puncturing)
+    :param start: offset of the first decoded character (within the filtered message)
+    :param end: offset after the last decoded character (default: end of the message)
+    :param worker_count: number of worker processes
+    :return: decoded ASCII string of the range
+    """
+    stage_count, feedback_masks = read_container_header(stream)
+    if (stage_count, feedback_masks) != (decoder.stage_count, list(decoder.feedback_masks)):
+        raise RuntimeError("Container was encoded using different code parameters "
+                           "(memory blocks: {:d}, feedback masks: {}).".format(stage_count - 1, feedback_masks))
+
+    index = read_container_index(stream)
+    if end is None:
+        end = index[-1].offset + index[-1].length if index else 0
+
+    segments = [segment for segment in index if segment.offset < end and start < segment.offset + segment.length]
+    if not segments:
+        return ""
+
+    logger.info("decoding %d of %d segments (characters %d-%d)", len(segments), len(index), start, end)
+    # segments are read lazily when decoded by single process
+    data_out = "".join(decoder.decode_segments((read_segment(stream, segment) for segment in segments),
+                                               worker_count))
+    first_offset = segments[0].offset
+    return data_out[max(start - first_offset, 0):end - first_offset]
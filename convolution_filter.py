@@ -1,8 +1,8 @@
 import logging
 import typing
-from collections import deque
 
-from utils import State
+from trellis import get_trellis
+from utils import State, int_to_state, state_to_int
 
 logger = logging.getLogger("filter")
 
@@ -19,7 +19,12 @@ class ConvolutionFilter(object):
         self.stage_count = stage_count
         self.feedback_masks = feedback_masks
 
-        self._memory = deque()
+        # precomputed encoder outputs for all possible filter states
+        self._trellis = get_trellis(stage_count, feedback_masks)
+        # filter memory stored as integer shift register (MSB->LSB)
+        self._memory = 0
+        # number of currently occupied memory blocks
+        self._memory_length = 0
 
     def __str__(self):
         return str(self.state)
@@ -27,12 +32,12 @@ class ConvolutionFilter(object):
     @property
     def state(self) -> State:
         """ Returns current filter state. """
-        return State(list(self._memory))
+        return int_to_state(self._memory, self._memory_length)
 
     @property
     def empty(self) -> bool:
         """ Returns true is the filter is empty. """
-        return not bool(self._memory)
+        return not self._memory_length
 
     def initialize(self, state: State = None, first_bit: int = 0):
         """
@@ -44,7 +49,8 @@ class ConvolutionFilter(object):
             logger.critical("invalid initialization state vector %s", state)
             raise RuntimeError("Tried to initialize invalid filter state.")
 
-        self._memory = state if state else deque([first_bit] + [0 for _ in range(self.stage_count - 1)])
+        self._memory = state_to_int(state) if state else first_bit << (self.stage_count - 1)
+        self._memory_length = self.stage_count
         logger.debug("%s - convolution filter initialized", self)
 
     def insert_and_shift(self, memory_bit: int):
@@ -53,37 +59,50 @@ class ConvolutionFilter(object):
 
         :param memory_bit: bit value (0, 1) to be stored
         """
-        # insert new element at the MSB position - "shift" everything right
-        self._memory.appendleft(memory_bit)
-        # remove last extra element (at the LSB position)
-        self._memory.pop()
-        logger.debug("%s - inserted '%d' and shifted right", self, memory_bit)
+        if self._memory_length:
+            # "shift" everything right (removing the LSB) and insert new element at the MSB position
+            self._memory = (memory_bit << (self._memory_length - 1)) | (self._memory >> 1)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s - inserted '%d' and shifted right", self, memory_bit)
 
     def shift(self):
         """ Shifts the filter state right (does not add any new elements - can empty the filter). """
         # "shift" everything right
-        self._memory.pop()
-        logger.debug("%s - shifted right", self)
+        self._memory >>= 1
+        self._memory_length -= 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s - shifted right", self)
     
     @property
     def output(self) -> typing.List[int]:
         """ Calculates result for current filter state. """
-        outputs = [0 for _ in self.feedback_masks]
-        logger.debug("%s - calculating output with current state", self.state)
+        # bits of the shorter (flushed) filter keep their LSB aligned values
+        # so the output equals output of full filter in the same integer state
+        outputs = self._trellis.output(self._memory)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s - calculated output %s", self, outputs)
 
-        # for each bit in convolution filter do
-        # (filter bits are in MSB->LSB order)
-        for filter_bit, filter_bit_index in zip(self.state, range(len(self.state) - 1, -1, -1)):
-            # calculate bit mask from current index
-            filter_bit_value = pow(2, filter_bit_index)
+        return outputs
 
-            # for each feedback mask (corresponding to result bit)
-            for output_bit_index, feedback_mask in enumerate(self.feedback_masks):
-                # does bit mask match with feedback mask?
-                if filter_bit_value & feedback_mask:
-                    outputs[output_bit_index] ^= filter_bit  # perform binary XOR
+    @property
+    def emission(self) -> int:
+        """ Calculates packed result (see `Trellis.emissions`) for current filter state. """
+        return self._trellis.emissions[self._memory]
 
-            logger.debug("bit_mask=%3d bit_value=%d out=%s", filter_bit_value, filter_bit, outputs)
+    def insert_byte(self, byte_value: int) -> typing.Tuple[int, ...]:
+        """
+        Calculates results and inserts bits of whole byte (LSB first) using single table lookup.
+        This is equivalent to calling `output` and `insert_and_shift` for each of the bits.
 
-        # output two resulting bits
-        return outputs
+        :param byte_value: byte to be stored
+        :return: packed results (see `Trellis.emissions`) in order of calculation
+        """
+        if self._memory_length != self.stage_count:
+            raise RuntimeError("Tried to insert byte into filter which is not initialized.")
+
+        emissions, self._memory = self._trellis.byte_transitions(self._memory)[byte_value]
+        return emissions
+
+    def unpack_output(self, emission: int) -> typing.List[int]:
+        """ Converts packed result to list of output bits (same as `output`). """
+        return list(self._trellis.unpacked_emissions[emission])
@@ -1,72 +1,272 @@
+import heapq
 import logging
+import math
+import os
 import re
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from queue import PriorityQueue
 
+from profiling import profile_phase
+from trellis import Trellis, get_trellis, share_trellis
 from utils import *
 
 logger = logging.getLogger("decoder")
 
+# decoder instance of worker process used in parallel decoding
+_worker_decoder = None
+
+
+def _initialize_worker(decoder_class: type, trellis: Trellis, traceback_depth: int):
+    """ Creates decoder instance of worker process reusing trellis built by the parent process. """
+    global _worker_decoder
+    share_trellis(trellis)
+    _worker_decoder = decoder_class(trellis.stage_count, trellis.feedback_masks, traceback_depth)
+
+
+def _decode_window_task(observations: typing.List[typing.List], from_initial_state: bool,
+                        chunk_offset: int, chunk_length: int) -> typing.List[int]:
+    """ Decodes window of observations in worker process and returns decoded bits of its chunk. """
+    data_out = _worker_decoder._decode_window(observations, from_initial_state)
+    return data_out[chunk_offset:chunk_offset + chunk_length]
+
+
+def _decode_segment_task(data_in: str, initial_state: int, has_overhead: bool, final_state: int) -> str:
+    """ Decodes single segment of seekable container in worker process. """
+    return _worker_decoder.decode_segment(data_in, initial_state, has_overhead, final_state)[0][1]
+
 
 class ConvolutionalDecoder(object):
 
-    def __init__(self, stage_count: int, feedback_masks: typing.List[int]):
+    # path metric of states which were not reached yet
+    STREAM_UNREACHABLE_COST = 1 << 62
+
+    def __init__(self, stage_count: int, feedback_masks: typing.List[int], traceback_depth: int = None,
+                 puncture_pattern: typing.List[typing.List[int]] = None):
         """
         Initializes convolutional decoder.
 
         :param stage_count: number of memory blocks
         :param feedback_masks: list of feedback masks of memory blocks
+        :param traceback_depth: number of trellis steps after which stream decoding decisions are final
+        :param puncture_pattern: puncturing matrix used by encoder (see `check_puncture_pattern`)
         """
         self.stage_count = stage_count
         self.feedback_masks = feedback_masks
 
-        # generate all encoder states
-        self._states = all_states(stage_count)
-        # generate table of encoder results in all possible states with all possible inputs
-        self._emissions = emission_table(stage_count, feedback_masks)
+        if puncture_pattern is not None:
+            check_puncture_pattern(puncture_pattern, len(feedback_masks))
+        self.puncture_pattern = puncture_pattern
+
+        if traceback_depth is None:
+            # commonly used rule of thumb - decisions older than ~5 constraint lengths are reliable
+            traceback_depth = 5 * stage_count
+        if traceback_depth < stage_count:
+            raise RuntimeError("Traceback depth must not be lower than number of memory blocks.")
+        self.traceback_depth = traceback_depth
+
+        # generate integer based trellis of the code
+        self._trellis = get_trellis(stage_count, feedback_masks)
+        # initial encoder state (all memory blocks empty)
+        self._initial_state = 0
+        # encoder state in which the decoded paths must end (any state when not set)
+        self._final_state = None
+        # number of decoded bits of flushed filter values (stripped from the decoded sequence)
+        self._overhead_length = stage_count - 1
+        # table of packed encoder results in all possible states
+        self._emissions = self._trellis.emissions
         logger.debug("calculated emission table: %s", self._emissions)
-        # generate table of encoder state transitions between all possible states with all possible inputs
-        self._transitions = transition_table(stage_count)
+        # table of encoder state transitions between all possible states with all possible inputs
+        self._transitions = self._trellis.transitions
         logger.debug("calculated transition table: %s", self._transitions)
 
         # initialize priority queue which will contain unprocessed states
         # going over encoder transitions and reverse-generating encoded data
         self._unprocessed_states = PriorityQueue()
-        # initialize dictionary which will contain currently lowest cost of state per iteration
-        self._lowest_iteration_cost = defaultdict(dict)
+        # initialize survivor memory - bit per state per iteration marking registered
+        # paths and bit per state per iteration holding their selected predecessor
+        self._registered_paths = []
+        self._path_decisions = []
+
+        # collected counters and phase timings (see `ProfileStats`), disabled when not set
+        self.stats = None
 
-    def _initialize_decoder(self):
-        """ Re-initializes priority queue and list of best path costs. """
+        # initialize inner state of stream decoding
+        self._initialize_stream()
+
+    def _initialize_decoder(self, observation_count: int = 0):
+        """ Re-initializes priority queue and survivor memory for given number of observations. """
         self._unprocessed_states = PriorityQueue()
-        self._lowest_iteration_cost = defaultdict(dict)
+        # rows of survivor memory are allocated once the iteration is reached
+        self._registered_paths = [None] * (observation_count + 1)
+        self._path_decisions = [None] * (observation_count + 1)
 
-    def _create_unprocessed_state(self, state_cost: int, current_state: str, data_out: typing.List[int], data_in: str):
-        """ Creates new unprocessed state and stores it to priority queue (ordered by path cost). """
-        logger.debug("creating new branch to %s with cost %s", current_state, state_cost)
-        self._unprocessed_states.put((state_cost, current_state, data_out, data_in))
+    def _create_unprocessed_state(self, state_cost: int, current_state: int, observation_index: int,
+                                  decision: int):
+        """
+        Creates new unprocessed state and stores it to priority queue (ordered by path cost,
+        then by iteration, state and selected predecessor).
+        """
+        logger.debug("creating new branch to %d with cost %s", current_state, state_cost)
+        self._unprocessed_states.put((state_cost, observation_index, current_state, decision))
 
-    def _get_unprocessed_state(self) -> typing.Tuple[int, str, typing.List[int], str]:
+    def _get_unprocessed_state(self) -> typing.Tuple[int, int, int, int]:
         """ Returns currently best unprocessed state from priority queue (ordered by path cost). """
         return self._unprocessed_states.get()
 
-    def _get_best_path_cost(self, current_iteration: int, current_state: str) -> typing.Union[int, None]:
-        """ Returns currently best registered solution path for given iteration and state. """
-        if current_state not in self._lowest_iteration_cost[current_iteration]:
-            return None
+    def _does_better_path_exist(self, current_iteration: int, current_state: int) -> bool:
+        """
+        Determines whether better path exists for given iteration and state.
+
+        Paths are processed in order of their cost (and iteration), so any path
+        registered before is at least as good as the current one.
+        """
+        row = self._registered_paths[current_iteration]
+        return row is not None and bool(row[current_state >> 3] & (1 << (current_state & 7)))
+
+    def _register_best_path(self, current_iteration: int, current_state: int, decision: int):
+        """ Registers best path for given iteration and state and stores its selected predecessor. """
+        row = self._registered_paths[current_iteration]
+        if row is None:
+            row_length = max(self._trellis.state_count >> 3, 1)
+            row = self._registered_paths[current_iteration] = bytearray(row_length)
+            self._path_decisions[current_iteration] = bytearray(row_length)
 
-        return self._lowest_iteration_cost[current_iteration][current_state]
+        row[current_state >> 3] |= 1 << (current_state & 7)
+        self._path_decisions[current_iteration][current_state >> 3] |= decision << (current_state & 7)
 
-    def _does_better_path_exist(self, current_iteration: int, current_cost: int, current_state: str) -> bool:
-        """ Determines whether better path exists for given iteration and state. """
-        current_best_cost = self._get_best_path_cost(current_iteration, current_state)
-        return current_best_cost <= current_cost if current_best_cost is not None else False
+    def _traceback_path(self, final_iteration: int, final_state: int) -> typing.List[int]:
+        """
+        Reconstructs decoded binary sequence of registered path leading to given state.
+
+        :param final_iteration: iteration in which the path ends
+        :param final_state: state in which the path ends
+        :return: decoded binary sequence (in order of processing)
+        """
+        state_mask = self._trellis.state_count - 1
+        input_bit_shift = self.stage_count - 1
+        data_out = []
+        current_state = final_state
+        # follow selected predecessors from the last iteration to the first one
+        for iteration in range(final_iteration, 0, -1):
+            data_out.append(current_state >> input_bit_shift)
+            decision = (self._path_decisions[iteration][current_state >> 3] >> (current_state & 7)) & 1
+            current_state = ((current_state << 1) & state_mask) | decision
 
-    def _register_best_path_cost(self, current_iteration: int, current_cost: int, current_state: str):
-        """ Saves new best path cost for given iteration and state. """
-        self._lowest_iteration_cost[current_iteration][current_state] = current_cost
+        data_out.reverse()
+        return data_out
 
     @classmethod
     def filter_data_in(cls, data_in: str) -> str:
-        return "".join(re.findall(r"[01]", data_in))
+        return re.sub(r"[^01]+", "", data_in)
+
+    @classmethod
+    def parse_soft_data_in(cls, data_in: str) -> typing.List[float]:
+        """ Converts whitespace separated soft values to list of floats. """
+        return [float(value) for value in data_in.split()]
+
+    @classmethod
+    def dequantize_soft_data_in(cls, data_in: typing.Iterable[int], bit_count: int) -> typing.List[float]:
+        """
+        Converts quantized soft decisions to soft values.
+
+        Quantized value 0 represents the most confident 0 bit, value `2^bit_count - 1`
+        represents the most confident 1 bit.
+
+        :param data_in: quantized soft decisions
+        :param bit_count: number of bits of each quantized value
+        :return: soft values in range <-1; 1>
+        """
+        max_value = (1 << bit_count) - 1
+        data_out = []
+        for value in data_in:
+            if not 0 <= value <= max_value:
+                raise RuntimeError("Quantized soft value {:d} is out of {:d}-bit range.".format(value, bit_count))
+
+            data_out.append((max_value - 2 * value) / max_value)
+
+        return data_out
+
+    def _split_observations(self, data_in: typing.Sequence, metrics_function: typing.Callable) \
+            -> typing.List[typing.List]:
+        """
+        Splits received sequence to observations (in order of processing)
+        and returns branch metrics of all possible packed emissions for each of them.
+
+        :param data_in: received sequence
+        :param metrics_function: function calculating branch metrics of single observation
+        :return: list of branch metrics per observation
+        """
+        observation_length = self._trellis.output_count
+        metrics = []
+
+        # observations are processed from the end of the sequence
+        for observation_end in range(len(data_in), 0, -observation_length):
+            observation = data_in[max(observation_end - observation_length, 0):observation_end]
+            metrics.append(metrics_function(observation))
+
+        return metrics
+
+    def _split_punctured_observations(self, data_in: typing.Sequence, metrics_function: typing.Callable) \
+            -> typing.List[typing.List]:
+        """
+        Splits received sequence of punctured code to observations (in order of processing)
+        and returns branch metrics of all possible packed emissions for each of them.
+
+        Length of each observation is given by the number of outputs transmitted
+        in its step, puncturing period starts with the first processed observation.
+
+        :param data_in: received sequence
+        :param metrics_function: function calculating branch metrics of single observation
+                                 and indices of its transmitted outputs
+        :return: list of branch metrics per observation
+        """
+        # indices of outputs transmitted in each step of puncturing period
+        kept_outputs = [
+            tuple(output_index for output_index, kept in enumerate(column) if kept)
+            for column in zip(*self.puncture_pattern)
+        ]
+        metrics = []
+
+        # observations are processed from the end of the sequence
+        observation_end = len(data_in)
+        while observation_end > 0:
+            step_kept_outputs = kept_outputs[len(metrics) % len(kept_outputs)]
+            observation_start = max(observation_end - len(step_kept_outputs), 0)
+            metrics.append(metrics_function(data_in[observation_start:observation_end], step_kept_outputs))
+            observation_end = observation_start
+
+        return metrics
+
+    def observation_metrics(self, data_in: str) -> typing.List[typing.List[int]]:
+        """
+        Splits filtered binary sequence to observations (in order of processing)
+        and returns branch metrics of all possible packed emissions for each of them.
+
+        :param data_in: filtered binary sequence
+        :return: list of branch metrics per observation
+        """
+        if self.puncture_pattern is not None:
+            # erased outputs are re-inserted with zero branch metric
+            return self._split_punctured_observations(data_in, self._trellis.punctured_observation_metrics)
+
+        return self._split_observations(data_in, self._trellis.observation_metrics)
+
+    def soft_observation_metrics(self, data_in: typing.Sequence[float]) -> typing.List[typing.List[float]]:
+        """
+        Splits sequence of soft values to observations (in order of processing)
+        and returns correlation branch metrics of all possible packed emissions for each of them.
+
+        :param data_in: soft values (positive for 0 bits, negative for 1 bits)
+        :return: list of branch metrics per observation
+        """
+        if self.puncture_pattern is not None:
+            # erased outputs are re-inserted with zero branch metric
+            return self._split_punctured_observations(data_in, self._trellis.punctured_soft_observation_metrics)
+
+        return self._split_observations(data_in, self._trellis.soft_observation_metrics)
 
     def int_binary_to_str(self, data_in: typing.List[int]) -> str:
         """
@@ -76,13 +276,17 @@ class ConvolutionalDecoder(object):
         :param data_in: binary sequence to be converted
         :return: ASCII string
         """
-        logger.info("converting decoded binary data: '%s'", state_to_str(data_in))
+        # expensive debug messages are created only when they are going to be logged
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("converting decoded binary data: '%s'", state_to_str(data_in))
 
-        overhead_length = self.stage_count - 1
-        logger.debug("stripping filter overhead of %d bits: %s",
-            overhead_length, state_to_str(data_in[-overhead_length:]))
+        overhead_length = self._overhead_length
+        if debug:
+            logger.debug("stripping filter overhead of %d bits: %s",
+                overhead_length, state_to_str(data_in[len(data_in) - overhead_length:]))
 
-        data_in = data_in[:-overhead_length]
+        data_in = data_in[:len(data_in) - overhead_length]
         if len(data_in) < 8:
             # there is not enough bytes for whole byte
             logger.warning("there is not enough bits for whole byte: %s", repr(state_to_str(data_in)))
@@ -100,12 +304,14 @@ class ConvolutionalDecoder(object):
 
             # does current bit belong to another byte?
             if bit_index % 8 == 7:
-                logger.debug("converting current byte to ASCII character: %d -> %s", byte_value, chr(byte_value))
+                if debug:
+                    logger.debug("converting current byte to ASCII character: %d -> %s", byte_value, chr(byte_value))
                 # convert current byte value to ASCII character
                 result.append(chr(byte_value))
                 # reset byte value
                 byte_value = 0
-                logger.debug("data to be processed: '%s'", state_to_str(data_in)[bit_index + 1:])
+                if debug:
+                    logger.debug("data to be processed: '%s'", state_to_str(data_in)[bit_index + 1:])
 
                 if data_in[bit_index + 1:] and bit_index + 8 + 1 > len(data_in):
                     # there is not enough bytes for whole byte left
@@ -117,6 +323,52 @@ class ConvolutionalDecoder(object):
         # create final string and return as result
         return "".join(result)
 
+    def _distinct_solution_string(self, data_out: typing.List[int], decoded_strings: typing.Set[str]) \
+            -> typing.Optional[str]:
+        """
+        Converts solution to ASCII string when it differs from strings of the previously found
+        solutions - paths differing only in stripped filter overhead (or in bits of incomplete
+        trailing byte) decode to the same string.
+
+        :param data_out: decoded binary sequence of the solution
+        :param decoded_strings: ASCII strings of the previously found solutions (updated)
+        :return: decoded ASCII string of the solution, `None` when it is not distinct
+        """
+        data_out = self.int_binary_to_str(data_out)
+        if data_out in decoded_strings:
+            logger.debug("skipping solution decoded to the same string as better solution")
+            return None
+
+        decoded_strings.add(data_out)
+        return data_out
+
+    def _distinct_results(self, solutions: typing.Iterable[typing.Tuple[typing.Union[int, float], typing.List[int]]],
+                          max_result_count: int) -> typing.List[typing.Tuple[typing.Union[int, float], str]]:
+        """
+        Converts solutions to ASCII strings keeping only the first solution of each string.
+
+        :param solutions: (path cost, decoded binary sequence) ordered by path cost, traced back lazily
+        :param max_result_count: maximum number of possible interpretations returned
+        :return: list of (path cost, decoded ASCII string)
+        """
+        results = []
+        decoded_strings = set()
+        solutions = iter(solutions)
+        while len(results) < max_result_count:
+            with profile_phase(self.stats, "traceback"):
+                solution = next(solutions, None)
+            if solution is None:
+                break
+
+            cost, data_out = solution
+            # convert found solution to ASCII string
+            with profile_phase(self.stats, "int_binary_to_str"):
+                data_out = self._distinct_solution_string(data_out, decoded_strings)
+            if data_out is not None:
+                results.append((cost, data_out))
+
+        return results
+
     def decode(self, data_in: str, max_result_count: int = 3) -> typing.List[typing.Tuple[int, str]]:
         """
         Decodes provided binary sequence to ASCII string.
@@ -127,56 +379,215 @@ class ConvolutionalDecoder(object):
         """
         # remove undesired input content
         data_in = self.filter_data_in(data_in)
+        # precompute branch metrics of each observation
+        with profile_phase(self.stats, "observation metrics"):
+            observations = self.observation_metrics(data_in)
+
+        return self._decode_observations(observations, max_result_count)
+
+    def decode_segment(self, data_in: str, initial_state: int, has_overhead: bool = False,
+                       final_state: int = None, max_result_count: int = 1) -> typing.List[typing.Tuple[int, str]]:
+        """
+        Decodes binary sequence of single segment of the message (see `container_format`).
+
+        Decoding starts in the provided encoder state instead of the empty filter
+        and only paths ending in the provided final state are considered - bits
+        processed the last are otherwise weakly protected (or not protected at all
+        when outputs of the code do not depend on the most recent input bit).
+        Filter overhead is stripped only from the segment holding the start
+        of the message (processed the last).
+
+        :param data_in: binary sequence of the segment
+        :param initial_state: encoder state before the first bit of the segment is processed
+        :param has_overhead: does the sequence contain flushed filter values?
+        :param final_state: encoder state after the last bit of the segment is processed (any state when not set)
+        :param max_result_count: maximum number of possible interpretations returned
+        :return: decoded ASCII string of the segment
+        """
+        if not 0 <= initial_state < self._trellis.state_count:
+            raise RuntimeError("Invalid initial state of the segment.")
+        if final_state is not None and not 0 <= final_state < self._trellis.state_count:
+            raise RuntimeError("Invalid final state of the segment.")
+
+        self._initial_state = initial_state
+        self._final_state = final_state
+        self._overhead_length = self.stage_count - 1 if has_overhead else 0
+        try:
+            results = self.decode(data_in, max_result_count)
+
+        finally:
+            self._initial_state = 0
+            self._final_state = None
+            self._overhead_length = self.stage_count - 1
+
+        if not results:
+            raise RuntimeError("Path between the initial and the final state of the segment was not found.")
+
+        return results
+
+    def decode_segments(self, segments: typing.Iterable[typing.Tuple[str, int, bool, int]], worker_count: int = 1) \
+            -> typing.Iterator[str]:
+        """
+        Decodes independent segments of the message, optionally using multiple processes.
+
+        :param segments: binary sequence, initial state, overhead flag and final state of each segment
+                         (see `decode_segment`)
+        :param worker_count: number of worker processes
+        :return: the most probable decoded ASCII strings of the segments (in order of the segments)
+        """
+        if worker_count <= 1:
+            for data_in, initial_state, has_overhead, final_state in segments:
+                yield self.decode_segment(data_in, initial_state, has_overhead, final_state)[0][1]
+            return
+
+        segments = list(segments)
+        if not segments:
+            return
+
+        logger.info("decoding %d segments using %d workers", len(segments), worker_count)
+        with ProcessPoolExecutor(worker_count, initializer=_initialize_worker,
+                                 initargs=(type(self), self._trellis, self.traceback_depth)) as executor:
+            yield from executor.map(_decode_segment_task, *zip(*segments))
+
+    def decode_soft(self, data_in: typing.Sequence[float], max_result_count: int = 3) \
+            -> typing.List[typing.Tuple[float, str]]:
+        """
+        Decodes provided sequence of soft values to ASCII string.
+
+        Soft values correspond to the characters of binary sequence, positive
+        values represent 0 bits and negative values 1 bits, absolute value
+        being the reliability of the decision (e.g. received BPSK samples).
+
+        :param data_in: soft values to be decoded
+        :param max_result_count: maximum number of possible interpretations returned
+        :return: decoded ASCII string
+        """
+        # precompute branch metrics of each observation
+        with profile_phase(self.stats, "observation metrics"):
+            observations = self.soft_observation_metrics(data_in)
+
+        return self._decode_observations(observations, max_result_count)
+
+    def decode_batch(self, frames: typing.Sequence[str], max_result_count: int = 3) \
+            -> typing.List[typing.List[typing.Tuple[int, str]]]:
+        """
+        Decodes multiple independent binary sequences (frames) of the same code.
+
+        :param frames: binary sequences to be decoded
+        :param max_result_count: maximum number of possible interpretations returned per frame
+        :return: decoded ASCII strings of each frame (same as `decode` of each frame)
+        """
+        return self._decode_observations_batch([
+            self.observation_metrics(self.filter_data_in(data_in)) for data_in in frames
+        ], max_result_count)
+
+    def decode_soft_batch(self, frames: typing.Sequence[typing.Sequence[float]], max_result_count: int = 3) \
+            -> typing.List[typing.List[typing.Tuple[float, str]]]:
+        """
+        Decodes multiple independent sequences (frames) of soft values of the same code.
+
+        :param frames: sequences of soft values to be decoded
+        :param max_result_count: maximum number of possible interpretations returned per frame
+        :return: decoded ASCII strings of each frame (same as `decode_soft` of each frame)
+        """
+        return self._decode_observations_batch([
+            self.soft_observation_metrics(data_in) for data_in in frames
+        ], max_result_count)
+
+    def _decode_observations_batch(self, observations: typing.List[typing.List[typing.List]], max_result_count: int) \
+            -> typing.List[typing.List[typing.Tuple[typing.Union[int, float], str]]]:
+        """
+        Searches the trellis for the best paths of each frame (one frame at a time).
+
+        :param observations: branch metrics of all possible packed emissions per observation of each frame
+        :param max_result_count: maximum number of possible interpretations returned per frame
+        :return: list of (path cost, decoded ASCII string) of each frame
+        """
+        return [self._decode_observations(frame_observations, max_result_count) for frame_observations in observations]
+
+    def _decode_observations(self, observations: typing.List[typing.List], max_result_count: int) \
+            -> typing.List[typing.Tuple[typing.Union[int, float], str]]:
+        """
+        Searches the trellis for the best paths using precomputed branch metrics.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param max_result_count: maximum number of possible interpretations returned
+        :return: list of (path cost, decoded ASCII string)
+        """
+        observation_count = len(observations)
         # re-initialize inner decoder state
-        self._initialize_decoder()
+        self._initialize_decoder(observation_count)
         # create initial state to process
-        self._create_unprocessed_state(0, state_to_str(self._states[0]), [], data_in)
+        self._create_unprocessed_state(0, self._initial_state, 0, 0)
+        # expensive debug messages are created only when they are going to be logged
+        debug = logger.isEnabledFor(logging.DEBUG)
+        stats = self.stats
+        if stats is not None:
+            stats.increment("queue pushes")
+            stats.maximum("peak queue size", 1)
 
-        # initialize list of results
-        results = []
-        # this defines the amount of
-        observation_offset = len(self.feedback_masks)
+        # initialize list of found solutions (path cost, final state) and their decoded ASCII strings
+        solutions = []
+        solution_strings = set()
 
+        search_start = time.perf_counter()
         # while there are unprocessed states
-        while not self._unprocessed_states.empty() and len(results) < max_result_count:
-            # get currently best unprocessed state
-            current_cost, current_state, current_solution, observations_left = self._get_unprocessed_state()
-            # calculate current iteration identifier
-            current_iteration = len(current_solution)
-            logger.debug("processing path from %s (iter=%2d, cost=%2d)", current_state, current_iteration, current_cost)
-
-            if self._does_better_path_exist(current_iteration, current_cost, current_state):
+        while not self._unprocessed_states.empty() and len(solutions) < max_result_count:
+            # get currently best unprocessed state, iteration identifier is the index of the next observation
+            current_cost, current_iteration, current_state, decision = self._get_unprocessed_state()
+            if stats is not None:
+                stats.increment("queue pops")
+            if debug:
+                logger.debug("processing path from %s (iter=%2d, cost=%2d)",
+                             current_state, current_iteration, current_cost)
+
+            if self._does_better_path_exist(current_iteration, current_state):
                 # there already is solution path with better cost
                 # and since branches from a signle state cannot diverge
                 # lets skip this worse path
-                logger.debug("skipping current path (cost=%2d), better path leading to current state exists (cost=%2d)",
-                             current_cost, self._get_best_path_cost(current_iteration, current_state))
+                if debug:
+                    logger.debug("skipping current path (cost=%2d), better path leading to current state exists",
+                                 current_cost)
+                if stats is not None:
+                    stats.increment("paths pruned")
                 continue
 
-            # since there is no lower cost store current cost
-            # as the currently lowest for given iteration and state
-            self._register_best_path_cost(current_iteration, current_cost, current_state)
-            if not observations_left:
+            # since there is no lower cost register current path (its predecessor)
+            # as the best one for given iteration and state
+            self._register_best_path(current_iteration, current_state, decision)
+            if current_iteration == observation_count:
+                if self._final_state is not None and current_state != self._final_state:
+                    # path does not end in the required final state
+                    continue
+
+                # single solution is converted to ASCII string once the search ends
+                data_out = None
+                if max_result_count > 1:
+                    data_out = self._distinct_solution_string(
+                        self._traceback_path(observation_count, current_state), solution_strings)
+                    if data_out is None:
+                        continue
+
                 # there is no input left - this is the final state and possible solution
-                logger.debug("possible solution found, saving result %s (iter=%2d, cost=%2d)",
-                             current_solution, current_iteration, current_cost)
-                results.append((current_cost, self.int_binary_to_str(current_solution)))
+                if debug:
+                    logger.debug("possible solution found in state %d (iter=%2d, cost=%2d)",
+                                 current_state, current_iteration, current_cost)
+                solutions.append((current_cost, current_state, data_out))
                 continue
 
-            # select observation in current state
-            current_observation = observations_left[-observation_offset:]
-            logger.debug("current observation is %s", current_observation)
+            # select branch metrics of observation in current state
+            current_metrics = observations[current_iteration]
+            # low bit of current state decides which of the two predecessors of the next state it is
+            next_decision = current_state & 1
 
             # for each possible branch from current state do
             for possible_bit_value in [0, 1]:
                 # to which state would encoder transition in case of `possible_bit_value` input
                 next_state = self._transitions[current_state][possible_bit_value]
-                # what would be the encoder output
-                # if it were in `next_state` (after receiving `possible_bit_value`)
-                transition_observation = state_to_str(self._emissions[next_state])
-                # what is the cost of this transition - how is the possible encoder output
+                # what is the cost of this transition - how is the encoder output
+                # in `next_state` (after receiving `possible_bit_value`)
                 # different from what I've received
-                transition_cost = hamming_distance(transition_observation, current_observation)
+                transition_cost = current_metrics[self._emissions[next_state]]
 
                 # create new state to process
                 self._create_unprocessed_state(
@@ -184,10 +595,606 @@ class ConvolutionalDecoder(object):
                     transition_cost + current_cost,
                     # current state will be state after transition
                     next_state,
-                    # add transition "input" value to path solution
-                    current_solution.copy() + [possible_bit_value],
-                    # remove observation in current state from next state
-                    observations_left[:-observation_offset],
+                    # move to the next observation
+                    current_iteration + 1,
+                    # path is extended from current state
+                    next_decision,
                 )
 
-        return results
+            if stats is not None:
+                stats.increment("states expanded")
+                stats.increment("queue pushes", 2)
+                stats.maximum("peak queue size", self._unprocessed_states.qsize())
+
+        if stats is not None:
+            stats.add_timing("search", time.perf_counter() - search_start)
+
+        with profile_phase(stats, "traceback"):
+            solutions = [(cost, self._traceback_path(observation_count, state) if data_out is None else data_out)
+                         for cost, state, data_out in solutions]
+
+        # convert found solutions to ASCII strings (multiple solutions were converted during the search)
+        with profile_phase(stats, "int_binary_to_str"):
+            return [(cost, solution if isinstance(solution, str) else self.int_binary_to_str(solution))
+                    for cost, solution in solutions]
+
+    def _path_cost(self, observations: typing.List[typing.List], data_out: typing.List[int]):
+        """ Calculates cost of path given by decoded bits (starting in initial state). """
+        current_state = self._initial_state
+        current_cost = 0
+        for bit, observation_metrics in zip(data_out, observations):
+            current_state = self._transitions[current_state][bit]
+            current_cost += observation_metrics[self._emissions[current_state]]
+
+        return current_cost
+
+    def _decode_window(self, observations: typing.List[typing.List], from_initial_state: bool) -> typing.List[int]:
+        """
+        Decodes bits of all steps of given window of observations using path
+        with the lowest cost in the last step.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param from_initial_state: does the window start in the initial state? (otherwise
+                                   all the states are considered equally probable)
+        :return: decoded binary sequence (in order of processing)
+        """
+        path_metrics = [0 for _ in range(self._trellis.state_count)]
+        if from_initial_state:
+            path_metrics = [self.STREAM_UNREACHABLE_COST for _ in range(self._trellis.state_count)]
+            path_metrics[self._initial_state] = 0
+
+        decisions = []
+        for observation_metrics in observations:
+            path_metrics, step_decisions = self._select_survivors(path_metrics, observation_metrics)
+            decisions.append(step_decisions)
+
+        return self._traceback_decisions(decisions, self._best_state(path_metrics))
+
+    def decode_parallel(self, data_in: str, worker_count: int = None, chunk_length: int = None,
+                        margin_length: int = None) -> typing.List[typing.Tuple[int, str]]:
+        """
+        Decodes provided binary sequence to ASCII string using multiple processes.
+
+        :param data_in: binary sequence to be decoded
+        :param worker_count: number of worker processes (default: number of CPUs)
+        :param chunk_length: number of observations decoded by single task
+        :param margin_length: number of observations decoded before and after each chunk
+        :return: the most probable decoded ASCII string
+        """
+        # remove undesired input content
+        data_in = self.filter_data_in(data_in)
+        return self._decode_observations_parallel(
+            self.observation_metrics(data_in), worker_count, chunk_length, margin_length)
+
+    def decode_soft_parallel(self, data_in: typing.Sequence[float], worker_count: int = None,
+                             chunk_length: int = None, margin_length: int = None) \
+            -> typing.List[typing.Tuple[float, str]]:
+        """
+        Decodes provided sequence of soft values to ASCII string using multiple processes.
+
+        :param data_in: soft values to be decoded (see `decode_soft`)
+        :param worker_count: number of worker processes (default: number of CPUs)
+        :param chunk_length: number of observations decoded by single task
+        :param margin_length: number of observations decoded before and after each chunk
+        :return: the most probable decoded ASCII string
+        """
+        return self._decode_observations_parallel(
+            self.soft_observation_metrics(data_in), worker_count, chunk_length, margin_length)
+
+    def _decode_observations_parallel(self, observations: typing.List[typing.List], worker_count: int = None,
+                                      chunk_length: int = None, margin_length: int = None) \
+            -> typing.List[typing.Tuple[typing.Union[int, float], str]]:
+        """
+        Splits observations to chunks, decodes them in worker processes and stitches the results.
+
+        Each chunk is decoded with overlapping margins - the margin before the chunk
+        lets path metrics warm up from unknown state, the margin after the chunk
+        lets the survivor paths merge before traceback. Bits decoded at the end
+        of the leading margin must match the end of the preceding chunk, otherwise
+        the paths did not merge within the margins and the observations are decoded
+        by single process instead, so the result is always the same as the result
+        of single process decoding. Codes with even weight feedback masks are always
+        decoded by single process - their paths decoded from unknown state cannot be
+        told apart from their complements (and such codes are catastrophic, so the paths
+        do not merge at all).
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param worker_count: number of worker processes (default: number of CPUs)
+        :param chunk_length: number of observations decoded by single task
+        :param margin_length: number of observations decoded before and after each chunk
+        :return: list containing the most probable (path cost, decoded ASCII string)
+        """
+        if worker_count is None:
+            worker_count = os.cpu_count() or 1
+        if margin_length is None:
+            margin_length = 2 * self.traceback_depth
+        if chunk_length is None:
+            chunk_length = max(-(-len(observations) // worker_count), 1)
+
+        chunk_starts = range(0, len(observations), chunk_length)
+        if len(chunk_starts) <= 1 or worker_count <= 1:
+            # there is nothing to be split
+            return self._decode_observations(observations, 1)
+
+        if self._trellis.complement_invariant:
+            logger.warning("paths of code with even weight feedback masks do not merge, decoding in single process")
+            return self._decode_observations(observations, 1)
+
+        task_arguments = []
+        overlap_lengths = []
+        for chunk_start in chunk_starts:
+            chunk_end = min(chunk_start + chunk_length, len(observations))
+            window_start = max(chunk_start - margin_length, 0)
+            window_end = min(chunk_end + margin_length, len(observations))
+            # bits decoded right before the chunk are returned as well to verify the chunks match
+            overlap_length = min(self.traceback_depth, chunk_start - window_start)
+            overlap_lengths.append(overlap_length)
+            task_arguments.append((
+                observations[window_start:window_end], window_start == 0,
+                chunk_start - window_start - overlap_length, chunk_end - chunk_start + overlap_length,
+            ))
+
+        logger.info("decoding %d chunks using %d workers", len(task_arguments), worker_count)
+        with ProcessPoolExecutor(worker_count, initializer=_initialize_worker,
+                                 initargs=(type(self), self._trellis, self.traceback_depth)) as executor:
+            data_out = []
+            chunk_results = executor.map(_decode_window_task, *zip(*task_arguments))
+            for overlap_length, chunk_data_out in zip(overlap_lengths, chunk_results):
+                if chunk_data_out[:overlap_length] != data_out[len(data_out) - overlap_length:]:
+                    data_out = None
+                    break
+
+                data_out += chunk_data_out[overlap_length:]
+
+        if data_out is None:
+            logger.warning("paths of decoded chunks did not merge within the margins, decoding in single process")
+            return self._decode_observations(observations, 1)
+
+        return [(self._path_cost(observations, data_out), self.int_binary_to_str(data_out))]
+
+    def _initialize_stream(self):
+        """ Re-initializes path metrics, decisions and buffers of stream decoding. """
+        # received bits which do not form whole observation yet
+        self._stream_observation = ""
+        # path metrics of all states in the last processed step
+        self._stream_path_metrics = [self.STREAM_UNREACHABLE_COST] * self._trellis.state_count
+        self._stream_path_metrics[self._initial_state] = 0
+        # decisions of not yet committed steps - bit `i` set when state `i` was reached from the upper predecessor
+        self._stream_decisions = deque()
+        # committed decoded bits which do not form whole byte yet
+        self._stream_bits = []
+
+    def _select_survivors(self, path_metrics: typing.List, observation_metrics: typing.List) \
+            -> typing.Tuple[typing.List, int]:
+        """
+        Updates path metrics of all states using given observation (add-compare-select).
+
+        :param path_metrics: path metrics of all states in previous step
+        :param observation_metrics: branch metrics of all packed emissions for current observation
+        :return: path metrics in current step and decisions - bit `i` set when state `i`
+                 was reached from the upper predecessor
+        """
+        state_mask = self._trellis.state_count - 1
+        next_path_metrics = []
+        decisions = 0
+
+        for state, emission in enumerate(self._emissions):
+            lower_predecessor = (state << 1) & state_mask
+            lower_cost = path_metrics[lower_predecessor]
+            upper_cost = path_metrics[lower_predecessor | 1]
+            if upper_cost < lower_cost:
+                decisions |= 1 << state
+                lower_cost = upper_cost
+
+            next_path_metrics.append(lower_cost + observation_metrics[emission])
+
+        return next_path_metrics, decisions
+
+    def _traceback_decisions(self, decisions: typing.Sequence[int], final_state: int) -> typing.List[int]:
+        """ Reconstructs decoded bits of all given steps of path leading to given state. """
+        state_mask = self._trellis.state_count - 1
+        input_bit_shift = self.stage_count - 1
+        data_out = []
+
+        current_state = final_state
+        for step_decisions in reversed(decisions):
+            data_out.append(current_state >> input_bit_shift)
+            current_state = ((current_state << 1) & state_mask) | ((step_decisions >> current_state) & 1)
+
+        data_out.reverse()
+        return data_out
+
+    @classmethod
+    def _best_state(cls, path_metrics: typing.Sequence) -> int:
+        """ Returns state with the lowest path metric (ties resolved by lower state). """
+        return min(range(len(path_metrics)), key=lambda state: path_metrics[state])
+
+    def _stream_step(self, observation_metrics: typing.List[int]):
+        """ Updates path metrics of all states using given observation (add-compare-select). """
+        self._stream_path_metrics, decisions = self._select_survivors(self._stream_path_metrics, observation_metrics)
+        self._stream_decisions.append(decisions)
+
+    def _stream_traceback(self, final_state: int) -> typing.List[int]:
+        """ Reconstructs decoded bits of all uncommitted steps of path leading to given state. """
+        return self._traceback_decisions(self._stream_decisions, final_state)
+
+    def _commit_stream_bits(self, data_out: typing.List[int]) -> str:
+        """ Stores committed decoded bits and converts every whole byte to ASCII character. """
+        self._stream_bits += data_out
+        byte_count = len(self._stream_bits) // 8
+
+        result = []
+        for byte_index in range(byte_count):
+            byte_bits = self._stream_bits[byte_index * 8:(byte_index + 1) * 8]
+            # bits of each character are decoded LSB first
+            result.append(chr(sum(bit << bit_index for bit_index, bit in enumerate(byte_bits))))
+
+        self._stream_bits = self._stream_bits[byte_count * 8:]
+        return "".join(result)
+
+    def _best_stream_state(self) -> int:
+        """ Returns state with the lowest path metric (ties resolved by lower state). """
+        return self._best_state(self._stream_path_metrics)
+
+    def feed(self, data_in: str) -> str:
+        """
+        Decodes next part of binary sequence produced by encoder in stream mode
+        (observations in order of encoding). Path metrics are kept between calls,
+        decisions older than traceback depth are committed.
+
+        :param data_in: next part of binary sequence
+        :return: ASCII characters which were finally decoded
+        """
+        if self.puncture_pattern is not None:
+            raise RuntimeError("Stream decoding of punctured code is not supported.")
+
+        data_in = self._stream_observation + self.filter_data_in(data_in)
+        observation_length = self._trellis.output_count
+
+        full_length = len(data_in) - len(data_in) % observation_length
+        for observation_start in range(0, full_length, observation_length):
+            observation = data_in[observation_start:observation_start + observation_length]
+            self._stream_step(self._trellis.observation_metrics(observation))
+        self._stream_observation = data_in[full_length:]
+
+        if len(self._stream_decisions) < 2 * self.traceback_depth:
+            return ""
+
+        # commit all decisions older than traceback depth at once
+        commit_count = len(self._stream_decisions) - self.traceback_depth
+        data_out = self._stream_traceback(self._best_stream_state())[:commit_count]
+        for _ in range(commit_count):
+            self._stream_decisions.popleft()
+
+        logger.debug("committing %d decoded bits", commit_count)
+        return self._commit_stream_bits(data_out)
+
+    def flush(self) -> str:
+        """
+        Finishes stream decoding - processes remaining incomplete observation,
+        commits the rest of the best path and strips filter overhead.
+        Stream decoding is re-initialized afterwards.
+
+        :return: ASCII characters which were finally decoded
+        """
+        if self._stream_observation:
+            self._stream_step(self._trellis.observation_metrics(self._stream_observation))
+
+        data_out = self._stream_traceback(self._best_stream_state())
+        overhead_length = self.stage_count - 1
+        logger.debug("stripping filter overhead of %d bits", overhead_length)
+        result = self._commit_stream_bits(data_out[:max(len(data_out) - overhead_length, 0)])
+
+        if self._stream_bits:
+            logger.warning("there is not enough bits for whole byte: %s", repr(state_to_str(self._stream_bits)))
+
+        self._initialize_stream()
+        return result
+
+
+# decoders following only a limited number of trellis paths - cost of decoding
+# single bit does not grow with the number of encoder states
+class ReducedStateDecoder(ConvolutionalDecoder):
+
+    def _decode_observations_parallel(self, observations: typing.List[typing.List], worker_count: int = None,
+                                      chunk_length: int = None, margin_length: int = None) \
+            -> typing.List[typing.Tuple[typing.Union[int, float], str]]:
+        """
+        Decodes all the observations by single process - kept paths cannot be split
+        to independent chunks (stream decoding is inherited and updates all the states,
+        so it is not offered by main.py for these decoders).
+        """
+        logger.info("reduced-state decoder does not support parallel decoding, using single process")
+        return self._decode_observations(observations, 1)
+
+
+class BeamDecoder(ReducedStateDecoder):
+
+    def __init__(self, stage_count: int, feedback_masks: typing.List[int], traceback_depth: int = None,
+                 puncture_pattern: typing.List[typing.List[int]] = None, beam_width: int = 16):
+        """
+        Initializes M-algorithm (beam search) decoder.
+
+        Only `beam_width` paths with the lowest cost are kept in each trellis step,
+        paths merging in the same state are resolved the same way as by Viterbi
+        decoder. Decoding single bit costs `O(beam_width)` instead of `O(2^stage_count)`,
+        beam as wide as the number of states gives the same results as Viterbi decoder.
+
+        :param stage_count: number of memory blocks
+        :param feedback_masks: list of feedback masks of memory blocks
+        :param traceback_depth: number of trellis steps after which stream decoding decisions are final
+        :param puncture_pattern: puncturing matrix used by encoder (see `check_puncture_pattern`)
+        :param beam_width: number of paths kept in each trellis step (M)
+        """
+        super().__init__(stage_count, feedback_masks, traceback_depth, puncture_pattern)
+        if beam_width < 1:
+            raise RuntimeError("Beam width must be positive.")
+        self.beam_width = beam_width
+
+    def _decode_observations(self, observations: typing.List[typing.List], max_result_count: int) \
+            -> typing.List[typing.Tuple[typing.Union[int, float], str]]:
+        """
+        Extends the kept paths by each observation and keeps the best `beam_width` of them.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param max_result_count: maximum number of possible interpretations returned
+        :return: list of (path cost, decoded ASCII string)
+        """
+        stats = self.stats
+        # kept paths of current step - (path cost, state) ordered by cost (ties resolved by lower state)
+        survivors = [(0, self._initial_state)]
+        # states of kept paths and indices of their predecessors within the previous step
+        step_states = []
+        step_predecessors = []
+
+        with profile_phase(stats, "search"):
+            for observation_metrics in observations:
+                # the best extension reaching each state - (path cost, predecessor state, predecessor index)
+                candidates = {}
+                for survivor_index, (current_cost, current_state) in enumerate(survivors):
+                    for possible_bit_value in [0, 1]:
+                        next_state = self._transitions[current_state][possible_bit_value]
+                        next_cost = current_cost + observation_metrics[self._emissions[next_state]]
+                        candidate = candidates.get(next_state)
+                        # prefer lower predecessor in case of equal path costs
+                        if candidate is None or (next_cost, current_state) < candidate[:2]:
+                            candidates[next_state] = (next_cost, current_state, survivor_index)
+
+                ranked = heapq.nsmallest(self.beam_width, ((cost, state, predecessor_index)
+                                                           for state, (cost, _, predecessor_index)
+                                                           in candidates.items()))
+                survivors = [(cost, state) for cost, state, _ in ranked]
+                step_states.append(array("Q", [state for _, state, _ in ranked]))
+                step_predecessors.append(array("L", [predecessor_index for _, _, predecessor_index in ranked]))
+
+                if stats is not None:
+                    stats.increment("states expanded", len(survivors))
+                    stats.increment("paths pruned", len(candidates) - len(ranked))
+
+        final_indices = range(len(survivors))
+        if self._final_state is not None:
+            final_indices = [index for index in final_indices if survivors[index][1] == self._final_state]
+            if not final_indices:
+                logger.warning("path ending in the required final state was pruned, using the best kept path")
+                final_indices = range(len(survivors))
+
+        return self._distinct_results((
+            (survivors[survivor_index][0], self._traceback_beam(step_states, step_predecessors, survivor_index))
+            for survivor_index in final_indices
+        ), max_result_count)
+
+    def _traceback_beam(self, step_states: typing.List[array], step_predecessors: typing.List[array],
+                        final_index: int) -> typing.List[int]:
+        """
+        Reconstructs decoded binary sequence of kept path.
+
+        :param step_states: states of kept paths in each step
+        :param step_predecessors: indices of predecessors of kept paths in each step
+        :param final_index: index of the path within the last step
+        :return: decoded binary sequence (in order of processing)
+        """
+        input_bit_shift = self.stage_count - 1
+        data_out = []
+        current_index = final_index
+        # follow predecessors from the last step to the first one
+        for states, predecessors in zip(reversed(step_states), reversed(step_predecessors)):
+            data_out.append(states[current_index] >> input_bit_shift)
+            current_index = predecessors[current_index]
+
+        data_out.reverse()
+        return data_out
+
+
+class StackDecoder(ReducedStateDecoder):
+
+    # crossover probability of binary symmetric channel the default bias of Fano metric is derived from
+    DEFAULT_CROSSOVER_PROBABILITY = 0.05
+
+    def __init__(self, stage_count: int, feedback_masks: typing.List[int], traceback_depth: int = None,
+                 puncture_pattern: typing.List[typing.List[int]] = None, bias: float = None,
+                 max_stack_size: int = 1 << 16, max_expansions: int = None):
+        """
+        Initializes stack (sequential) decoder using Fano metric.
+
+        The best path on the stack is extended until it reaches the end of the
+        input. Paths of different length are compared by Fano metric - each
+        step decreases the path cost by `bias` per transmitted bit, so longer
+        paths following the received sequence are preferred over shorter ones.
+        Decoding effort therefore depends on the channel noise, not on the number
+        of encoder states.
+
+        :param stage_count: number of memory blocks
+        :param feedback_masks: list of feedback masks of memory blocks
+        :param traceback_depth: number of trellis steps after which stream decoding decisions are final
+        :param puncture_pattern: puncturing matrix used by encoder (see `check_puncture_pattern`)
+        :param bias: Fano metric bias per transmitted bit (see `fano_bias`, higher values
+                     make the search more greedy)
+        :param max_stack_size: maximum number of paths on the stack, the worse half
+                               of the paths is discarded once the stack is full
+        :param max_expansions: maximum number of extended paths, the best path is then
+                               completed greedily (unlimited when not set)
+        """
+        super().__init__(stage_count, feedback_masks, traceback_depth, puncture_pattern)
+        if max_stack_size < 2:
+            raise RuntimeError("Maximum stack size must be at least 2.")
+
+        # number of transmitted bits per trellis step (on average for punctured code)
+        self._step_output_count = len(feedback_masks)
+        if puncture_pattern is not None:
+            self._step_output_count = sum(map(sum, puncture_pattern)) / len(puncture_pattern[0])
+
+        if bias is None:
+            bias = self.fano_bias(self.DEFAULT_CROSSOVER_PROBABILITY, 1 / self._step_output_count)
+        self.bias = bias
+        self.max_stack_size = max_stack_size
+        self.max_expansions = max_expansions
+
+    @classmethod
+    def fano_bias(cls, crossover_probability: float, code_rate: float) -> float:
+        """
+        Calculates Fano metric bias per transmitted bit for binary symmetric channel.
+
+        Fano metric of a bit is `log2(2 * (1 - p)) - R` when it agrees with the received
+        bit and `log2(2 * p) - R` otherwise. Scaled so the disagreement costs 1 (same as
+        Hamming distance), each transmitted bit decreases the path cost by the returned bias.
+
+        :param crossover_probability: probability of bit flip (p)
+        :param code_rate: rate of the code (R)
+        :return: bias per transmitted bit
+        """
+        if not 0 < crossover_probability < 0.5:
+            raise RuntimeError("Crossover probability must be in range (0; 0.5).")
+
+        agreement_metric = math.log2(2 * (1 - crossover_probability)) - code_rate
+        disagreement_metric = math.log2(2 * crossover_probability) - code_rate
+        return agreement_metric / (agreement_metric - disagreement_metric)
+
+    def _decode_observations(self, observations: typing.List[typing.List], max_result_count: int) \
+            -> typing.List[typing.Tuple[typing.Union[int, float], str]]:
+        """
+        Extends the best path on the stack until enough paths reach the end of the input.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param max_result_count: maximum number of possible interpretations returned
+        :return: list of (path cost, decoded ASCII string)
+        """
+        observation_count = len(observations)
+        step_bias = self.bias * self._step_output_count
+        stats = self.stats
+        # paths ordered by Fano metric, then by their length (longer first) and order of creation,
+        # each path is (Fano cost, negative length, sequence number, state, path cost, decoded bits)
+        # where decoded bits are linked (bit, previous bits) pairs shared by the extended paths
+        stack = [(0.0, 0, 0, self._initial_state, 0, None)]
+        sequence_number = 1
+        expansion_count = 0
+        # found solutions (path cost, decoded bits) and their decoded ASCII strings
+        solutions = []
+        solution_strings = set()
+
+        with profile_phase(stats, "search"):
+            while stack and len(solutions) < max_result_count:
+                path = heapq.heappop(stack)
+                fano_cost, negative_length, _, current_state, current_cost, current_bits = path
+                current_iteration = -negative_length
+                if stats is not None:
+                    stats.increment("queue pops")
+
+                if current_iteration == observation_count:
+                    # there is no input left - this is possible solution (when it ends in the required state)
+                    if self._final_state is not None and current_state != self._final_state:
+                        continue
+
+                    if max_result_count == 1:
+                        solutions.append((current_cost, current_bits))
+                        continue
+
+                    # multiple solutions are converted to ASCII strings right away
+                    data_out = self._distinct_solution_string(self._linked_bits_to_list(current_bits),
+                                                              solution_strings)
+                    if data_out is not None:
+                        solutions.append((current_cost, data_out))
+                    continue
+
+                if self.max_expansions is not None and expansion_count >= self.max_expansions:
+                    # computation limit was reached - complete the best path greedily
+                    logger.warning("stack decoder reached limit of %d path extensions", self.max_expansions)
+                    if not solutions:
+                        solutions.append(self._complete_greedily(observations, path))
+                    break
+
+                expansion_count += 1
+                current_metrics = observations[current_iteration]
+                for possible_bit_value in [0, 1]:
+                    next_state = self._transitions[current_state][possible_bit_value]
+                    transition_cost = current_metrics[self._emissions[next_state]]
+                    heapq.heappush(stack, (
+                        fano_cost + transition_cost - step_bias, negative_length - 1, sequence_number,
+                        next_state, current_cost + transition_cost, (possible_bit_value, current_bits),
+                    ))
+                    sequence_number += 1
+
+                if len(stack) > self.max_stack_size:
+                    # discard the worse half of the paths (sorted list is valid heap)
+                    discarded_count = len(stack) - self.max_stack_size // 2
+                    stack = heapq.nsmallest(self.max_stack_size // 2, stack)
+                    if stats is not None:
+                        stats.increment("paths pruned", discarded_count)
+
+                if stats is not None:
+                    stats.increment("states expanded")
+                    stats.increment("queue pushes", 2)
+                    stats.maximum("peak queue size", len(stack))
+
+        with profile_phase(stats, "traceback"):
+            solutions = [(cost, bits if isinstance(bits, str) else self._linked_bits_to_list(bits))
+                         for cost, bits in solutions]
+
+        # convert found solutions to ASCII strings (multiple solutions were converted during the search)
+        with profile_phase(stats, "int_binary_to_str"):
+            return [(cost, solution if isinstance(solution, str) else self.int_binary_to_str(solution))
+                    for cost, solution in solutions]
+
+    def _complete_greedily(self, observations: typing.List[typing.List], path: tuple) -> tuple:
+        """
+        Extends given path to the end of the input always using the cheaper branch.
+
+        When the path must end in given final state (see `decode_segment`), the bits
+        of the last `stage_count` steps are given by the final state instead.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param path: path popped from the stack
+        :return: path cost and decoded bits of completed path
+        """
+        _, negative_length, _, current_state, current_cost, current_bits = path
+        # the last `stage_count` inserted bits form the final state (the last one in its MSB position)
+        forced_steps_start = len(observations) - self.stage_count
+        for step in range(-negative_length, len(observations)):
+            current_metrics = observations[step]
+            possible_bit_values = [0, 1]
+            if self._final_state is not None and step >= forced_steps_start:
+                possible_bit_values = [(self._final_state >> (step - forced_steps_start)) & 1]
+
+            branches = []
+            for possible_bit_value in possible_bit_values:
+                next_state = self._transitions[current_state][possible_bit_value]
+                branches.append((current_metrics[self._emissions[next_state]], possible_bit_value, next_state))
+
+            transition_cost, bit_value, current_state = min(branches)
+            current_cost += transition_cost
+            current_bits = (bit_value, current_bits)
+
+        if self._final_state is not None and current_state != self._final_state:
+            logger.warning("greedily completed path could not reach the required final state")
+
+        return current_cost, current_bits
+
+    @classmethod
+    def _linked_bits_to_list(cls, bits: typing.Optional[tuple]) -> typing.List[int]:
+        """ Converts linked (bit, previous bits) pairs to binary sequence (in order of processing). """
+        data_out = []
+        while bits is not None:
+            bit_value, bits = bits
+            data_out.append(bit_value)
+
+        data_out.reverse()
+        return data_out
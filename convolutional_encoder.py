@@ -1,28 +1,51 @@
 import logging
 import typing
 import re
-from collections import deque
+from itertools import chain
 
 from convolution_filter import ConvolutionFilter
+from profiling import profile_phase
+from utils import check_puncture_pattern
 
 logger = logging.getLogger("encoder")
 
 
 class ConvolutionalEncoder(object):
 
-    def __init__(self, stage_count: int, feedback_masks: typing.List[int], filter_input: bool = True):
+    # translation of bit values to [01] characters
+    _BIT_CHARACTERS = bytes.maketrans(b"\x00\x01", b"01")
+
+    def __init__(self, stage_count: int, feedback_masks: typing.List[int], filter_input: bool = True,
+                 puncture_pattern: typing.List[typing.List[int]] = None):
         """
         Initializes convolutional encoder.
 
         :param stage_count: number of memory blocks
         :param feedback_masks: list of feedback masks of memory blocks
+        :param puncture_pattern: puncturing matrix - row per each feedback mask, column per each
+                                 step of puncturing period, 1 for transmitted and 0 for erased output
         """
         self.filter = ConvolutionFilter(stage_count, feedback_masks)
         self.filter_input = filter_input
 
+        if puncture_pattern is not None:
+            check_puncture_pattern(puncture_pattern, len(feedback_masks))
+        self.puncture_pattern = puncture_pattern
+        # number of filter outputs produced since the filter was initialized (position in puncturing period)
+        self._output_step_count = 0
+        # binary strings of packed filter outputs, built on first use (see `_emission_strings`)
+        self._emission_string_table = None
+        # collected counters and phase timings (see `ProfileStats`), disabled when not set
+        self.stats = None
+
     @classmethod
     def filter_data_in(cls, data_in: str) -> str:
-        return "".join(re.findall(r"[A-z0-9]", data_in))
+        return re.sub(r"[^A-z0-9]+", "", data_in)
+
+    @classmethod
+    def data_out_to_str(cls, data_out: typing.Iterable[typing.List[int]]) -> str:
+        """ Converts result of `encode` to binary string. """
+        return bytes(chain.from_iterable(data_out)).translate(cls._BIT_CHARACTERS).decode("ascii")
 
     @classmethod
     def str_to_int_binary(cls, data_in: str) -> typing.List[int]:
@@ -49,10 +72,11 @@ class ConvolutionalEncoder(object):
             char_binary = [0 for _ in range(8 - len(char_binary_str))]
             # convert string characters [01] to integers
             char_binary += [int(binary_char) for binary_char in char_binary_str]
-            logger.debug("converted character '%s' (%d) to binary %s", char, char_numeric,
-                         ''.join(map(lambda x: str(x), char_binary)))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("converted character '%s' (%d) to binary %s", char, char_numeric,
+                             ''.join(map(lambda x: str(x), char_binary)))
 
-            logger.debug("storing in reverse order %s", ''.join(map(lambda x: str(x), char_binary)))
+                logger.debug("storing in reverse order %s", ''.join(map(lambda x: str(x), char_binary)))
             data_binary += char_binary
 
         return data_binary
@@ -61,46 +85,248 @@ class ConvolutionalEncoder(object):
         """
         Encodes provided ASCII string to binary sequence.
 
+        Input is processed whole byte at a time using precomputed table
+        of filter outputs and transitions (see `ConvolutionFilter.insert_byte`).
+
         :param data_in: ASCII string to be encoded
         :param flush_filter: should convolution filter values be flushed?
         :return:
         """
+        emissions = self._encode_emissions(data_in, flush_filter)
+
+        # create output collection in reversed order of calculation
+        data_out = [self.filter.unpack_output(emission) for emission in reversed(emissions)]
+        if self.puncture_pattern is not None:
+            data_out = self.puncture(data_out, self._output_step_count)
+
+        # puncturing period of the next message starts again with its first output
+        self._output_step_count = 0 if self.filter.empty else self._output_step_count + len(data_out)
+        return data_out
+
+    def encode_iter(self, chunks: typing.Iterable[str], flush_filter=True) -> typing.Iterator[str]:
+        """
+        Encodes stream of ASCII string chunks to binary string blocks.
+
+        Characters are encoded in order of their arrival and state of the
+        convolution filter is kept between the chunks (same as calling
+        `encode` for each character without flushing the filter), but the
+        outputs are converted directly from the packed filter outputs and in
+        order of calculation, so each block can be written (and decoded) as
+        soon as it is yielded. Single block is yielded per non-empty chunk,
+        larger chunks therefore mean fewer (and larger) writes of the consumer.
+
+        :param chunks: ASCII strings to be encoded
+        :param flush_filter: should convolution filter values be flushed after the last chunk?
+        :return: binary strings of encoded chunks (and flushed filter values)
+        """
+        for data_in in chunks:
+            # `encode` processes characters of its input from the last one
+            emissions = self._encode_emissions(data_in[::-1], False)
+            if emissions:
+                yield self._emissions_to_str(emissions)
+
+        if flush_filter:
+            emissions = self._encode_emissions("", True)
+            if emissions:
+                yield self._emissions_to_str(emissions)
+
+    def encode_to_str(self, data_in: str, flush_filter=True) -> str:
+        """
+        Encodes provided ASCII string to binary string.
+
+        Result is the same as `data_out_to_str(encode(data_in))`, but the outputs
+        are converted directly from the packed filter outputs without creating
+        list of output bits for each of them.
+
+        :param data_in: ASCII string to be encoded
+        :param flush_filter: should convolution filter values be flushed?
+        :return: binary string of outputs in reversed order of calculation
+        """
+        return self._emissions_to_str(self._encode_emissions(data_in, flush_filter), reverse=True)
+
+    def _emission_strings(self) -> list:
+        """
+        Returns binary strings of all packed filter outputs (for each step
+        of puncturing period when the outputs are punctured).
+        """
+        if self._emission_string_table is None:
+            emission_count = 1 << len(self.filter.feedback_masks)
+            outputs = [self.filter.unpack_output(emission) for emission in range(emission_count)]
+            self._emission_string_table = [self.data_out_to_str([output]) for output in outputs]
+            if self.puncture_pattern is not None:
+                self._emission_string_table = [
+                    [self.data_out_to_str([[bit for bit, kept in zip(output, column) if kept]]) for output in outputs]
+                    for column in zip(*self.puncture_pattern)
+                ]
+
+        return self._emission_string_table
+
+    def _emissions_to_str(self, emissions: typing.List[int], reverse: bool = False) -> str:
+        """
+        Converts packed filter outputs to binary string (and moves position in puncturing period).
+
+        :param emissions: packed filter outputs in order of calculation
+        :param reverse: should the outputs be converted in reversed order of calculation?
+        :return: binary string of outputs
+        """
+        emission_strings = self._emission_strings()
+        if self.puncture_pattern is None:
+            return "".join(map(emission_strings.__getitem__, reversed(emissions) if reverse else emissions))
+
+        period = len(emission_strings)
+        first_step = self._output_step_count
+        # puncturing period of the next message starts again with its first output
+        self._output_step_count = 0 if self.filter.empty else first_step + len(emissions)
+        data_out = [emission_strings[(first_step + step) % period][emission] for step, emission in enumerate(emissions)]
+        if reverse:
+            data_out.reverse()
+
+        return "".join(data_out)
+
+    def _encode_emissions(self, data_in: str, flush_filter: bool) -> typing.List[int]:
+        """
+        Encodes provided ASCII string to packed filter outputs (see `Trellis.emissions`).
+
+        :param data_in: ASCII string to be encoded
+        :param flush_filter: should convolution filter values be flushed?
+        :return: packed filter outputs in order of calculation
+        """
         if self.filter_input:
             # remove undesired input content
             data_in = self.filter_data_in(data_in)
 
-        # convert input to "binary" integers
-        data_in_binary = self.str_to_int_binary(data_in)
-        # reverse the order from MSB->LSB to LSB->MSB
-        # this allows for simple `deque.popleft()` to get data bit by bit
-        data_in_binary.reverse()
+        # packed filter outputs in order of calculation
+        emissions = []
+        discard_first_output = False
 
-        # create collection to `pop` from
-        data_in_binary = deque(data_in_binary)
-        # create output collection to `appendleft` to
-        data_out = deque([])
+        if data_in and self.filter.empty:
+            # initialize convolution stages with 0s, the filter output
+            # calculated before the first input bit is inserted is discarded
+            self.filter.initialize()
+            discard_first_output = True
 
-        if self.filter.empty:
-            # initialize convolution stages
-            self.filter.initialize(first_bit=data_in_binary.popleft())
+        with profile_phase(self.stats, "encoding"):
+            # bits are encoded from the last character, each character from its LSB
+            for char in reversed(data_in):
+                # get ascii value of the character
+                char_numeric = ord(char)
+                if char_numeric > 255:
+                    raise RuntimeError("Unable to encode input character '{:s}' as ASCII character.".format(char))
 
-        # until there is no content in input data list do
-        while data_in_binary:
-            # get current bit from the input data
-            current_bit = data_in_binary.popleft()
+                # calculate encoder outputs for all character bits and update convolution filter
+                emissions += self.filter.insert_byte(char_numeric)
 
-            # calculate encoder output for current data bit and filter state
-            data_out.appendleft(self.filter.output)
+        if self.stats is not None:
+            self.stats.increment("bits encoded", 8 * len(data_in))
 
-            # update convolution filter - shift to right and add current bit
-            self.filter.insert_and_shift(current_bit)
+        if discard_first_output:
+            del emissions[0]
 
         # until there is no content in convolution filter do
         while flush_filter and not self.filter.empty:
             # flush values in the filter state one by one
-            data_out.appendleft(self.filter.output)
+            emissions.append(self.filter.emission)
 
             # empty the filter bits
             self.filter.shift()
 
-        return list(data_out)
+        return emissions
+
+    def puncture(self, data_out: typing.List[typing.List[int]], first_step: int = 0) -> typing.List[typing.List[int]]:
+        """
+        Removes erased outputs from result of `encode` using puncturing matrix.
+
+        :param data_out: filter outputs in reversed order of calculation
+        :param first_step: index of the first calculated output within the message
+        :return: transmitted filter outputs in reversed order of calculation
+        """
+        columns = list(zip(*self.puncture_pattern))
+        last_step = first_step + len(data_out) - 1
+        return [
+            [bit for bit, kept in zip(output, columns[(last_step - output_index) % len(columns)]) if kept]
+            for output_index, output in enumerate(data_out)
+        ]
+
+    def encode_bulk(self, data_in: str):
+        """
+        Encodes whole provided ASCII string to binary sequence at once (requires `numpy`).
+
+        Each output bit stream is calculated as GF(2) convolution of the input
+        bit stream with generator of corresponding feedback mask - a few shifts
+        and XORs of whole arrays. Result is equal to `encode(data_in)` of
+        encoder with empty filter (including flushed filter values), the state
+        of the filter is not used nor modified.
+
+        :param data_in: ASCII string to be encoded
+        :return: numpy array of shape (number of outputs, number of feedback masks)
+        """
+        return self.encode_batch([data_in])[0]
+
+    def encode_batch(self, frames: typing.Sequence[str]) -> list:
+        """
+        Encodes multiple independent ASCII strings at once (requires `numpy`).
+
+        Input bits of all the frames are padded with 0s to the same length and
+        convolved together (see `encode_bulk`), so the per-step work is shared
+        by all the frames. Each frame is encoded by empty filter and flushed,
+        the state of the filter is not used nor modified.
+
+        :param frames: ASCII strings to be encoded
+        :return: list of numpy arrays of shape (number of outputs, number of feedback masks) per frame
+        """
+        import numpy as np
+
+        if self.filter_input:
+            # remove undesired input content
+            frames = [self.filter_data_in(data_in) for data_in in frames]
+
+        stage_count = self.filter.stage_count
+        feedback_masks = self.filter.feedback_masks
+        input_lengths = [len(data_in) * 8 for data_in in frames]
+        max_output_length = max(input_lengths, default=0) + stage_count - 1
+
+        # input bits of each frame padded with 0s before (empty filter) and after (flushed filter and shorter frames)
+        padded_binary = np.zeros((len(frames), max_output_length + stage_count - 1), dtype=np.uint8)
+        for frame_index, data_in in enumerate(frames):
+            try:
+                data_in_bytes = np.frombuffer(data_in.encode("latin-1"), dtype=np.uint8)
+
+            except UnicodeEncodeError as ex:
+                raise RuntimeError("Unable to encode input character '{:s}' as ASCII character."
+                                   .format(data_in[ex.start]))
+
+            # bits are encoded from the last character, each character from its LSB
+            padded_binary[frame_index, stage_count - 1:stage_count - 1 + input_lengths[frame_index]] = \
+                np.unpackbits(data_in_bytes[::-1], bitorder="little")
+
+        data_out = np.zeros((len(frames), max_output_length, len(feedback_masks)), dtype=np.uint8)
+        with profile_phase(self.stats, "encoding"):
+            for output_bit_index, feedback_mask in enumerate(feedback_masks):
+                # memory block holding bit inserted `delay` steps ago has mask bit `stage_count - 1 - delay`
+                for delay in range(stage_count):
+                    if feedback_mask & (1 << (stage_count - 1 - delay)):
+                        offset = stage_count - 1 - delay
+                        data_out[:, :, output_bit_index] ^= padded_binary[:, offset:offset + max_output_length]
+
+        if self.stats is not None:
+            self.stats.increment("bits encoded", sum(input_lengths))
+
+        # outputs are returned in reversed order of calculation (same as `encode`), empty frames have no outputs
+        return [
+            data_out[frame_index, :input_length + stage_count - 1][::-1] if input_length
+            else np.zeros((0, len(feedback_masks)), dtype=np.uint8)
+            for frame_index, input_length in enumerate(input_lengths)
+        ]
+
+    def bulk_to_str(self, data_out) -> str:
+        """ Converts result of `encode_bulk` to binary string (without erased outputs of punctured code). """
+        import numpy as np
+
+        data_out = data_out + ord("0")
+        if self.puncture_pattern is not None:
+            # outputs are in reversed order of calculation, the last row is the first calculated output
+            columns = np.array(self.puncture_pattern, dtype=np.bool_).T
+            step_indices = np.arange(len(data_out) - 1, -1, -1) % len(columns)
+            return data_out[columns[step_indices]].astype("uint8").tobytes().decode("ascii")
+
+        return data_out.reshape(-1).astype("uint8").tobytes().decode("ascii")
@@ -0,0 +1,213 @@
+import logging
+import typing
+
+import numpy as np
+
+from profiling import profile_phase
+from viterbi_decoder import ViterbiDecoder
+
+logger = logging.getLogger("list-viterbi")
+
+
+class ListViterbiDecoder(ViterbiDecoder):
+
+    def __init__(self, stage_count: int, feedback_masks: typing.List[int], traceback_depth: int = None,
+                 puncture_pattern: typing.List[typing.List[int]] = None):
+        """
+        Initializes vectorized parallel list Viterbi decoder.
+
+        Instead of single survivor, the best `L` survivor paths (`L` being
+        the number of requested results) are kept for each of the encoder
+        states in every trellis step. The `L` best paths overall are then
+        obtained by traceback from the best final (state, rank) pairs.
+        Cost of decoding is bounded by O(L * 2^K * n).
+
+        :param stage_count: number of memory blocks
+        :param feedback_masks: list of feedback masks of memory blocks
+        :param traceback_depth: number of trellis steps after which stream decoding decisions are final
+        :param puncture_pattern: puncturing matrix used by encoder (see `check_puncture_pattern`)
+        """
+        super().__init__(stage_count, feedback_masks, traceback_depth, puncture_pattern)
+
+    def _initial_list_metrics(self, list_size: int, dtype=np.int64) -> np.ndarray:
+        """ Creates path metrics of all survivors in the initial trellis step (encoder starts in state 0s). """
+        path_metrics = np.full((self._trellis.state_count, list_size), self.UNREACHABLE_COST, dtype=dtype)
+        path_metrics[self._initial_state, 0] = 0
+        return path_metrics
+
+    def _list_add_compare_select(self, path_metrics: np.ndarray, observation_metrics: np.ndarray) \
+            -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Performs single trellis step for all states and survivors at once.
+
+        Leading dimensions of the arguments (e.g. frames of batch) are preserved,
+        states and ranks are always indexed by the last two dimensions.
+
+        :param path_metrics: path metrics of all survivors (state, rank) in previous step
+        :param observation_metrics: branch metrics of all packed emissions for current observation
+        :return: path metrics in current step and decisions - index of selected survivor among
+                 survivors of lower (`< L`) and upper (`>= L`) predecessor for each (state, rank)
+        """
+        list_size = path_metrics.shape[-1]
+        # survivors of both predecessors, lower predecessor first
+        candidate_metrics = np.concatenate(
+            (path_metrics[..., self._predecessors, :], path_metrics[..., self._predecessors | 1, :]), axis=-1)
+        # select `L` best candidates (ties resolved by lower predecessor and rank)
+        decisions = np.argsort(candidate_metrics, axis=-1, kind="stable")[..., :list_size]
+
+        path_metrics = np.take_along_axis(candidate_metrics, decisions, axis=-1)
+        path_metrics += observation_metrics[..., self._state_emissions][..., np.newaxis]
+        return path_metrics, decisions
+
+    def _list_traceback(self, decisions: np.ndarray, final_state: int, final_rank: int) -> typing.List[int]:
+        """
+        Reconstructs decoded binary sequence of survivor with given rank leading to given final state.
+
+        :param decisions: decisions of all trellis steps
+        :param final_state: state in which the path ends
+        :param final_rank: rank of the path among survivors of the final state
+        :return: decoded binary sequence (in order of processing)
+        """
+        list_size = decisions.shape[2]
+        data_out = []
+        current_state, current_rank = final_state, final_rank
+        # follow selected predecessors from the last step to the first one
+        for step_decisions in decisions[::-1]:
+            data_out.append(int(self._state_input_bits[current_state]))
+            candidate = int(step_decisions[current_state, current_rank])
+            current_state = int(self._predecessors[current_state]) | (candidate >= list_size)
+            current_rank = candidate % list_size
+
+        data_out.reverse()
+        return data_out
+
+    def _decode_observations(self, observations: typing.List[typing.List], max_result_count: int) \
+            -> typing.List[typing.Tuple[typing.Union[int, float], str]]:
+        """
+        Updates path metrics of the best survivors of all states for each observation
+        and traces back the best paths overall.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param max_result_count: maximum number of possible interpretations returned
+        :return: list of (path cost, decoded ASCII string)
+        """
+        # hard decision metrics are integers, soft decision metrics are floats
+        observations = self._observations_array(observations)
+
+        list_size = max(max_result_count, 1)
+        path_metrics = self._initial_list_metrics(list_size, observations.dtype)
+        decisions = np.zeros((len(observations), self._trellis.state_count, list_size), dtype=np.uint16)
+        with profile_phase(self.stats, "search"):
+            # for each observation update metrics of all survivors at once
+            for step, observation_metrics in enumerate(observations):
+                path_metrics, decisions[step] = self._list_add_compare_select(path_metrics, observation_metrics)
+        path_metrics = self._final_path_metrics(path_metrics)
+
+        if self.stats is not None:
+            self.stats.increment("states expanded", decisions.size)
+
+        # select the best reachable final survivors (ties resolved by lower state and rank)
+        final_survivors = np.argsort(path_metrics, axis=None, kind="stable")
+        return self._distinct_results(self._final_survivor_solutions(
+            path_metrics.reshape(-1), final_survivors,
+            lambda _, final_state, final_rank: self._list_traceback(decisions, final_state, final_rank),
+        ), max_result_count)
+
+    def _final_survivor_solutions(self, final_metrics: np.ndarray, final_survivors: typing.Iterable[int],
+                                  traceback: typing.Callable[[int, int, int], typing.List[int]]) \
+            -> typing.Iterator[typing.Tuple[typing.Union[int, float], typing.List[int]]]:
+        """
+        Traces back reachable final survivors one at a time (see `_distinct_results`).
+
+        Survivors which are not among the best `L` paths overall are traced back only when some
+        of the better paths decode to the same string, they are the best remaining paths of their
+        final states, but not necessarily the next best paths overall.
+
+        :param final_metrics: path metrics of all survivors after the last observation (state-major)
+        :param final_survivors: indices of survivors ordered by their path metrics
+        :param traceback: function reconstructing decoded binary sequence of survivor
+                          (called with the index of the path, its final state and rank)
+        :return: (path cost, decoded binary sequence) of each of the survivors
+        """
+        list_size = len(final_metrics) // self._trellis.state_count
+        for path_index, final_survivor in enumerate(final_survivors):
+            final_state, final_rank = divmod(int(final_survivor), list_size)
+            final_cost = final_metrics[final_survivor].item()
+            if final_cost >= self.UNREACHABLE_COST:
+                break
+
+            logger.debug("possible solution found in state %d with rank %d (cost=%2d)",
+                         final_state, final_rank, final_cost)
+            yield final_cost, traceback(path_index, final_state, final_rank)
+
+    def _batch_list_traceback(self, decisions: np.ndarray, frame_lengths: np.ndarray, final_states: np.ndarray,
+                              final_ranks: np.ndarray) -> np.ndarray:
+        """
+        Reconstructs decoded binary sequences of survivors with given ranks of all frames at once.
+
+        :param decisions: decisions of all trellis steps of shape (steps, frames, states, ranks)
+        :param frame_lengths: number of steps of each frame
+        :param final_states: states in which the paths end of shape (frames, paths)
+        :param final_ranks: ranks of the paths among survivors of their final states of shape (frames, paths)
+        :return: decoded bits of shape (frames, paths, steps), bits after the end of frame are undefined
+        """
+        list_size = decisions.shape[3]
+        frame_indices = np.arange(len(frame_lengths))[:, np.newaxis]
+        current_states, current_ranks = final_states.copy(), final_ranks.copy()
+        data_out = np.zeros(final_states.shape + (len(decisions),), dtype=np.uint8)
+        # follow selected predecessors from the last step to the first one, paths of shorter frames start later
+        for step in range(len(decisions) - 1, -1, -1):
+            data_out[:, :, step] = self._state_input_bits[current_states]
+            candidates = decisions[step][frame_indices, current_states, current_ranks].astype(np.int64)
+            frame_active = (step < frame_lengths)[:, np.newaxis]
+            current_states = np.where(
+                frame_active, self._predecessors[current_states] | (candidates >= list_size), current_states)
+            current_ranks = np.where(frame_active, candidates % list_size, current_ranks)
+
+        return data_out
+
+    def _decode_observations_batch(self, observations: typing.List[typing.List[typing.List]], max_result_count: int) \
+            -> typing.List[typing.List[typing.Tuple[typing.Union[int, float], str]]]:
+        """
+        Updates path metrics of the best survivors of all states of all frames at once
+        and traces back the best paths overall of each frame.
+
+        :param observations: branch metrics of all possible packed emissions per observation of each frame
+        :param max_result_count: maximum number of possible interpretations returned per frame
+        :return: list of (path cost, decoded ASCII string) of each frame
+        """
+        observations, frame_lengths = self._observations_batch_array(observations)
+        frame_count, step_count = observations.shape[:2]
+
+        list_size = max(max_result_count, 1)
+        path_metrics = np.tile(self._initial_list_metrics(list_size, observations.dtype), (frame_count, 1, 1))
+        decisions = np.zeros((step_count, frame_count, self._trellis.state_count, list_size), dtype=np.uint16)
+        for step in range(step_count):
+            step_metrics, decisions[step] = self._list_add_compare_select(path_metrics, observations[:, step])
+            # frames which already ended keep their final path metrics
+            path_metrics = np.where((step < frame_lengths)[:, np.newaxis, np.newaxis], step_metrics, path_metrics)
+
+        # select the best reachable final survivors of each frame (ties resolved by lower state and rank)
+        final_metrics = path_metrics.reshape(frame_count, -1)
+        final_survivors = np.argsort(final_metrics, axis=1, kind="stable")
+        # the best survivors are traced back for all frames at once
+        final_states, final_ranks = np.divmod(final_survivors[:, :max_result_count], list_size)
+        data_out = self._batch_list_traceback(decisions, frame_lengths, final_states, final_ranks)
+
+        def frame_traceback(frame_index: int, path_index: int, final_state: int, final_rank: int) \
+                -> typing.List[int]:
+            # other survivors are traced back only when some results decode to the same string
+            frame_length = frame_lengths[frame_index]
+            if path_index < data_out.shape[1]:
+                return data_out[frame_index, path_index, :frame_length].tolist()
+
+            return self._list_traceback(decisions[:frame_length, frame_index], final_state, final_rank)
+
+        return [
+            self._distinct_results(self._final_survivor_solutions(
+                final_metrics[frame_index], final_survivors[frame_index],
+                lambda path_index, final_state, final_rank: frame_traceback(
+                    frame_index, path_index, final_state, final_rank),
+            ), max_result_count)
+            for frame_index in range(frame_count)
+        ]
@@ -1,6 +1,9 @@
 import logging
 import sys
+import typing
 from argparse import ArgumentParser
+from array import array
+from contextlib import redirect_stdout
 from enum import Enum, auto
 
 
@@ -9,61 +12,221 @@ class OperationMode(Enum):
     DECODE = auto()
 
 
+ENCODER_ENGINES = ["table", "bulk"]
+DECODER_ENGINES = ["best-first", "viterbi", "list-viterbi", "beam", "stack"]
+# soft decision input formats and number of bits of quantized values
+SOFT_INPUT_FORMATS = {"float": None, "q3": 3, "q4": 4}
+# formats of binary sequence
+BINARY_FORMATS = ["text", "packed", "container"]
+# maximum number of bytes read at once by stream encoder
+STREAM_CHUNK_SIZE = 1 << 16
+# engines vectorized using optional dependency numpy
+NUMPY_ENGINES = ["bulk", "viterbi", "list-viterbi"]
+# puncturing matrices of commonly used code rates of codes with two feedback masks
+PUNCTURE_PATTERNS = {
+    "2/3": [[1, 1], [1, 0]],
+    "3/4": [[1, 1, 0], [1, 0, 1]],
+    "5/6": [[1, 1, 0, 1, 0], [1, 0, 1, 0, 1]],
+}
+
+
+def parse_puncture_pattern(value: str) -> typing.List[typing.List[int]]:
+    """ Returns puncturing matrix of given code rate or parses matrix given by comma separated rows of [01]. """
+    if value in PUNCTURE_PATTERNS:
+        return PUNCTURE_PATTERNS[value]
+
+    return [[int(bit) for bit in row] for row in value.split(",")]
+
+
+def parse_slice(value: str) -> typing.Tuple[int, typing.Optional[int]]:
+    """ Parses range of characters given as START:END (either of the offsets can be omitted). """
+    start, end = value.split(":")
+    return int(start) if start else 0, int(end) if end else None
+
+
+def read_soft_input(soft_format: str, binary: bool) -> typing.List[float]:
+    """ Reads soft decision values from STDIN in selected format. """
+    from convolutional_decoder import ConvolutionalDecoder
+    bit_count = SOFT_INPUT_FORMATS[soft_format]
+
+    if binary:
+        data_in = sys.stdin.buffer.read()
+        if bit_count is None:
+            # 32-bit floats in native byte order
+            values = array("f")
+            values.frombytes(data_in[:len(data_in) - len(data_in) % values.itemsize])
+            return list(values)
+
+        # single byte per quantized value
+        return ConvolutionalDecoder.dequantize_soft_data_in(data_in, bit_count)
+
+    values = ConvolutionalDecoder.parse_soft_data_in(sys.stdin.read())
+    if bit_count is None:
+        return values
+
+    return ConvolutionalDecoder.dequantize_soft_data_in(map(int, values), bit_count)
+
+
+def create_decoder(args: dict):
+    """ Creates decoder instance of selected engine. """
+    engine, traceback_depth = args["decoder"], args["traceback_depth"]
+    if engine == "viterbi":
+        from viterbi_decoder import ViterbiDecoder
+        return ViterbiDecoder(memory_stage_count, feedback_masks, traceback_depth, puncture_pattern)
+
+    if engine == "list-viterbi":
+        from list_viterbi_decoder import ListViterbiDecoder
+        return ListViterbiDecoder(memory_stage_count, feedback_masks, traceback_depth, puncture_pattern)
+
+    if engine == "beam":
+        from convolutional_decoder import BeamDecoder
+        return BeamDecoder(memory_stage_count, feedback_masks, traceback_depth, puncture_pattern, args["beam_width"])
+
+    if engine == "stack":
+        from convolutional_decoder import StackDecoder
+        return StackDecoder(memory_stage_count, feedback_masks, traceback_depth, puncture_pattern,
+                            args["fano_bias"], args["max_stack_size"], args["max_expansions"])
+
+    from convolutional_decoder import ConvolutionalDecoder
+    return ConvolutionalDecoder(memory_stage_count, feedback_masks, traceback_depth, puncture_pattern)
+
+
 def run(args):
     logging.info("running in %s", args["mode"])
+    if args["trellis_cache"]:
+        from trellis import configure_cache
+        configure_cache(args["trellis_cache"])
+
+    from profiling import ProfileStats, profile_phase
+    # counters and phase timings are collected only when requested
+    stats = ProfileStats() if args["profile"] else None
+
     if args["mode"] is OperationMode.ENCODE:
         # encoding mode - ASCII characters on STDIN, binary sequence to STDOUT
         from convolutional_encoder import ConvolutionalEncoder
-        encoder = ConvolutionalEncoder(memory_stage_count, feedback_masks, not args["no_encoder_filter"])
+        with profile_phase(stats, "table build"):
+            encoder = ConvolutionalEncoder(memory_stage_count, feedback_masks, not args["no_encoder_filter"],
+                                           puncture_pattern)
+        encoder.stats = stats
 
-        def print_encoded(d, inline: bool = False):
-            print("".join(map(lambda x: "".join(map(lambda y: str(y), x)), d)), end="" if inline else "\n")
+        if args["input"]:
+            # file mode - input is memory-mapped and encoded in chunks of fixed size
+            from chunked_io import encode_file
+            if args["output"]:
+                with open(args["output"], "wb") as output:
+                    encode_file(encoder, args["input"], output)
+            else:
+                encode_file(encoder, args["input"], sys.stdout.buffer)
 
-        if args["stream"]:
-            while data_in := sys.stdin.read(1):
-                logging.info("encoding input data: %s", repr(data_in))
-                data_out = encoder.encode(data_in, flush_filter=False)
+        elif args["stream"]:
+            # stream output is written in order of encoding, so it can be decoded as it arrives;
+            # chunks contain whatever input is available (up to the chunk size) at the time of reading
+            chunks = iter(lambda: sys.stdin.buffer.read1(STREAM_CHUNK_SIZE).decode("latin-1"), "")
+            for block in encoder.encode_iter(chunks):
+                # print out resulting data using single write per block
+                logging.info("encoded as: %s", block)
+                sys.stdout.write(block)
+                if args["low_latency"]:
+                    sys.stdout.flush()
 
-                # print out resulting data
-                logging.info("encoded as: %s", data_out)
-                print_encoded(data_out, inline=True)
+            print()
 
-            logging.info("flushing filter contents")
-            data_out = encoder.encode("", flush_filter=True)
+        elif args["output_format"] == "container":
+            # container is split to segments starting in known encoder states (see `container_format`)
+            from container_format import write_container
+            data_in = "".join(sys.stdin.readlines())
+            logging.info("encoding input data: %s", repr(data_in))
+            write_container(sys.stdout.buffer, encoder, data_in, args["checkpoint_interval"])
+            sys.stdout.buffer.flush()
 
         else:
             data_in = "".join(sys.stdin.readlines())
             logging.info("encoding input data: %s", repr(data_in))
-            data_out = encoder.encode(data_in)
+            if args["encoder"] == "bulk":
+                data_out = encoder.bulk_to_str(encoder.encode_bulk(data_in))
+            else:
+                data_out = encoder.data_out_to_str(encoder.encode(data_in))
 
-        # print out resulting data
-        logging.info("encoded as: %s", data_out)
-        print_encoded(data_out)
+            # print out resulting data
+            logging.info("encoded as: %s", data_out)
+            if args["output_format"] == "packed":
+                from packed_format import write_packed
+                write_packed(sys.stdout.buffer, data_out, memory_stage_count, feedback_masks)
+                sys.stdout.buffer.flush()
+            else:
+                print(data_out)
 
     elif args["mode"] is OperationMode.DECODE:
         # decoding mode - binary sequence on STDIN, ASCII characters to STDOUT
-        from convolutional_decoder import ConvolutionalDecoder
-        decoder = ConvolutionalDecoder(memory_stage_count, feedback_masks)
+        with profile_phase(stats, "table build"):
+            decoder = create_decoder(args)
+        decoder.stats = stats
 
         def print_best_decoded(d, inline: bool = False):
             print(d[0][1], end="" if inline else "\n")
 
-        if args["stream"]:
+        if args["input"]:
+            # file mode - input is memory-mapped and decoded in chunks of fixed size using stream decoding
+            from chunked_io import decode_file
+            decode_file(decoder, args["input"], args["output"])
+
+        elif args["stream"]:
+            # trellis state is kept between the reads, characters are printed once they are final
             while data_in := sys.stdin.read(8):
                 logging.info("decoding input data: %s", repr(data_in))
-                data_out = decoder.decode(data_in)
+                data_out = decoder.feed(data_in)
 
-                # print out resulting data
-                logging.info("most probable encoded results (cost, data): %s", data_out)
-                print_best_decoded(data_out, inline=True)
+                if data_out:
+                    logging.info("decoded as: %s", repr(data_out))
+                    print(data_out, end="", flush=True)
 
-            print()
+            logging.info("flushing decoder contents")
+            print(decoder.flush())
+
+        elif args["input_format"] == "container":
+            # only the segments holding requested characters are read from the container
+            from container_format import decode_container
+            input_stream = sys.stdin.buffer
+            if not input_stream.seekable():
+                # piped input is read whole to allow random access
+                from io import BytesIO
+                input_stream = BytesIO(input_stream.read())
+
+            start, end = args["slice"] or (0, None)
+            data_out = decode_container(input_stream, decoder, start, end, args["workers"])
+
+            # print out resulting data
+            logging.info("decoded as: %s", repr(data_out))
+            print(data_out)
+
+        elif args["soft"]:
+            data_in = read_soft_input(args["soft"], args["soft_binary"])
+
+            logging.info("decoding soft input data: %s", data_in)
+            if args["workers"] > 1:
+                data_out = decoder.decode_soft_parallel(data_in, args["workers"])
+            else:
+                data_out = decoder.decode_soft(data_in)
+
+            # print out resulting data
+            logging.info("most probable encoded results (cost, data): %s", data_out)
+            print_best_decoded(data_out)
 
         else:
-            data_in = sys.stdin.readline().strip()
+            if args["input_format"] == "packed":
+                from packed_format import read_packed
+                data_in, stage_count, masks = read_packed(sys.stdin.buffer)
+                if (stage_count, masks) != (memory_stage_count, feedback_masks):
+                    raise RuntimeError("Packed input was encoded using different code parameters "
+                                       "(memory blocks: {:d}, feedback masks: {}).".format(stage_count - 1, masks))
+            else:
+                data_in = sys.stdin.readline().strip()
 
             logging.info("decoding input data: %s", repr(data_in))
-            data_out = decoder.decode(data_in)
+            if args["workers"] > 1:
+                data_out = decoder.decode_parallel(data_in, args["workers"])
+            else:
+                data_out = decoder.decode(data_in)
 
             # print out resulting data
             logging.info("most probable encoded results (cost, data): %s", data_out)
@@ -72,6 +235,9 @@ def run(args):
     else:
         raise RuntimeError("Unknown operation mode selected.")
 
+    if stats is not None:
+        print(stats.report(), file=sys.stderr)
+
 
 if __name__ == '__main__':
     parser = ArgumentParser()
@@ -89,7 +255,65 @@ if __name__ == '__main__':
                         help="customizable program parameters (X is number of memory blocks; "
                              "Y,Z and other values are feedback memory bit masks per each output bit) "
                              "[defaults: 5 53 46]")
+    params.add_argument("--encoder", choices=ENCODER_ENGINES, default=ENCODER_ENGINES[0],
+                        help="encoding engine to be used (bulk requires numpy and is not supported in stream mode, "
+                             "with file input nor container format) [default: table]")
+    params.add_argument("--decoder", choices=DECODER_ENGINES, default=DECODER_ENGINES[0],
+                        help="decoding engine to be used (viterbi and list-viterbi require numpy) "
+                             "[default: best-first]")
+    params.add_argument("--beam-width", type=int, default=16, metavar="M",
+                        help="number of paths kept in each trellis step by beam decoder (M-algorithm) "
+                             "[default: 16]")
+    params.add_argument("--fano-bias", type=float, default=None, metavar="B",
+                        help="Fano metric bias per transmitted bit used by stack decoder, higher values make "
+                             "the search more greedy [default: derived from bit error rate 0.05]")
+    params.add_argument("--max-stack-size", type=int, default=1 << 16, metavar="N",
+                        help="maximum number of paths on the stack of stack decoder [default: 65536]")
+    params.add_argument("--max-expansions", type=int, default=None, metavar="N",
+                        help="maximum number of paths extended by stack decoder, the best path is then "
+                             "completed greedily [default: unlimited]")
+    params.add_argument("--traceback-depth", type=int, default=None, metavar="N",
+                        help="number of trellis steps after which stream decoding decisions are final "
+                             "[default: 5 * (X + 1)]")
+    params.add_argument("--soft", choices=SOFT_INPUT_FORMATS.keys(), default=None,
+                        help="decoder expects soft decision values instead of [01] characters "
+                             "(float - positive for 0, negative for 1; q3, q4 - quantized 0 to 7 or 15, "
+                             "0 being the most confident 0)")
+    params.add_argument("--soft-binary", action="store_true",
+                        help="soft decision values are read as binary (32-bit floats or single byte per value)")
+    params.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="number of processes decoding overlapping chunks of the input in parallel "
+                             "(not used in stream mode; codes whose feedback masks all have even weight, "
+                             "including the default 53 46, are always decoded by single process) [default: 1]")
+    params.add_argument("--input-format", choices=BINARY_FORMATS, default=BINARY_FORMATS[0],
+                        help="format of binary sequence read by decoder (packed - MSB first bytes with header "
+                             "holding sequence length and code parameters, container - packed segments "
+                             "decodable independently with index for random access) [default: text]")
+    params.add_argument("--output-format", choices=BINARY_FORMATS, default=BINARY_FORMATS[0],
+                        help="format of binary sequence written by encoder [default: text]")
+    params.add_argument("--checkpoint-interval", type=int, default=4096, metavar="N",
+                        help="number of characters between encoder state checkpoints of container "
+                             "[default: 4096]")
+    params.add_argument("--slice", type=parse_slice, default=None, metavar="START:END",
+                        help="decode only given range of characters of container (either offset can be omitted)")
+    params.add_argument("--trellis-cache", default=None, metavar="DIR",
+                        help="directory of persistent trellis table cache "
+                             "[default: value of TRELLIS_CACHE_DIR environment variable, disabled if not set]")
+    params.add_argument("--puncture", default=None, metavar="RATE",
+                        help="puncture encoder outputs to increase code rate (2/3, 3/4, 5/6 for codes with "
+                             "two feedback masks, or custom matrix given by comma separated rows of [01] "
+                             "per each feedback mask, e.g. 110,101) - decoder must use the same option")
+    params.add_argument("--profile", action="store_true",
+                        help="print counters (e.g. states expanded by the decoder) and phase timings to STDERR")
     params.add_argument("--stream", action="store_true", help="run program in stream mode", )
+    params.add_argument("--low-latency", action="store_true",
+                        help="stream encoder flushes its output after each encoded block of input "
+                             "(for interactive use)", )
+    params.add_argument("--input", default=None, metavar="FILE",
+                        help="read input from memory-mapped file and process it in chunks of fixed size "
+                             "(decoder then uses stream decoding, text format only)")
+    params.add_argument("--output", default=None, metavar="FILE",
+                        help="write output to file instead of STDOUT (required when decoding --input)")
     params.add_argument("--no-encoder-filter", action="store_true",
                         help="encoder will accept any ASCII characters as input", )
 
@@ -97,15 +321,72 @@ if __name__ == '__main__':
     if not arguments["mode"]:
         parser.error("mode option (either -e or -d) must be present")
 
+    if arguments["soft"] and (arguments["mode"] is not OperationMode.DECODE or arguments["stream"]):
+        parser.error("soft decision input is supported only in non-stream decoding mode")
+
+    if "packed" in (arguments["input_format"], arguments["output_format"]) \
+            and (arguments["stream"] or arguments["soft"]):
+        parser.error("packed format is not supported in stream mode nor with soft decision input")
+
+    if "container" in (arguments["input_format"], arguments["output_format"]) \
+            and (arguments["stream"] or arguments["soft"] or arguments["puncture"] or arguments["input"]):
+        parser.error("container format is not supported in stream mode, with soft decision input, "
+                     "puncturing nor file input")
+
+    if arguments["checkpoint_interval"] < 1:
+        parser.error("checkpoint interval must be positive")
+
+    if arguments["slice"] and (arguments["mode"] is not OperationMode.DECODE
+                               or arguments["input_format"] != "container"):
+        parser.error("slice can be decoded only from container input")
+
+    if arguments["input"]:
+        if arguments["stream"] or arguments["soft"] or arguments["puncture"] \
+                or "packed" in (arguments["input_format"], arguments["output_format"]):
+            parser.error("file input is not supported in stream mode, with soft decision input, "
+                         "puncturing nor packed format")
+
+        if arguments["mode"] is OperationMode.DECODE and not arguments["output"]:
+            parser.error("decoding of file input requires output file")
+
+    if arguments["mode"] is OperationMode.ENCODE and arguments["encoder"] == "bulk" \
+            and (arguments["stream"] or arguments["input"] or arguments["output_format"] == "container"):
+        # these modes always encode by precomputed table of filter outputs
+        parser.error("bulk encoder is not supported in stream mode, with file input nor container format")
+
+    if arguments["mode"] is OperationMode.DECODE and arguments["decoder"] in ("beam", "stack") \
+            and (arguments["stream"] or arguments["input"]):
+        # stream decoding (used by file input as well) updates all the encoder states
+        parser.error("reduced-state decoders (beam, stack) are not supported in stream mode nor with file input")
+
     if len(arguments["params"]) < 2:
         parser.error("invalid parameter specification")
 
+    engine = arguments["encoder"] if arguments["mode"] is OperationMode.ENCODE else arguments["decoder"]
+    if engine in NUMPY_ENGINES:
+        from utils import numpy_available
+        if not numpy_available():
+            parser.error("{} engine requires numpy (pip install numpy)".format(engine))
+
     memory_stage_count = arguments["params"][0] + 1
     assert 1 <= memory_stage_count
 
     feedback_masks = arguments["params"][1:]
     assert 1 <= len(feedback_masks)
 
+    puncture_pattern = None
+    if arguments["puncture"]:
+        if arguments["stream"]:
+            parser.error("puncturing is not supported in stream mode")
+
+        from utils import check_puncture_pattern
+        try:
+            puncture_pattern = parse_puncture_pattern(arguments["puncture"])
+            check_puncture_pattern(puncture_pattern, len(feedback_masks))
+
+        except (ValueError, RuntimeError) as ex:
+            parser.error("invalid puncturing matrix: {}".format(ex))
+
     log_level = logging.ERROR - min(arguments["verbose"], logging.ERROR // 10) * 10
     logging.basicConfig(
         format="%(asctime)s %(levelname)s (%(name)s): %(message)s",
@@ -114,7 +395,12 @@ if __name__ == '__main__':
     )
 
     try:
-        run(arguments)
+        if arguments["output"] and not arguments["input"]:
+            # results of other modes are printed to STDOUT
+            with open(arguments["output"], "w") as output_file, redirect_stdout(output_file):
+                run(arguments)
+        else:
+            run(arguments)
 
     except:
         logging.exception("program encountered an error while running")
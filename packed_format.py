@@ -0,0 +1,82 @@
+import struct
+import typing
+
+# identification of packed binary sequence and version of its format
+MAGIC = b"CNV\x01"
+# magic, length of binary sequence in bits, number of memory blocks, number of feedback masks
+HEADER = struct.Struct(">4sQBB")
+# single feedback mask
+FEEDBACK_MASK = struct.Struct(">I")
+# size of blocks in which packed data are written and read
+BLOCK_SIZE = 1 << 20
+
+
+def pack_bits(data_in: str) -> bytes:
+    """ Packs binary sequence of [01] characters to bytes (MSB first, last byte padded with 0s). """
+    if not data_in:
+        return b""
+
+    padding_length = -len(data_in) % 8
+    return int(data_in + "0" * padding_length, 2).to_bytes((len(data_in) + padding_length) // 8, "big")
+
+
+def unpack_bits(data_in: bytes, bit_length: int) -> str:
+    """ Unpacks bytes (MSB first) to binary sequence of [01] characters of given length. """
+    if not bit_length:
+        return ""
+
+    return format(int.from_bytes(data_in, "big"), "0{:d}b".format(len(data_in) * 8))[:bit_length]
+
+
+def write_packed(stream: typing.BinaryIO, data_in: str, stage_count: int, feedback_masks: typing.List[int]):
+    """
+    Writes binary sequence to binary stream in packed format.
+
+    :param stream: binary output stream
+    :param data_in: binary sequence of [01] characters
+    :param stage_count: number of memory blocks of the code
+    :param feedback_masks: list of feedback masks of the code
+    """
+    stream.write(HEADER.pack(MAGIC, len(data_in), stage_count, len(feedback_masks)))
+    for feedback_mask in feedback_masks:
+        stream.write(FEEDBACK_MASK.pack(feedback_mask))
+
+    # each block contains whole number of bytes
+    block_bit_length = BLOCK_SIZE * 8
+    for block_start in range(0, len(data_in), block_bit_length):
+        stream.write(pack_bits(data_in[block_start:block_start + block_bit_length]))
+
+
+def _read_exactly(stream: typing.BinaryIO, length: int) -> bytes:
+    """ Reads given number of bytes from binary stream. """
+    data = stream.read(length)
+    if len(data) != length:
+        raise RuntimeError("Packed input is truncated.")
+
+    return data
+
+
+def read_packed(stream: typing.BinaryIO) -> typing.Tuple[str, int, typing.List[int]]:
+    """
+    Reads binary sequence in packed format from binary stream.
+
+    :param stream: binary input stream
+    :return: binary sequence of [01] characters, number of memory blocks and list of feedback masks of the code
+    """
+    magic, bit_length, stage_count, feedback_mask_count = HEADER.unpack(_read_exactly(stream, HEADER.size))
+    if magic != MAGIC:
+        raise RuntimeError("Input is not in packed format.")
+
+    feedback_masks = [
+        FEEDBACK_MASK.unpack(_read_exactly(stream, FEEDBACK_MASK.size))[0]
+        for _ in range(feedback_mask_count)
+    ]
+
+    blocks = []
+    bits_left = bit_length
+    while bits_left:
+        block_bit_length = min(bits_left, BLOCK_SIZE * 8)
+        blocks.append(unpack_bits(_read_exactly(stream, -(-block_bit_length // 8)), block_bit_length))
+        bits_left -= block_bit_length
+
+    return "".join(blocks), stage_count, feedback_masks
@@ -0,0 +1,61 @@
+import time
+import typing
+from contextlib import contextmanager, nullcontext
+
+
+class ProfileStats(object):
+
+    def __init__(self):
+        """
+        Initializes collection of counters and phase timings.
+
+        Instrumented objects (encoders and decoders) hold reference to the
+        collection in their `stats` attribute, which is `None` by default -
+        instrumentation then costs a single comparison per measured event.
+        """
+        # counted events (e.g. states expanded by the decoder) in order of first occurrence
+        self.counters = {}
+        # total duration of each phase in seconds in order of first occurrence
+        self.timings = {}
+
+    def increment(self, name: str, value: int = 1):
+        """ Increases value of counter with given name. """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def maximum(self, name: str, value: int):
+        """ Updates counter with given name to the maximum of its current and provided value. """
+        self.counters[name] = max(self.counters.get(name, value), value)
+
+    def add_timing(self, name: str, duration: float):
+        """ Adds duration (in seconds) to the total duration of phase with given name. """
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
+    @contextmanager
+    def phase(self, name: str):
+        """ Measures duration of code block and adds it to the total duration of phase with given name. """
+        start = time.perf_counter()
+        try:
+            yield self
+
+        finally:
+            self.add_timing(name, time.perf_counter() - start)
+
+    def as_dict(self) -> typing.Dict[str, dict]:
+        """ Returns copy of collected counters and timings. """
+        return {"counters": dict(self.counters), "timings": dict(self.timings)}
+
+    def report(self) -> str:
+        """ Returns human readable summary of collected counters and timings. """
+        lines = ["phase timings:"]
+        lines += ["  {:<24s} {:10.6f} s".format(name, duration) for name, duration in self.timings.items()]
+        lines += ["counters:"]
+        lines += ["  {:<24s} {:10d}".format(name, value) for name, value in self.counters.items()]
+        return "\n".join(lines)
+
+
+def profile_phase(stats: typing.Optional[ProfileStats], name: str):
+    """ Returns context measuring phase with given name (does nothing when stats are not collected). """
+    if stats is None:
+        return nullcontext()
+
+    return stats.phase(name)
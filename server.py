@@ -0,0 +1,472 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import time
+import typing
+from argparse import ArgumentParser
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger("server")
+
+# big-endian length of JSON message following the prefix
+LENGTH_PREFIX = struct.Struct(">I")
+# maximum accepted length of single message
+MAX_MESSAGE_LENGTH = 1 << 26
+# code parameters used by requests which do not specify them (same as in main.py)
+DEFAULT_PARAMS = [5, 53, 46]
+ENCODER_ENGINES = ["table", "bulk"]
+# reduced-state decoders (beam, stack) are not served - they build the same trellis tables, so they do not
+# lift the limit of memory blocks, and their tuning options are not part of the request protocol
+DECODER_ENGINES = ["best-first", "viterbi", "list-viterbi"]
+# operations accepted by the server
+OPERATIONS = ["encode", "decode", "decode_soft", "ping", "stats"]
+# default maximum number of memory blocks of requested codes (trellis tables grow exponentially)
+MAX_MEMORY_BLOCKS = 12
+# maximum number of feedback masks of requested codes (branch metrics are calculated for each packed emission)
+MAX_FEEDBACK_MASK_COUNT = 8
+# default maximum number of possible interpretations returned by single decoding request
+MAX_RESULT_COUNT = 16
+# number of the most recent request latencies used to calculate percentiles
+LATENCY_SAMPLE_COUNT = 4096
+# maximum number of encoder and decoder instances kept by single process
+CODEC_POOL_SIZE = 32
+
+# codec pool of worker process
+_worker_codecs = None
+
+
+class CodecPool(object):
+
+    def __init__(self, max_size: int = CODEC_POOL_SIZE, max_memory_blocks: int = MAX_MEMORY_BLOCKS,
+                 max_result_count: int = MAX_RESULT_COUNT):
+        """
+        Initializes pool of pre-built encoder and decoder instances.
+
+        Instances are keyed by their kind, engine and code parameters, the least
+        recently used ones are dropped once there are more than `max_size` of them.
+        Requests exceeding limits of the pool are rejected (see `process_request`).
+
+        :param max_size: maximum number of kept instances
+        :param max_memory_blocks: maximum number of memory blocks of requested codes
+        :param max_result_count: maximum number of possible interpretations returned by single decoding request
+        """
+        self.max_size = max_size
+        self.max_memory_blocks = max_memory_blocks
+        self.max_result_count = max_result_count
+        self._codecs = OrderedDict()
+
+    def get(self, kind: str, engine: str, params: typing.List[int],
+            puncture_pattern: typing.List[typing.List[int]] = None):
+        """
+        Returns encoder or decoder instance for given code parameters (built when missing).
+
+        :param kind: either `encoder` or `decoder`
+        :param engine: encoding or decoding engine (see `ENCODER_ENGINES` and `DECODER_ENGINES`)
+        :param params: number of memory blocks followed by feedback masks (same as `--params` of main.py)
+        :param puncture_pattern: puncturing matrix of the code
+        """
+        check_params(params, self.max_memory_blocks)
+        key = kind, engine, tuple(params), tuple(map(tuple, puncture_pattern)) if puncture_pattern else None
+        codec = self._codecs.get(key)
+        if codec is None:
+            codec = create_codec(kind, engine, params, puncture_pattern)
+            self._codecs[key] = codec
+            while len(self._codecs) > self.max_size:
+                self._codecs.popitem(last=False)
+
+        else:
+            self._codecs.move_to_end(key)
+
+        return codec
+
+    def preload(self, params_list: typing.List[typing.List[int]], decoder_engine: str):
+        """ Builds encoder and decoder instances (and their trellis tables) of given codes in advance. """
+        for params in params_list:
+            self.get("encoder", ENCODER_ENGINES[0], params)
+            self.get("decoder", decoder_engine, params)
+
+
+def check_params(params: typing.List[int], max_memory_blocks: int = MAX_MEMORY_BLOCKS):
+    """
+    Checks code parameters of request before any tables of the code are built.
+
+    :param params: number of memory blocks followed by feedback masks (same as `--params` of main.py)
+    :param max_memory_blocks: maximum number of memory blocks
+    """
+    if not isinstance(params, list) or len(params) < 2 or not all(type(param) is int for param in params) \
+            or params[0] < 0:
+        raise RuntimeError("Invalid parameter specification.")
+    if params[0] > max_memory_blocks:
+        raise RuntimeError("Number of memory blocks exceeds limit of the server ({:d}).".format(max_memory_blocks))
+    if len(params) - 1 > MAX_FEEDBACK_MASK_COUNT:
+        raise RuntimeError("Number of feedback masks exceeds limit of the server ({:d}).".format(
+            MAX_FEEDBACK_MASK_COUNT))
+
+
+def check_request(request: dict, max_memory_blocks: int = MAX_MEMORY_BLOCKS):
+    """
+    Checks types of values of encoding or decoding request before they are passed to codecs.
+
+    :param request: operation (`encode`, `decode`, `decode_soft`), `data` and optional
+                    `params`, `encoder`/`decoder` engine and `puncture` matrix
+    :param max_memory_blocks: maximum number of memory blocks
+    """
+    operation = request.get("op")
+    data_in = request.get("data", "")
+    if operation == "decode_soft":
+        if not isinstance(data_in, list) or not all(type(value) in (int, float) for value in data_in):
+            raise RuntimeError("Data of soft decoding must be list of numbers.")
+    elif not isinstance(data_in, str):
+        raise RuntimeError("Data must be string.")
+
+    check_params(request.get("params", DEFAULT_PARAMS), max_memory_blocks)
+
+    engine = request.get("encoder" if operation == "encode" else "decoder")
+    if engine is not None and not isinstance(engine, str):
+        raise RuntimeError("Engine must be string.")
+
+    puncture_pattern = request.get("puncture")
+    if puncture_pattern is not None and (
+            not isinstance(puncture_pattern, list)
+            or not all(isinstance(row, list) and all(type(value) is int for value in row) for row in puncture_pattern)):
+        raise RuntimeError("Puncturing matrix must be list of rows (lists of 0s and 1s).")
+
+
+def create_codec(kind: str, engine: str, params: typing.List[int], puncture_pattern: typing.List[typing.List[int]]):
+    """ Creates encoder or decoder instance of selected engine. """
+    if len(params) < 2 or params[0] < 0:
+        raise RuntimeError("Invalid parameter specification.")
+
+    stage_count, feedback_masks = params[0] + 1, list(params[1:])
+    if kind == "encoder":
+        if engine not in ENCODER_ENGINES:
+            raise RuntimeError("Unknown encoding engine '{}'.".format(engine))
+
+        from convolutional_encoder import ConvolutionalEncoder
+        return ConvolutionalEncoder(stage_count, feedback_masks, puncture_pattern=puncture_pattern)
+
+    if kind != "decoder" or engine not in DECODER_ENGINES:
+        raise RuntimeError("Unknown decoding engine '{}'.".format(engine))
+
+    if engine == "viterbi":
+        from viterbi_decoder import ViterbiDecoder
+        return ViterbiDecoder(stage_count, feedback_masks, None, puncture_pattern)
+
+    if engine == "list-viterbi":
+        from list_viterbi_decoder import ListViterbiDecoder
+        return ListViterbiDecoder(stage_count, feedback_masks, None, puncture_pattern)
+
+    from convolutional_decoder import ConvolutionalDecoder
+    return ConvolutionalDecoder(stage_count, feedback_masks, None, puncture_pattern)
+
+
+def process_request(request: dict, codecs: CodecPool) -> dict:
+    """
+    Performs encoding or decoding request using codec instances of given pool.
+
+    :param request: operation (`encode`, `decode`, `decode_soft`), `data` and optional
+                    `params`, `encoder`/`decoder` engine, `puncture` matrix and `max_results`
+    :param codecs: pool of pre-built encoder and decoder instances
+    :return: result of the operation and number of processed bits
+    """
+    check_request(request, codecs.max_memory_blocks)
+    operation = request.get("op")
+    params = request.get("params", DEFAULT_PARAMS)
+    puncture_pattern = request.get("puncture")
+    data_in = request.get("data", "")
+
+    if operation == "encode":
+        engine = request.get("encoder", ENCODER_ENGINES[0])
+        encoder = codecs.get("encoder", engine, params, puncture_pattern)
+        if engine == "bulk":
+            data_out = encoder.bulk_to_str(encoder.encode_bulk(data_in))
+        else:
+            data_out = encoder.data_out_to_str(encoder.encode(data_in))
+
+        return {"result": data_out, "bits": len(data_out)}
+
+    if operation in ("decode", "decode_soft"):
+        decoder = codecs.get("decoder", request.get("decoder", DECODER_ENGINES[0]), params, puncture_pattern)
+        max_result_count = request.get("max_results", 1)
+        if type(max_result_count) is not int or not 1 <= max_result_count <= codecs.max_result_count:
+            raise RuntimeError("Number of results must be between 1 and {:d}.".format(codecs.max_result_count))
+
+        if operation == "decode":
+            data_out = decoder.decode(data_in, max_result_count)
+        else:
+            data_out = decoder.decode_soft(data_in, max_result_count)
+
+        return {"result": [list(result) for result in data_out], "bits": len(data_in)}
+
+    raise RuntimeError("Unknown operation '{}'.".format(operation))
+
+
+def _initialize_worker(preload_params: typing.List[typing.List[int]], decoder_engine: str,
+                       trellis_cache: typing.Optional[str], max_memory_blocks: int, max_result_count: int):
+    """ Creates codec pool of worker process and builds instances of preloaded codes. """
+    global _worker_codecs
+    if trellis_cache:
+        from trellis import configure_cache
+        configure_cache(trellis_cache)
+
+    _worker_codecs = CodecPool(max_memory_blocks=max_memory_blocks, max_result_count=max_result_count)
+    _worker_codecs.preload(preload_params, decoder_engine)
+
+
+def _process_request_task(request: dict) -> dict:
+    """ Performs request in worker process. """
+    return process_request(request, _worker_codecs)
+
+
+def encode_message(message: dict) -> bytes:
+    """ Serializes message to JSON prefixed by its length. """
+    data = json.dumps(message).encode("utf-8")
+    return LENGTH_PREFIX.pack(len(data)) + data
+
+
+async def read_message(reader: asyncio.StreamReader) -> typing.Optional[dict]:
+    """ Reads single length-prefixed JSON message from stream, returns `None` when the stream is closed. """
+    try:
+        (length,) = LENGTH_PREFIX.unpack(await reader.readexactly(LENGTH_PREFIX.size))
+
+    except asyncio.IncompleteReadError:
+        return None
+
+    if length > MAX_MESSAGE_LENGTH:
+        raise RuntimeError("Message of {:d} bytes exceeds maximum message length.".format(length))
+
+    return json.loads(await reader.readexactly(length))
+
+
+def request(connection: socket.socket, message: dict) -> dict:
+    """
+    Sends single request to the server and waits for its response (blocking client helper).
+
+    :param connection: connected Unix or TCP socket
+    :param message: request (see `process_request`)
+    :return: response - either `result` or `error`
+    """
+    connection.sendall(encode_message(message))
+    (length,) = LENGTH_PREFIX.unpack(_receive_exactly(connection, LENGTH_PREFIX.size))
+    return json.loads(_receive_exactly(connection, length))
+
+
+def _receive_exactly(connection: socket.socket, length: int) -> bytes:
+    """ Receives given number of bytes from socket. """
+    data = bytearray()
+    while len(data) < length:
+        chunk = connection.recv(length - len(data))
+        if not chunk:
+            raise RuntimeError("Connection closed by the server.")
+        data += chunk
+
+    return bytes(data)
+
+
+class CodecServer(object):
+
+    def __init__(self, worker_count: int, preload_params: typing.List[typing.List[int]],
+                 decoder_engine: str = DECODER_ENGINES[0], trellis_cache: str = None,
+                 max_memory_blocks: int = MAX_MEMORY_BLOCKS, max_result_count: int = MAX_RESULT_COUNT):
+        """
+        Initializes encode/decode server.
+
+        Encoding is cheap and it is performed directly by the event loop, decoding
+        is handed to pool of worker processes (or performed directly when there
+        are no workers). All processes keep their own pool of pre-built codecs.
+
+        :param worker_count: number of decoding worker processes
+        :param preload_params: code parameters of codecs built in advance
+        :param decoder_engine: decoding engine of preloaded decoders
+        :param trellis_cache: directory of persistent trellis table cache
+        :param max_memory_blocks: maximum number of memory blocks of requested codes
+        :param max_result_count: maximum number of possible interpretations returned by single decoding request
+        """
+        self.codecs = CodecPool(max_memory_blocks=max_memory_blocks, max_result_count=max_result_count)
+        self.codecs.preload(preload_params, decoder_engine)
+
+        self.executor = None
+        if worker_count:
+            self.executor = ProcessPoolExecutor(worker_count, initializer=_initialize_worker,
+                                                initargs=(preload_params, decoder_engine, trellis_cache,
+                                                          max_memory_blocks, max_result_count))
+
+        self.started = time.monotonic()
+        # number of handled requests by operation (requests of unknown operations are counted as `invalid`)
+        self.request_counts = {}
+        self.error_count = 0
+        # number of input bits of decoding and output bits of encoding requests
+        self.processed_bits = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLE_COUNT)
+
+    def statistics(self) -> dict:
+        """ Returns request counters, latencies (in milliseconds) and throughput since the server started. """
+        uptime = time.monotonic() - self.started
+        request_count = sum(self.request_counts.values())
+        latencies = sorted(self.latencies)
+
+        def percentile(ratio: float) -> float:
+            return 1000 * latencies[min(int(ratio * len(latencies)), len(latencies) - 1)] if latencies else 0.0
+
+        return {
+            "uptime": uptime,
+            "requests": dict(self.request_counts),
+            "errors": self.error_count,
+            "requests_per_second": request_count / uptime if uptime else 0.0,
+            "bits_per_second": self.processed_bits / uptime if uptime else 0.0,
+            "latency_ms": {
+                "mean": 1000 * self.total_latency / request_count if request_count else 0.0,
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": 1000 * self.max_latency,
+            },
+        }
+
+    async def dispatch(self, message: dict) -> dict:
+        """ Performs single request and returns its response. """
+        if not isinstance(message, dict):
+            raise RuntimeError("Request must be JSON object.")
+
+        operation = message.get("op")
+        if operation not in OPERATIONS:
+            raise RuntimeError("Unknown operation '{}'.".format(operation))
+
+        if operation == "stats":
+            return {"result": self.statistics()}
+
+        if operation == "ping":
+            return {"result": "pong"}
+
+        if operation != "encode" and self.executor is not None:
+            # decoding is CPU-bound, it would block other connections
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, _process_request_task, message)
+        else:
+            result = process_request(message, self.codecs)
+
+        self.processed_bits += result.pop("bits")
+        return result
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ Handles requests of single client connection until it is closed. """
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+
+                except (RuntimeError, ValueError) as ex:
+                    # the stream cannot be resynchronized after invalid message
+                    writer.write(encode_message({"error": str(ex)}))
+                    break
+
+                if message is None:
+                    break
+
+                start = time.perf_counter()
+                try:
+                    response = await self.dispatch(message)
+
+                except Exception as ex:
+                    logger.warning("request failed: %s", ex)
+                    self.error_count += 1
+                    response = {"error": str(ex)}
+
+                latency = time.perf_counter() - start
+                operation = message.get("op") if isinstance(message, dict) else None
+                if operation not in OPERATIONS:
+                    operation = "invalid"
+                self.request_counts[operation] = self.request_counts.get(operation, 0) + 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                self.latencies.append(latency)
+
+                writer.write(encode_message(response))
+                await writer.drain()
+
+        except ConnectionError:
+            logger.info("client connection lost")
+
+        finally:
+            writer.close()
+
+    async def serve(self, unix_path: str = None, host: str = None, port: int = None):
+        """ Listens on Unix socket (when path is given) or TCP socket and serves clients forever. """
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+
+        logger.info("listening on %s", unix_path or "{}:{}".format(host, port))
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def run(args: dict):
+    if args["trellis_cache"]:
+        from trellis import configure_cache
+        configure_cache(args["trellis_cache"])
+
+    worker_count = args["workers"] if args["workers"] is not None else os.cpu_count() or 1
+    server = CodecServer(worker_count, args["preload"] or [DEFAULT_PARAMS], args["decoder"], args["trellis_cache"],
+                         args["max_memory_blocks"], args["max_results"])
+    try:
+        asyncio.run(server.serve(args["unix"], args["host"], args["port"]))
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.close()
+        if args["unix"] and os.path.exists(args["unix"]):
+            os.unlink(args["unix"])
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="encode/decode server using length-prefixed JSON messages")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="sets verbosity of logging (1-3)", )
+    parser.add_argument("--unix", default=None, metavar="PATH", help="listen on Unix socket instead of TCP socket")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address to listen on [default: 127.0.0.1]")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on [default: 8765]")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="number of decoding worker processes, 0 decodes within the server process "
+                             "[default: number of CPUs]")
+    parser.add_argument("--preload", nargs="+", type=int, action="append", default=None, metavar="X Y Z",
+                        help="parameters of code whose encoder and decoder are built at startup "
+                             "(can be repeated) [default: 5 53 46]")
+    parser.add_argument("--decoder", choices=DECODER_ENGINES, default=DECODER_ENGINES[0],
+                        help="decoding engine of preloaded decoders [default: best-first]")
+    parser.add_argument("--trellis-cache", default=None, metavar="DIR",
+                        help="directory of persistent trellis table cache")
+    parser.add_argument("--max-memory-blocks", type=int, default=MAX_MEMORY_BLOCKS, metavar="X",
+                        help="maximum number of memory blocks of requested codes "
+                             "[default: {:d}]".format(MAX_MEMORY_BLOCKS))
+    parser.add_argument("--max-results", type=int, default=MAX_RESULT_COUNT, metavar="N",
+                        help="maximum number of possible interpretations returned by single decoding request "
+                             "[default: {:d}]".format(MAX_RESULT_COUNT))
+
+    arguments = parser.parse_args().__dict__
+    if any(len(params) < 2 for params in arguments["preload"] or []):
+        parser.error("invalid parameter specification")
+    if any(params[0] > arguments["max_memory_blocks"] for params in arguments["preload"] or []):
+        parser.error("preloaded code exceeds maximum number of memory blocks")
+    if arguments["max_results"] < 1:
+        parser.error("maximum number of results must be positive")
+
+    log_level = logging.ERROR - min(arguments["verbose"], logging.ERROR // 10) * 10
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s (%(name)s): %(message)s",
+        level=log_level,
+        datefmt="%Y-%m-%dT%H:%M:%S%z",
+    )
+
+    run(arguments)
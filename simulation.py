@@ -0,0 +1,259 @@
+import csv
+import logging
+import math
+import os
+import random
+import sys
+import typing
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger("simulation")
+
+CHANNELS = ["bsc", "awgn"]
+DECODER_ENGINES = ["best-first", "viterbi", "list-viterbi", "beam", "stack"]
+# characters of generated messages (not removed by encoder input filter)
+MESSAGE_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+# two-sided 95% quantile of standard normal distribution
+CONFIDENCE_QUANTILE = 1.959964
+CSV_COLUMNS = ["channel", "parameter", "trials", "bits", "bit_errors", "ber", "ber_low", "ber_high",
+               "frame_errors", "fer"]
+
+# encoder and decoder instances of worker process and rate of their code
+_worker_encoder = None
+_worker_decoder = None
+_worker_code_rate = None
+
+
+def create_decoder(engine: str, stage_count: int, feedback_masks: typing.List[int]):
+    """ Creates decoder instance of selected engine. """
+    if engine == "viterbi":
+        from viterbi_decoder import ViterbiDecoder
+        return ViterbiDecoder(stage_count, feedback_masks)
+
+    if engine == "list-viterbi":
+        from list_viterbi_decoder import ListViterbiDecoder
+        return ListViterbiDecoder(stage_count, feedback_masks)
+
+    if engine == "beam":
+        from convolutional_decoder import BeamDecoder
+        return BeamDecoder(stage_count, feedback_masks)
+
+    if engine == "stack":
+        from convolutional_decoder import StackDecoder
+        return StackDecoder(stage_count, feedback_masks)
+
+    from convolutional_decoder import ConvolutionalDecoder
+    return ConvolutionalDecoder(stage_count, feedback_masks)
+
+
+def _initialize_worker(engine: str, stage_count: int, feedback_masks: typing.List[int]):
+    """ Creates encoder and decoder instances of worker process (reused by all of its trials). """
+    global _worker_encoder, _worker_decoder, _worker_code_rate
+    from convolutional_encoder import ConvolutionalEncoder
+    _worker_encoder = ConvolutionalEncoder(stage_count, feedback_masks)
+    _worker_decoder = create_decoder(engine, stage_count, feedback_masks)
+    _worker_code_rate = 1.0 / len(feedback_masks)
+
+
+def bsc_channel(data_in: str, flip_probability: float, generator: random.Random) -> str:
+    """ Binary symmetric channel - flips each bit with given probability. """
+    return "".join(
+        ("1" if bit == "0" else "0") if generator.random() < flip_probability else bit
+        for bit in data_in
+    )
+
+
+def awgn_channel(data_in: str, noise_deviation: float, generator: random.Random) -> typing.List[float]:
+    """ Additive white Gaussian noise channel - BPSK symbols (+1 for 0, -1 for 1) with added noise. """
+    return [(1.0 if bit == "0" else -1.0) + generator.gauss(0.0, noise_deviation) for bit in data_in]
+
+
+def awgn_noise_deviation(eb_n0_db: float, code_rate: float) -> float:
+    """ Returns noise standard deviation of BPSK symbols for given Eb/N0 (in dB) and code rate. """
+    return math.sqrt(1.0 / (2.0 * code_rate * 10.0 ** (eb_n0_db / 10.0)))
+
+
+def count_bit_errors(message: str, data_out: str) -> int:
+    """ Counts differing bits of the message and decoded string (missing characters count as 8 errors). """
+    bit_errors = 8 * abs(len(message) - len(data_out))
+    for expected, decoded in zip(message, data_out):
+        bit_errors += bin(ord(expected) ^ ord(decoded)).count("1")
+
+    return bit_errors
+
+
+def _run_trials(channel: str, parameter: float, hard_decision: bool, message_length: int, trial_count: int,
+                seed: str) -> typing.Tuple[int, int, int]:
+    """
+    Runs batch of trials (encode, transmit, decode) in worker process.
+
+    :param channel: name of the channel model
+    :param parameter: flip probability (bsc) or Eb/N0 in dB (awgn)
+    :param hard_decision: are received AWGN symbols quantized to bits before decoding?
+    :param message_length: number of characters of each transmitted message
+    :param trial_count: number of transmitted messages
+    :param seed: seed of the batch (the same seed always produces the same results)
+    :return: number of transmitted bits, bit errors and frame errors
+    """
+    generator = random.Random(seed)
+    bit_count = bit_errors = frame_errors = 0
+    for _ in range(trial_count):
+        message = "".join(generator.choice(MESSAGE_ALPHABET) for _ in range(message_length))
+        data_in = _worker_encoder.data_out_to_str(_worker_encoder.encode(message))
+
+        if channel == "bsc":
+            data_out = _worker_decoder.decode(bsc_channel(data_in, parameter, generator), 1)
+        else:
+            symbols = awgn_channel(data_in, awgn_noise_deviation(parameter, _worker_code_rate), generator)
+            if hard_decision:
+                data_out = _worker_decoder.decode("".join("0" if symbol >= 0 else "1" for symbol in symbols), 1)
+            else:
+                data_out = _worker_decoder.decode_soft(symbols, 1)
+
+        trial_bit_errors = count_bit_errors(message, data_out[0][1] if data_out else "")
+        bit_count += len(message) * 8
+        bit_errors += trial_bit_errors
+        frame_errors += trial_bit_errors > 0
+
+    return bit_count, bit_errors, frame_errors
+
+
+def confidence_interval(error_count: int, total_count: int) -> typing.Tuple[float, float]:
+    """ Returns Wilson score interval (95%) of error probability. """
+    if not total_count:
+        return 0.0, 1.0
+
+    quantile_squared = CONFIDENCE_QUANTILE ** 2
+    probability = error_count / total_count
+    denominator = 1 + quantile_squared / total_count
+    center = (probability + quantile_squared / (2 * total_count)) / denominator
+    half_width = CONFIDENCE_QUANTILE * math.sqrt(
+        probability * (1 - probability) / total_count + quantile_squared / (4 * total_count ** 2)) / denominator
+    return max(center - half_width, 0.0), min(center + half_width, 1.0)
+
+
+def simulate_point(executor: ProcessPoolExecutor, args: dict, parameter: float, point_index: int,
+                   worker_count: int) -> dict:
+    """
+    Runs batches of trials for single channel parameter until the confidence interval of BER
+    is narrow enough or the maximum number of trials is reached.
+
+    Batches are evaluated in order of their indices, so the results do not depend
+    on scheduling of the worker processes.
+    """
+    bit_count = bit_errors = frame_errors = trial_count = 0
+    batch_count = -(-args["max_trials"] // args["batch_size"])
+    batch_index = 0
+    pending = []
+    while True:
+        # keep all the workers busy
+        while batch_index < batch_count and len(pending) < 2 * worker_count:
+            batch_trial_count = min(args["batch_size"], args["max_trials"] - batch_index * args["batch_size"])
+            seed = "{:d}:{:d}:{:d}".format(args["seed"], point_index, batch_index)
+            pending.append((batch_trial_count, executor.submit(
+                _run_trials, args["channel"], parameter, args["hard_decision"], args["message_length"],
+                batch_trial_count, seed)))
+            batch_index += 1
+
+        if not pending:
+            break
+
+        batch_trial_count, future = pending.pop(0)
+        batch_bit_count, batch_bit_errors, batch_frame_errors = future.result()
+        bit_count += batch_bit_count
+        bit_errors += batch_bit_errors
+        frame_errors += batch_frame_errors
+        trial_count += batch_trial_count
+
+        ber_low, ber_high = confidence_interval(bit_errors, bit_count)
+        ber = bit_errors / bit_count
+        logger.info("%s=%g: %d trials, BER %g [%g, %g]",
+                    args["channel"], parameter, trial_count, ber, ber_low, ber_high)
+        if bit_errors >= args["min_errors"] and ber_high - ber_low <= args["relative_width"] * ber:
+            # confidence interval is narrow enough, results of remaining batches are not needed
+            for _, future in pending:
+                future.cancel()
+            break
+
+    ber_low, ber_high = confidence_interval(bit_errors, bit_count)
+    return {
+        "channel": args["channel"], "parameter": parameter, "trials": trial_count,
+        "bits": bit_count, "bit_errors": bit_errors, "ber": bit_errors / bit_count if bit_count else 0.0,
+        "ber_low": ber_low, "ber_high": ber_high,
+        "frame_errors": frame_errors, "fer": frame_errors / trial_count if trial_count else 0.0,
+    }
+
+
+def run(args: dict):
+    stage_count = args["params"][0] + 1
+    feedback_masks = args["params"][1:]
+    worker_count = args["workers"] or os.cpu_count() or 1
+
+    output = open(args["output"], "w", newline="") if args["output"] else sys.stdout
+    try:
+        writer = csv.DictWriter(output, CSV_COLUMNS)
+        writer.writeheader()
+        with ProcessPoolExecutor(worker_count, initializer=_initialize_worker,
+                                 initargs=(args["decoder"], stage_count, feedback_masks)) as executor:
+            for point_index, parameter in enumerate(args["points"]):
+                writer.writerow(simulate_point(executor, args, parameter, point_index, worker_count))
+                output.flush()
+
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Monte-Carlo simulation of bit and frame error rates of convolutional code")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="sets verbosity of logging (1-3)", )
+    parser.add_argument("--params", nargs="+", type=int, default=[5, 53, 46], metavar="X Y Z",
+                        help="parameters of simulated code (same as in main.py) [defaults: 5 53 46]")
+    parser.add_argument("--decoder", choices=DECODER_ENGINES, default=DECODER_ENGINES[0],
+                        help="decoding engine to be used (viterbi and list-viterbi require numpy) "
+                             "[default: best-first]")
+    parser.add_argument("--channel", choices=CHANNELS, default=CHANNELS[0],
+                        help="channel model (bsc - binary symmetric channel, awgn - BPSK over additive "
+                             "white Gaussian noise channel) [default: bsc]")
+    parser.add_argument("--points", nargs="+", type=float, default=[0.01, 0.02, 0.05], metavar="P",
+                        help="simulated flip probabilities (bsc) or Eb/N0 values in dB (awgn) "
+                             "[default: 0.01 0.02 0.05]")
+    parser.add_argument("--hard-decision", action="store_true",
+                        help="received AWGN symbols are quantized to bits before decoding")
+    parser.add_argument("--message-length", type=int, default=16, metavar="L",
+                        help="number of characters of each transmitted message (frame) [default: 16]")
+    parser.add_argument("--max-trials", type=int, default=10000, metavar="N",
+                        help="maximum number of transmitted messages per point [default: 10000]")
+    parser.add_argument("--batch-size", type=int, default=50, metavar="N",
+                        help="number of messages transmitted by single worker task [default: 50]")
+    parser.add_argument("--min-errors", type=int, default=100, metavar="N",
+                        help="minimum number of bit errors before the simulation of point may stop [default: 100]")
+    parser.add_argument("--relative-width", type=float, default=0.2, metavar="R",
+                        help="simulation of point stops once width of 95%% confidence interval of BER "
+                             "is at most R times BER [default: 0.2]")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the simulation [default: 0]")
+    parser.add_argument("--workers", type=int, default=None, metavar="N",
+                        help="number of worker processes [default: number of CPUs]")
+    parser.add_argument("-o", "--output", default=None, metavar="FILE", help="write CSV to file instead of STDOUT")
+
+    arguments = parser.parse_args().__dict__
+    if len(arguments["params"]) < 2:
+        parser.error("invalid parameter specification")
+
+    if arguments["decoder"] in ("viterbi", "list-viterbi"):
+        from utils import numpy_available
+        if not numpy_available():
+            parser.error("{} decoder requires numpy (pip install numpy)".format(arguments["decoder"]))
+
+    if arguments["max_trials"] < 1 or arguments["batch_size"] < 1:
+        parser.error("number of trials and batch size must be positive")
+
+    log_level = logging.ERROR - min(arguments["verbose"], logging.ERROR // 10) * 10
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s (%(name)s): %(message)s",
+        level=log_level,
+        datefmt="%Y-%m-%dT%H:%M:%S%z",
+    )
+
+    run(arguments)
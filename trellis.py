@@ -0,0 +1,300 @@
+import logging
+import mmap
+import os
+import typing
+from array import array
+from collections import OrderedDict
+from itertools import chain
+
+from utils import parity, popcount
+
+logger = logging.getLogger("trellis")
+
+
+class Trellis(object):
+
+    def __init__(self, stage_count: int, feedback_masks: typing.List[int], emissions: typing.Sequence[int] = None):
+        """
+        Precomputes integer based trellis of convolutional code.
+
+        Encoder state is represented by an integer shift register - the MSB
+        of the register corresponds to the most recently inserted bit.
+        Encoder outputs are packed to integers, output of the first feedback
+        mask being stored in the MSB position.
+
+        :param stage_count: number of memory blocks
+        :param feedback_masks: list of feedback masks of memory blocks
+        :param emissions: previously calculated packed encoder outputs (e.g. loaded from cache)
+        """
+        if stage_count < 1:
+            raise RuntimeError("Cannot build trellis. Invalid stage count.")
+
+        self.stage_count = stage_count
+        self.feedback_masks = list(feedback_masks)
+
+        # number of all possible encoder states
+        self.state_count = 1 << stage_count
+        # number of output bits per single input bit
+        self.output_count = len(self.feedback_masks)
+        # value of bit inserted to the shift register
+        self.input_bit_value = 1 << (stage_count - 1)
+
+        # packed encoder output for each possible state
+        if emissions is None:
+            emissions = [self._calculate_emission(state) for state in range(self.state_count)]
+        self.emissions = emissions
+        # unpacked encoder output for each possible packed output
+        self.unpacked_emissions = [self.unpack(emission) for emission in range(1 << self.output_count)]
+        # unpacked encoder output for each possible state
+        self.outputs = list(map(self.unpacked_emissions.__getitem__, self.emissions))
+        # are encoder outputs equal for complemented states? (all feedback masks have even weight)
+        # paths of such code can be told apart only when the initial state is known
+        self.complement_invariant = all(
+            not parity(feedback_mask & (self.state_count - 1)) for feedback_mask in self.feedback_masks)
+        # next state for each possible state and input bit value
+        # (states `2i` and `2i + 1` both transition to `i` or `i | input_bit_value`)
+        next_states = range(self.input_bit_value), range(self.input_bit_value, self.state_count)
+        self.transitions = list(zip(*[
+            chain.from_iterable(zip(next_state_range, next_state_range)) for next_state_range in next_states
+        ]))
+        # number of set bits for each possible XOR of two packed outputs
+        self.distances = [popcount(value) for value in range(1 << self.output_count)]
+        # table of encoder outputs and next states for each input byte, rows are built on demand
+        self._byte_transitions = [None] * self.state_count
+        # table of branch metrics for each possible (full-length) observation and emission, rows are built on demand
+        self._branch_metrics = [None] * (1 << self.output_count)
+        # branch metrics of punctured observations, keyed by (observation, transmitted outputs)
+        self._punctured_metrics = {}
+
+    def __getstate__(self):
+        # emissions loaded from cache are memory-mapped and cannot be pickled
+        state = self.__dict__.copy()
+        state["emissions"] = list(self.emissions)
+        return state
+
+    def _calculate_emission(self, state: int) -> int:
+        """ Calculates packed encoder output for given state. """
+        emission = 0
+        for feedback_mask in self.feedback_masks:
+            emission = (emission << 1) | parity(state & feedback_mask)
+
+        return emission
+
+    def unpack(self, emission: int) -> typing.List[int]:
+        """ Converts packed encoder output to list of output bits. """
+        return [(emission >> bit_index) & 1 for bit_index in range(self.output_count - 1, -1, -1)]
+
+    def output(self, state: int) -> typing.List[int]:
+        """ Returns list of encoder output bits for given state. """
+        return list(self.outputs[state])
+
+    def next_state(self, state: int, input_bit: int) -> int:
+        """ Returns state of the encoder after receiving given input bit. """
+        return self.transitions[state][input_bit]
+
+    def byte_transitions(self, state: int) -> typing.List[typing.Tuple[typing.Tuple[int, ...], int]]:
+        """
+        Returns table of packed encoder outputs and resulting states for all
+        possible input bytes inserted into given state.
+
+        Bits of the byte are inserted LSB first, encoder output is calculated
+        before inserting each of them (same as encoder does bit by bit).
+
+        :param state: encoder state before inserting the byte
+        :return: list of (outputs in order of calculation, next state) indexed by byte value
+        """
+        row = self._byte_transitions[state]
+        if row is None:
+            row = []
+            for byte_value in range(256):
+                current_state = state
+                emissions = []
+                for bit_index in range(8):
+                    emissions.append(self.emissions[current_state])
+                    current_state = self.transitions[current_state][(byte_value >> bit_index) & 1]
+
+                row.append((tuple(emissions), current_state))
+
+            self._byte_transitions[state] = row
+
+        return row
+
+    def branch_metrics(self, observation: int) -> typing.List[int]:
+        """ Returns branch metrics of all possible packed emissions for given packed (full-length) observation. """
+        row = self._branch_metrics[observation]
+        if row is None:
+            row = self._branch_metrics[observation] = [
+                self.distances[observation ^ emission] for emission in range(1 << self.output_count)
+            ]
+
+        return row
+
+    def observation_metrics(self, observation: str) -> typing.List[int]:
+        """
+        Returns branch metrics of all possible packed emissions for given
+        observation (string of [01] characters).
+
+        Observations shorter than the number of encoder outputs are compared
+        with the leading emission bits, each missing bit costs 1.
+        """
+        if len(observation) == self.output_count:
+            return self.branch_metrics(int(observation, 2))
+
+        missing_length = self.output_count - len(observation)
+        observation_value = int(observation, 2) if observation else 0
+        return [
+            self.distances[(emission >> missing_length) ^ observation_value] + missing_length
+            for emission in range(1 << self.output_count)
+        ]
+
+    def punctured_observation_metrics(self, observation: str, kept_outputs: typing.Tuple[int, ...]) -> typing.List[int]:
+        """
+        Returns branch metrics of all possible packed emissions for given
+        observation (string of [01] characters) of punctured code.
+
+        Only outputs of given indices were transmitted, the erased ones do not
+        contribute to the metric. Observations shorter than the number of
+        transmitted outputs are compared with the leading ones, each missing bit costs 1.
+        """
+        key = observation, kept_outputs
+        metrics = self._punctured_metrics.get(key)
+        if metrics is None:
+            compared_mask = observation_value = 0
+            for bit, output_index in zip(observation, kept_outputs):
+                output_bit = 1 << (self.output_count - 1 - output_index)
+                compared_mask |= output_bit
+                observation_value |= output_bit if bit == "1" else 0
+
+            missing_length = max(len(kept_outputs) - len(observation), 0)
+            metrics = [
+                self.distances[(emission & compared_mask) ^ observation_value] + missing_length
+                for emission in range(1 << self.output_count)
+            ]
+            self._punctured_metrics[key] = metrics
+
+        return metrics
+
+    def punctured_soft_observation_metrics(self, observation: typing.Sequence[float],
+                                           kept_outputs: typing.Tuple[int, ...]) -> typing.List[float]:
+        """
+        Returns correlation branch metrics of all possible packed emissions for
+        given observation of soft values of punctured code. Erased outputs
+        are replaced by 0 (equally probable 0 and 1), so they cost nothing.
+        """
+        values = [0.0] * self.output_count
+        for value, output_index in zip(observation, kept_outputs):
+            values[output_index] = value
+
+        return self.soft_observation_metrics(values)
+
+    def soft_observation_metrics(self, observation: typing.Sequence[float]) -> typing.List[float]:
+        """
+        Returns correlation branch metrics of all possible packed emissions
+        for given observation of soft values (positive for 0, negative for 1).
+
+        Each soft value which disagrees with the emission bit costs its absolute
+        value, which leads to the same decisions as Euclidean distance of BPSK symbols.
+        Observations shorter than the number of encoder outputs are compared
+        with the leading emission bits.
+        """
+        # costs of 0 and 1 bit for each soft value
+        bit_costs = [(max(-value, 0.0), max(value, 0.0)) for value in observation]
+        return [
+            sum(
+                costs[(emission >> (self.output_count - 1 - bit_index)) & 1]
+                for bit_index, costs in enumerate(bit_costs)
+            )
+            for emission in range(1 << self.output_count)
+        ]
+
+
+# maximum number of trellis instances kept within the process
+TRELLIS_CACHE_SIZE = 16
+# trellis instances shared within the process, keyed by code parameters (least recently used first)
+_trellis_cache = OrderedDict()
+# directory of persistent trellis table cache (disabled when not set)
+_trellis_cache_directory = os.environ.get("TRELLIS_CACHE_DIR")
+# memory view formats of packed encoder outputs by their maximum bit length
+_EMISSION_FORMATS = [(8, "B"), (16, "H"), (32, "I"), (64, "Q")]
+
+
+def configure_cache(directory: typing.Optional[str]):
+    """ Sets directory of persistent trellis table cache (`None` disables the cache). """
+    global _trellis_cache_directory
+    _trellis_cache_directory = directory
+
+
+def _emission_format(output_count: int) -> typing.Optional[str]:
+    """ Returns memory view format able to hold packed encoder outputs of given length. """
+    for max_output_count, emission_format in _EMISSION_FORMATS:
+        if output_count <= max_output_count:
+            return emission_format
+
+    return None
+
+
+def _cache_file_path(stage_count: int, feedback_masks: typing.Tuple[int, ...], emission_format: str) -> str:
+    """ Returns path of persistent cache file holding table of packed encoder outputs. """
+    file_name = "trellis-{:d}-{:s}.{:s}".format(stage_count, "-".join(map(str, feedback_masks)), emission_format)
+    return os.path.join(_trellis_cache_directory, file_name)
+
+
+def _load_trellis(stage_count: int, feedback_masks: typing.Tuple[int, ...]) -> Trellis:
+    """ Loads trellis using persistent cache of packed encoder outputs, builds and stores it when missing. """
+    emission_format = _emission_format(len(feedback_masks))
+    if not _trellis_cache_directory or emission_format is None:
+        return Trellis(stage_count, list(feedback_masks))
+
+    file_path = _cache_file_path(stage_count, feedback_masks, emission_format)
+    try:
+        with open(file_path, "rb") as file:
+            # the mapping stays open as long as the memory view exists
+            emissions = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)).cast(emission_format)
+
+        if len(emissions) == 1 << stage_count:
+            logger.debug("loaded trellis tables from %s", file_path)
+            return Trellis(stage_count, list(feedback_masks), emissions)
+
+        logger.warning("ignoring invalid trellis table cache file %s", file_path)
+
+    except (OSError, ValueError, TypeError):
+        logger.debug("trellis tables not found in cache %s", file_path)
+
+    trellis = Trellis(stage_count, list(feedback_masks))
+    try:
+        os.makedirs(_trellis_cache_directory, exist_ok=True)
+        # write to temporary file first, so other processes never load incomplete table
+        temporary_file_path = "{:s}.{:d}.tmp".format(file_path, os.getpid())
+        with open(temporary_file_path, "wb") as file:
+            array(emission_format, trellis.emissions).tofile(file)
+
+        os.replace(temporary_file_path, file_path)
+        logger.debug("stored trellis tables to cache %s", file_path)
+
+    except OSError:
+        logger.warning("unable to store trellis tables to cache %s", file_path)
+
+    return trellis
+
+
+def get_trellis(stage_count: int, feedback_masks: typing.List[int]) -> Trellis:
+    """
+    Returns shared trellis instance for given code parameters (built only once per process).
+    Recently used instances are kept in memory, tables of the others are loaded from
+    persistent cache (when configured) or built again.
+    """
+    key = (stage_count, tuple(feedback_masks))
+    if key in _trellis_cache:
+        _trellis_cache.move_to_end(key)
+        return _trellis_cache[key]
+
+    trellis = _load_trellis(*key)
+    share_trellis(trellis)
+    return trellis
+
+
+def share_trellis(trellis: Trellis):
+    """ Registers already built trellis instance (e.g. received by worker process) as shared instance. """
+    _trellis_cache[(trellis.stage_count, tuple(trellis.feedback_masks))] = trellis
+    while len(_trellis_cache) > TRELLIS_CACHE_SIZE:
+        _trellis_cache.popitem(last=False)
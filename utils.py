@@ -15,6 +15,56 @@ def str_to_state(state: str) -> State:
     return State(list(map(lambda x: int(x), state)))
 
 
+def state_to_int(state: State) -> int:
+    """ Converts integer list based state (MSB->LSB) to integer shift register value. """
+    value = 0
+    for bit in state:
+        value = (value << 1) | bit
+
+    return value
+
+
+def int_to_state(value: int, stage_count: int) -> State:
+    """ Converts integer shift register value to integer list based state (MSB->LSB). """
+    return State([(value >> bit_index) & 1 for bit_index in range(stage_count - 1, -1, -1)])
+
+
+def numpy_available() -> bool:
+    """ Checks whether optional dependency `numpy` (required by vectorized engines) is installed. """
+    try:
+        import numpy
+        return True
+
+    except ImportError:
+        return False
+
+
+def popcount(value: int) -> int:
+    """ Counts number of set bits in given integer. """
+    return bin(value).count("1")
+
+
+def parity(value: int) -> int:
+    """ Calculates binary XOR of all bits in given integer. """
+    return popcount(value) & 1
+
+
+def check_puncture_pattern(puncture_pattern: typing.List[typing.List[int]], output_count: int):
+    """
+    Validates puncturing matrix - row per each encoder output (feedback mask),
+    column per each trellis step of the puncturing period, 1 for transmitted bit.
+    """
+    if len(puncture_pattern) != output_count:
+        raise RuntimeError("Puncturing matrix must have single row per each feedback mask.")
+
+    period = len(puncture_pattern[0])
+    if not period or any(len(row) != period or set(row) - {0, 1} for row in puncture_pattern):
+        raise RuntimeError("Puncturing matrix rows must be non-empty and of the same length, containing 0s and 1s.")
+
+    if not all(any(column) for column in zip(*puncture_pattern)):
+        raise RuntimeError("Puncturing matrix must transmit at least single bit in each step.")
+
+
 def all_states(stage_count: int) -> typing.List[State]:
     """ Creates list of all possible (integer list based) states for given stage count. """
     if stage_count < 1:
@@ -41,23 +91,19 @@ def emission_table(stage_count: int, feedback_masks: typing.List[int]) -> typing
     Creates table of encoder outputs for all possible states for given number
     of stages and selected feedback masks.
     """
-    from convolution_filter import ConvolutionFilter
+    from trellis import Trellis
     # create result table object
     table = defaultdict(dict)
-    # create list of all possible encoder states
-    states = all_states(stage_count)
-    # create encoder logic instance - convolution filter
-    _filter = ConvolutionFilter(stage_count, feedback_masks)
-
-    # for each given state
-    for source_state in states:
-        # set filter to given state
-        _filter.initialize(source_state)
+    # create integer based trellis with precomputed encoder outputs
+    trellis = Trellis(stage_count, feedback_masks)
+
+    # for each possible state
+    for source_state in range(trellis.state_count):
         # convert state to string key
-        source_state_key = state_to_str(source_state)
+        source_state_key = state_to_str(int_to_state(source_state, stage_count))
 
         # add output entries for given state with any possible input value
-        table[source_state_key] = _filter.output
+        table[source_state_key] = trellis.output(source_state)
 
     return table
 
@@ -67,17 +113,22 @@ def transition_table(stage_count: int) -> typing.Dict[str, typing.Dict[int, str]
     Creates table of state transitions for all possible states for given number
     of stages and possible input values.
     """
+    if stage_count < 1:
+        raise RuntimeError("Cannot create transition table. Invalid stage count.")
+
     # create result table object
     table = defaultdict(dict)
-    # create list of all possible encoder states
-    states = all_states(stage_count)
+    # value of bit inserted to the shift register (MSB position, see `Trellis.transitions`)
+    input_bit_value = 1 << (stage_count - 1)
 
-    for source_state in states:
+    # for each possible state
+    for source_state in range(1 << stage_count):
         # convert state to string key
-        source_state_key = state_to_str(source_state)
+        source_state_key = state_to_str(int_to_state(source_state, stage_count))
 
         # add resulting state entries for given state with any possible input value
-        table[source_state_key][0] = state_to_str([0] + source_state[:-1])
-        table[source_state_key][1] = state_to_str([1] + source_state[:-1])
+        for input_bit in [0, 1]:
+            target_state = (input_bit * input_bit_value) | (source_state >> 1)
+            table[source_state_key][input_bit] = state_to_str(int_to_state(target_state, stage_count))
 
     return table
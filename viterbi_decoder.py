@@ -0,0 +1,265 @@
+import logging
+import typing
+
+import numpy as np
+
+from convolutional_decoder import ConvolutionalDecoder
+from profiling import profile_phase
+
+logger = logging.getLogger("viterbi")
+
+
+class ViterbiDecoder(ConvolutionalDecoder):
+
+    # path metric of states which were not reached yet
+    UNREACHABLE_COST = np.iinfo(np.int64).max // 4
+
+    def __init__(self, stage_count: int, feedback_masks: typing.List[int], traceback_depth: int = None,
+                 puncture_pattern: typing.List[typing.List[int]] = None):
+        """
+        Initializes vectorized Viterbi decoder.
+
+        Path metrics of all encoder states are updated at once in every
+        trellis step (add-compare-select), decoded data are obtained
+        by traceback of stored decisions once the whole input is processed.
+
+        :param stage_count: number of memory blocks
+        :param feedback_masks: list of feedback masks of memory blocks
+        :param traceback_depth: number of trellis steps after which stream decoding decisions are final
+        :param puncture_pattern: puncturing matrix used by encoder (see `check_puncture_pattern`)
+        """
+        super().__init__(stage_count, feedback_masks, traceback_depth, puncture_pattern)
+
+        states = np.arange(self._trellis.state_count, dtype=np.int64)
+        # packed encoder output in each of the states
+        self._state_emissions = np.array(self._emissions, dtype=np.int64)
+        # first of the two possible predecessors of each state, the other one is `| 1`
+        self._predecessors = (states << 1) & (self._trellis.state_count - 1)
+        # input bit which leads to each of the states
+        self._state_input_bits = states >> (stage_count - 1)
+
+    def _initial_path_metrics(self, dtype=np.int64) -> np.ndarray:
+        """ Creates path metrics of the initial trellis step (encoder starts in state 0s). """
+        path_metrics = np.full(self._trellis.state_count, self.UNREACHABLE_COST, dtype=dtype)
+        path_metrics[self._initial_state] = 0
+        return path_metrics
+
+    def _final_path_metrics(self, path_metrics: np.ndarray) -> np.ndarray:
+        """ Makes all final states except the required one unreachable (see `decode_segment`). """
+        if self._final_state is None:
+            return path_metrics
+
+        final_metrics = np.full_like(path_metrics, self.UNREACHABLE_COST)
+        final_metrics[self._final_state] = path_metrics[self._final_state]
+        return final_metrics
+
+    def _add_compare_select(self, path_metrics: np.ndarray, observation_metrics: np.ndarray) \
+            -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Performs single trellis step for all states at once.
+
+        Leading dimensions of the arguments (e.g. frames of batch) are preserved,
+        states and emissions are always indexed by the last dimension.
+
+        :param path_metrics: path metrics of all states in previous step
+        :param observation_metrics: branch metrics of all packed emissions for current observation
+        :return: path metrics in current step and decisions (selected predecessor `| 1`) of all states
+        """
+        lower_metrics = path_metrics[..., self._predecessors]
+        upper_metrics = path_metrics[..., self._predecessors | 1]
+        # prefer lower predecessor in case of equal path costs
+        decisions = upper_metrics < lower_metrics
+
+        path_metrics = np.where(decisions, upper_metrics, lower_metrics)
+        path_metrics += observation_metrics[..., self._state_emissions]
+        return path_metrics, decisions
+
+    def _traceback(self, decisions: np.ndarray, final_state: int) -> typing.List[int]:
+        """
+        Reconstructs decoded binary sequence leading to given final state.
+
+        :param decisions: decisions of all trellis steps
+        :param final_state: state in which the path ends
+        :return: decoded binary sequence (in order of processing)
+        """
+        data_out = []
+        current_state = final_state
+        # follow selected predecessors from the last step to the first one
+        for step_decisions in decisions[::-1]:
+            data_out.append(int(self._state_input_bits[current_state]))
+            current_state = int(self._predecessors[current_state] | step_decisions[current_state])
+
+        data_out.reverse()
+        return data_out
+
+    @classmethod
+    def _observations_array(cls, observations: typing.List[typing.List]) -> np.ndarray:
+        """ Converts branch metrics of observations to array (integers for hard, floats for soft decisions). """
+        observations = np.array(observations)
+        if not len(observations):
+            observations = observations.astype(np.int64)
+
+        return observations
+
+    def _observations_batch_array(self, observations: typing.List[typing.List[typing.List]]) \
+            -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Converts branch metrics of observations of multiple frames to single array padded with 0s.
+
+        :param observations: branch metrics of all possible packed emissions per observation of each frame
+        :return: array of shape (frames, steps, emissions) and number of steps of each frame
+        """
+        frame_observations = [self._observations_array(frame) for frame in observations]
+        frame_lengths = np.array([len(frame) for frame in frame_observations], dtype=np.int64)
+        emission_count = 1 << self._trellis.output_count
+        dtype = np.result_type(np.int64, *(frame.dtype for frame in frame_observations))
+
+        observations = np.zeros((len(frame_observations), max(frame_lengths, default=0), emission_count), dtype=dtype)
+        for frame_index, frame in enumerate(frame_observations):
+            if len(frame):
+                observations[frame_index, :len(frame)] = frame
+
+        return observations, frame_lengths
+
+    def _forward(self, observations: np.ndarray, path_metrics: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Updates path metrics of all states for each observation.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param path_metrics: path metrics of all states before the first observation
+        :return: path metrics after the last observation and decisions of all trellis steps
+        """
+        decisions = np.zeros((len(observations), self._trellis.state_count), dtype=np.bool_)
+        # for each observation update metrics of all states at once
+        for step, observation_metrics in enumerate(observations):
+            path_metrics, decisions[step] = self._add_compare_select(path_metrics, observation_metrics)
+
+        return path_metrics, decisions
+
+    def _decode_window(self, observations: typing.List[typing.List], from_initial_state: bool) -> typing.List[int]:
+        """
+        Decodes bits of all steps of given window of observations using path
+        with the lowest cost in the last step.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param from_initial_state: does the window start in the initial state? (otherwise
+                                   all the states are considered equally probable)
+        :return: decoded binary sequence (in order of processing)
+        """
+        observations = self._observations_array(observations)
+        if from_initial_state:
+            path_metrics = self._initial_path_metrics(observations.dtype)
+        else:
+            path_metrics = np.zeros(self._trellis.state_count, dtype=observations.dtype)
+
+        path_metrics, decisions = self._forward(observations, path_metrics)
+        return self._traceback(decisions, int(np.argmin(path_metrics)))
+
+    def _decode_observations(self, observations: typing.List[typing.List], max_result_count: int) \
+            -> typing.List[typing.Tuple[typing.Union[int, float], str]]:
+        """
+        Updates path metrics of all states for each observation and traces back the best paths.
+
+        :param observations: branch metrics of all possible packed emissions per observation
+        :param max_result_count: maximum number of possible interpretations returned
+        :return: list of (path cost, decoded ASCII string)
+        """
+        # hard decision metrics are integers, soft decision metrics are floats
+        observations = self._observations_array(observations)
+        with profile_phase(self.stats, "search"):
+            path_metrics, decisions = self._forward(observations, self._initial_path_metrics(observations.dtype))
+        path_metrics = self._final_path_metrics(path_metrics)
+
+        if self.stats is not None:
+            self.stats.increment("states expanded", decisions.size)
+
+        # select the best reachable final states (ties resolved by lower state)
+        final_states = np.argsort(path_metrics, kind="stable")
+        return self._distinct_results(self._final_state_solutions(
+            path_metrics, final_states, lambda _, final_state: self._traceback(decisions, final_state),
+        ), max_result_count)
+
+    def _final_state_solutions(self, path_metrics: np.ndarray, final_states: typing.Iterable[int],
+                               traceback: typing.Callable[[int, int], typing.List[int]]) \
+            -> typing.Iterator[typing.Tuple[typing.Union[int, float], typing.List[int]]]:
+        """
+        Traces back paths leading to reachable final states one at a time (see `_distinct_results`).
+
+        :param path_metrics: path metrics of all states after the last observation
+        :param final_states: final states ordered by their path metrics
+        :param traceback: function reconstructing decoded binary sequence of path leading to given final state
+                          (called with the index of the path and the final state)
+        :return: (path cost, decoded binary sequence) of each of the paths
+        """
+        for path_index, final_state in enumerate(final_states):
+            final_cost = path_metrics[final_state].item()
+            if final_cost >= self.UNREACHABLE_COST:
+                break
+
+            logger.debug("possible solution found in state %d (cost=%2d)", final_state, final_cost)
+            yield final_cost, traceback(path_index, int(final_state))
+
+    def _batch_traceback(self, decisions: np.ndarray, frame_lengths: np.ndarray, final_states: np.ndarray) \
+            -> np.ndarray:
+        """
+        Reconstructs decoded binary sequences of all frames at once.
+
+        :param decisions: decisions of all trellis steps of shape (steps, frames, states)
+        :param frame_lengths: number of steps of each frame
+        :param final_states: states in which the paths end of shape (frames, paths)
+        :return: decoded bits of shape (frames, paths, steps), bits after the end of frame are undefined
+        """
+        frame_indices = np.arange(len(frame_lengths))[:, np.newaxis]
+        current_states = final_states.copy()
+        data_out = np.zeros(final_states.shape + (len(decisions),), dtype=np.uint8)
+        # follow selected predecessors from the last step to the first one, paths of shorter frames start later
+        for step in range(len(decisions) - 1, -1, -1):
+            data_out[:, :, step] = self._state_input_bits[current_states]
+            previous_states = self._predecessors[current_states] | decisions[step][frame_indices, current_states]
+            current_states = np.where((step < frame_lengths)[:, np.newaxis], previous_states, current_states)
+
+        return data_out
+
+    def _decode_observations_batch(self, observations: typing.List[typing.List[typing.List]], max_result_count: int) \
+            -> typing.List[typing.List[typing.Tuple[typing.Union[int, float], str]]]:
+        """
+        Updates path metrics of all states of all frames at once and traces back the best paths of each frame.
+
+        Path metrics have shape (frames, states), so the per-step work is shared by all
+        the frames. Frames are padded to the same length, path metrics of frames which
+        already ended are kept unchanged.
+
+        :param observations: branch metrics of all possible packed emissions per observation of each frame
+        :param max_result_count: maximum number of possible interpretations returned per frame
+        :return: list of (path cost, decoded ASCII string) of each frame
+        """
+        observations, frame_lengths = self._observations_batch_array(observations)
+        frame_count, step_count = observations.shape[:2]
+
+        path_metrics = np.tile(self._initial_path_metrics(observations.dtype), (frame_count, 1))
+        decisions = np.zeros((step_count, frame_count, self._trellis.state_count), dtype=np.bool_)
+        for step in range(step_count):
+            step_metrics, decisions[step] = self._add_compare_select(path_metrics, observations[:, step])
+            # frames which already ended keep their final path metrics
+            path_metrics = np.where((step < frame_lengths)[:, np.newaxis], step_metrics, path_metrics)
+
+        # select the best reachable final states of each frame (ties resolved by lower state)
+        final_states = np.argsort(path_metrics, axis=1, kind="stable")
+        # paths of the best final states are traced back for all frames at once
+        data_out = self._batch_traceback(decisions, frame_lengths, final_states[:, :max_result_count])
+
+        def frame_traceback(frame_index: int, path_index: int, final_state: int) -> typing.List[int]:
+            # paths of the other final states are traced back only when some results decode to the same string
+            frame_length = frame_lengths[frame_index]
+            if path_index < data_out.shape[1]:
+                return data_out[frame_index, path_index, :frame_length].tolist()
+
+            return self._traceback(decisions[:frame_length, frame_index], final_state)
+
+        return [
+            self._distinct_results(self._final_state_solutions(
+                path_metrics[frame_index], final_states[frame_index],
+                lambda path_index, final_state: frame_traceback(frame_index, path_index, final_state),
+            ), max_result_count)
+            for frame_index in range(frame_count)
+        ]